@@ -1,15 +1,20 @@
+import importlib
+
 import streamlit as st
-import logging
-from core.llm_handler import LLMHandler
-from core.prompts.prompt_editor import prompt_editor_ui
-from core.lore.lore_editor import lore_editor_ui
-from core.project.project_editor import project_editor_ui
-from utils.config import load_config, save_config
-from logger.log_writer import list_log_files, load_logs_from_file
-from logger.utils import setup_logging, log_interaction
-from core.ui.generation import generation_ui
-from core.ui.history import history_ui
-from core.ui.character import character_editor_ui
+from logger.utils import setup_logging
+
+# Страницы: модуль и функция отрисовки. Модуль импортируется только при
+# первом открытии страницы, поэтому LangChain, FAISS и модели эмбеддингов
+# загружаются, лишь когда страница действительно обращается к LLM.
+PAGES = {
+    "Генерация текста": ("core.ui.generation", "generation_ui"),
+    "🧠 Prompt Editor": ("core.prompts.prompt_editor", "prompt_editor_ui"),
+    "📜 История": ("core.ui.history", "history_ui"),
+    "🌍 Редактор Лора": ("core.lore.lore_editor", "lore_editor_ui"),
+    "🔹 Проектный режим": ("core.project.project_editor", "project_editor_ui"),
+    "📖 Редактор Персонажей": ("core.ui.character", "character_editor_ui"),
+    "🩺 Диагностика": ("core.ui.diagnostics", "diagnostics_ui"),
+}
 
 
 st.set_page_config(page_title="NovelCraft MVP", layout="wide")
@@ -18,31 +23,16 @@ st.set_page_config(page_title="NovelCraft MVP", layout="wide")
 setup_logging()
 
 
+def load_page(title: str):
+    """Функция отрисовки страницы (модуль импортируется при первом вызове)"""
+    module_name, function_name = PAGES[title]
+    return getattr(importlib.import_module(module_name), function_name)
+
+
 def main():
     # Навигация
-    page = st.sidebar.selectbox("📚 Навигация",
-                                [
-                                    "Генерация текста",
-                                    "🧠 Prompt Editor",
-                                    "📜 История",
-                                    "🌍 Редактор Лора",
-                                    "🔹 Проектный режим",
-                                    "📖 Редактор Персонажей"
-                                ])
-
-    if page == "Генерация текста":
-        generation_ui()
-    elif page == "🧠 Prompt Editor":
-        prompt_editor_ui()
-    elif page == "📜 История":
-        history_ui()
-    elif page == "🌍 Редактор Лора":
-        lore_editor_ui()
-    elif page == "🔹 Проектный режим":
-        # Вызов редактора проекта
-        project_editor_ui()
-    elif page == "📖 Редактор Персонажей":
-        character_editor_ui()
+    page = st.sidebar.selectbox("📚 Навигация", list(PAGES))
+    load_page(page)()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+"""
+Создание LLMHandler и накладные расходы генерации поверх модели.
+
+Модель — FakeChatModel с заданными задержкой первого токена и скоростью,
+поэтому overhead_ms показывает время самого обработчика: сборку промпта,
+память, логирование.
+
+Запуск: python -m benchmarks.bench_handler
+"""
+import argparse
+import json
+import shutil
+import sys
+import time
+
+from benchmarks.bench_lore import make_lore
+from benchmarks.common import ROOT, best_of, timed, workdir
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+from core.llm_handler import LLMHandler
+from core.memory.embedding_service import EmbeddingService
+from logger.log_writer import flush_logs
+from utils.serialization import write_yaml
+
+TEMPLATE = str(ROOT / "core/prompts/base.json")
+
+
+def _first_chunk(stream) -> float:
+    """Время до первого фрагмента потока, мс; поток дочитывается до конца"""
+    started = time.perf_counter()
+    first = None
+    for _ in stream:
+        if first is None:
+            first = (time.perf_counter() - started) * 1000
+    return first
+
+
+def run(lore_entries: int = 1000, ttft: float = 0.05, tokens_per_sec: float = 500.0,
+        response_tokens: int = 32, repeat: int = 5) -> dict:
+    with workdir() as directory:
+        (directory / "data").mkdir()
+        shutil.copy(ROOT / "data/characters.yaml", directory / "data/characters.yaml")
+        write_yaml(directory / "data/lore.yaml", make_lore(lore_entries))
+
+        llm = FakeChatModel(ttft=ttft, tokens_per_sec=tokens_per_sec, response_tokens=response_tokens)
+        model_ms = (ttft + response_tokens / tokens_per_sec) * 1000
+        embedder = FakeEmbeddings()
+
+        def handler(use_memory: bool) -> LLMHandler:
+            service = EmbeddingService(embedder, cache_dir=str(directory / "embeddings"))
+            return LLMHandler(template_path=TEMPLATE, llm=llm, use_memory=use_memory, embeddings=service)
+
+        plain = handler(False)
+        memory, memory_cold_ms = timed(lambda: handler(True))
+
+        results = {
+            "model_ms": model_ms,
+            "init_ms": best_of(lambda: handler(False), repeat),
+            "init_memory_cold_ms": memory_cold_ms,
+            "init_memory_warm_ms": best_of(lambda: handler(True), repeat),
+        }
+
+        generate_ms = best_of(lambda: plain.generate("Опиши рассвет над замком."), repeat)
+        stream_ttft_ms = min(_first_chunk(plain.stream("Опиши рассвет над замком.")) for _ in range(repeat))
+
+        def memory_turn():
+            _, ms = timed(lambda: memory.generate("Что защищает от огня?"))
+            # Сводка и персонажи обновляются в фоне, пока автор читает ответ
+            memory.memory_manager.flush()
+            return ms
+
+        memory_generate_ms = min(memory_turn() for _ in range(repeat))
+        flush_logs()
+
+        results.update({
+            "generate_ms": generate_ms,
+            "generate_overhead_ms": generate_ms - model_ms,
+            "stream_ttft_ms": stream_ttft_ms,
+            "stream_ttft_overhead_ms": stream_ttft_ms - ttft * 1000,
+            "generate_memory_ms": memory_generate_ms,
+            "generate_memory_overhead_ms": memory_generate_ms - model_ms,
+        })
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lore", type=int, default=1000)
+    parser.add_argument("--ttft", type=float, default=0.05, help="Задержка первого токена, с")
+    parser.add_argument("--tokens-per-sec", type=float, default=500.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    json.dump(run(args.lore, args.ttft, args.tokens_per_sec, repeat=args.repeat), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
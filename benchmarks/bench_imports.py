@@ -0,0 +1,84 @@
+"""
+Время импорта модулей приложения в отдельных процессах (python -X importtime):
+старт app.py, каждая страница и стек LLM. Для каждого модуля — суммарное
+время и самые тяжёлые вложенные импорты.
+
+Запуск: python -m benchmarks.bench_imports [--top 10]
+"""
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from benchmarks.common import ROOT
+
+MODULES = (
+    "app",
+    "core.ui.generation",
+    "core.prompts.prompt_editor",
+    "core.ui.history",
+    "core.lore.lore_editor",
+    "core.project.project_editor",
+    "core.ui.character",
+    "core.ui.diagnostics",
+    "core.llm_handler",
+    "core.memory.memory_manager",
+    "streamlit",
+)
+
+
+def importtime(module: str) -> List[Tuple[str, float, float]]:
+    """
+    Импортирует модуль в новом интерпретаторе.
+    :return: [(модуль, собственное время мс, суммарное время мс)] в порядке вывода
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return rows
+
+
+def measure(module: str, repeat: int = 3, top: int = 10) -> Dict:
+    # Лучший из нескольких запусков: первый прогревает файловый кэш
+    runs = [importtime(module) for _ in range(repeat)]
+    rows = min(runs, key=lambda r: r[-1][2])
+    total = rows[-1][2]
+    # Пакеты верхнего уровня, которые модуль подтянул, по суммарному времени
+    packages: Dict[str, float] = {}
+    skip = {"site", module.split(".")[0]}
+    for name, _, cumulative in rows:
+        if "." not in name and name not in skip:
+            packages[name] = packages.get(name, 0.0) + cumulative
+    heaviest = sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {
+        "total_ms": total,
+        "modules": len(rows),
+        "langchain": any(name.startswith("langchain") for name, _, _ in rows),
+        "faiss": any(name == "faiss" for name, _, _ in rows),
+        "heaviest": {name: ms for name, ms in heaviest},
+    }
+
+
+def run(modules=MODULES, repeat: int = 3, top: int = 10) -> dict:
+    return {module: measure(module, repeat, top) for module in modules}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("modules", nargs="*", default=list(MODULES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+    json.dump(run(args.modules, args.repeat, args.top), sys.stdout, indent=2, ensure_ascii=False)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Запись и чтение логов взаимодействий: BufferedLogWriter пишет синтетические
+записи за несколько дней (прошлые дни сжимаются), затем замеряются страницы
+query_logs с фильтрами — с готовым индексом и после его удаления.
+
+Запуск: python -m benchmarks.bench_logs [--entries 5000]
+"""
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.common import best_of, timed, workdir
+from logger.log_writer import BufferedLogWriter, list_log_files, load_logs_from_file, query_logs
+
+MODELS = ("ollama:llama3", "ollama:mistral")
+SYSTEM_PROMPT = "Ты — соавтор фэнтези-романа. Пиши образно, сохраняй стиль автора. " * 20
+
+
+def make_entries(entries: int, days: int) -> list:
+    start = datetime(2025, 1, 1)
+    step = timedelta(days=days) / entries
+    return [
+        {
+            "timestamp": (start + step * i).isoformat(),
+            "model_name": MODELS[i % len(MODELS)],
+            "response": f"Рыцарь {i} поднял меч, и дракон {'золотой' if i % 50 == 0 else 'чёрный'} отступил.",
+            "meta": {"temperature": 0.7, "eval_count": 32},
+            # Общий системный промпт попадает в блоб один раз
+            "prompt_segments": [("system", SYSTEM_PROMPT), ("human", f"Продолжи сцену {i}")]
+        }
+        for i in range(entries)
+    ]
+
+
+def run(entries: int = 5000, days: int = 7, repeat: int = 5) -> dict:
+    with workdir() as directory:
+        log_dir = str(directory / "logs")
+        writer = BufferedLogWriter(log_dir=log_dir)
+
+        def write_all():
+            for entry in make_entries(entries, days):
+                writer.write(entry)
+            writer.flush()
+
+        _, write_ms = timed(write_all)
+        newest = list_log_files(log_dir)[-1]
+        middle = datetime(2025, 1, 1) + timedelta(days=days / 2)
+
+        def cold(fn):
+            # Индексы смещений строятся заново, архивы распаковываются
+            for path in (directory / "logs").glob("*.idx"):
+                path.unlink()
+            return timed(fn)[1]
+
+        first_page = lambda: query_logs(log_dir=log_dir)
+        return {
+            "entries": entries,
+            "files": len(list_log_files(log_dir)),
+            "write_ms": write_ms,
+            "first_page_cold_ms": cold(first_page),
+            "first_page_ms": best_of(first_page, repeat),
+            "deep_page_ms": best_of(lambda: query_logs(page=entries // 40, log_dir=log_dir), repeat),
+            "model_filter_ms": best_of(lambda: query_logs(model=MODELS[1], log_dir=log_dir), repeat),
+            "date_filter_ms": best_of(
+                lambda: query_logs(start=middle, end=middle + timedelta(hours=12), log_dir=log_dir), repeat),
+            "text_search_cold_ms": cold(lambda: query_logs(text="золотой", log_dir=log_dir)),
+            "text_search_ms": best_of(lambda: query_logs(text="золотой", log_dir=log_dir), repeat),
+            "load_file_ms": best_of(lambda: load_logs_from_file(newest, log_dir=log_dir), repeat),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    json.dump(run(args.entries, args.days, args.repeat), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Индексация лора в MemoryManager на 100/1k/10k записей: холодный старт
+(все эмбеддинги считаются), тёплый старт (индекс читается с диска),
+точечное обновление одной записи и поиск.
+
+Запуск: python -m benchmarks.bench_lore [--sizes 100 1000 10000]
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.common import best_of, timed, workdir
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+from core.memory.embedding_service import EmbeddingService
+from core.memory.memory_manager import MemoryManager
+from utils.serialization import write_yaml
+
+SIZES = (100, 1000, 10000)
+
+_RUNES = ("Альгиз", "Турисаз", "Ансуз", "Райдо", "Кеназ", "Гебо", "Вуньо", "Хагалаз")
+_SCHOOLS = ("огня", "воды", "ветра", "камня", "тени", "света")
+
+
+def make_lore(entries: int) -> list:
+    return [
+        {"text": f"Руна {_RUNES[i % len(_RUNES)]}-{i} из школы {_SCHOOLS[i % len(_SCHOOLS)]} "
+                 f"защищает владельца от {_SCHOOLS[(i + 1) % len(_SCHOOLS)]}, но слабеет в полнолуние."}
+        for i in range(entries)
+    ]
+
+
+def bench_size(entries: int, repeat: int = 3) -> dict:
+    with workdir() as directory:
+        lore = make_lore(entries)
+        lore_path = str(directory / "lore.yaml")
+        write_yaml(lore_path, lore)
+        embedder = FakeEmbeddings()
+        llm = FakeChatModel()
+
+        def manager():
+            # Новый сервис — пустой кэш запросов в памяти, как после перезапуска
+            service = EmbeddingService(embedder, cache_dir=str(directory / "embeddings"))
+            return MemoryManager(llm, embedding_model=service, lore_path=lore_path)
+
+        memory, cold_ms = timed(manager)
+        embedded = embedder.texts
+        warm_ms = best_of(manager, repeat)
+
+        texts = [item["text"] for item in lore]
+        added = texts + ["Руна Ингуз открывает двери, запертые словом."]
+        _, update_ms = timed(lambda: memory.update_lore(added))
+        _, remove_ms = timed(lambda: memory.update_lore(texts))
+
+        retriever = memory.lore_retriever
+        return {
+            "entries": entries,
+            "embedded_texts": embedded,
+            "cold_ms": cold_ms,
+            "warm_ms": warm_ms,
+            "update_one_ms": update_ms,
+            "remove_one_ms": remove_ms,
+            "search_exact_ms": best_of(lambda: retriever.invoke(f"Руна {_RUNES[1]}-{entries // 2}"), repeat * 5),
+            "search_semantic_ms": best_of(lambda: retriever.invoke("как защититься от огня"), repeat * 5),
+        }
+
+
+def run(sizes=SIZES, repeat: int = 3) -> dict:
+    return {str(size): bench_size(size, repeat) for size in sizes}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    json.dump(run(args.sizes, args.repeat), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
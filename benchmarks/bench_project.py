@@ -0,0 +1,62 @@
+"""
+Сохранение и загрузка синтетической рукописи: Project.save/load (один JSON)
+и инкрементальное хранилище ProjectStore.
+
+Запуск: python -m benchmarks.bench_project [--scenes 1000]
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.bench_serialization import make_project
+from benchmarks.common import best_of, timed, workdir
+from core.project.project_model import Project
+from core.project.project_store import ProjectStore
+
+
+def run(scenes: int = 1000, repeat: int = 5) -> dict:
+    with workdir() as directory:
+        project = Project.from_dict(make_project(scenes))
+        json_path = directory / "project.json"
+        project.save(json_path)
+
+        root = directory / "projects"
+        _, full_save_ms = timed(lambda: ProjectStore(root).save(project))
+
+        def read_all():
+            loaded = ProjectStore(root).load(project.title)
+            return sum(len(sc.content) for ch in loaded.chapters for sc in ch.scenes)
+
+        store = ProjectStore(root)
+        scene = project.chapters[len(project.chapters) // 2].scenes[0]
+
+        def save_one():
+            scene.content += " Правка."
+            return store.save(project)
+
+        return {
+            "scenes": scenes,
+            "json_bytes": json_path.stat().st_size,
+            "json_save_ms": best_of(lambda: project.save(json_path), repeat),
+            "json_load_ms": best_of(lambda: Project.load(json_path), repeat),
+            "store_save_full_ms": full_save_ms,
+            # Новый ProjectStore — без кэша манифестов, как после перезапуска
+            "store_load_lazy_ms": best_of(lambda: ProjectStore(root).load(project.title), repeat),
+            "store_load_eager_ms": best_of(lambda: ProjectStore(root).load(project.title, lazy=False), repeat),
+            "store_read_all_ms": best_of(read_all, repeat),
+            "store_save_one_scene_ms": best_of(save_one, repeat),
+            "store_save_unchanged_ms": best_of(lambda: store.save(project), repeat),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenes", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    json.dump(run(args.scenes, args.repeat), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
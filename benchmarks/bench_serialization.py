@@ -0,0 +1,75 @@
+"""
+Сравнение слоя utils.serialization со стандартными json и yaml.safe_load
+на большом синтетическом проекте (главы, сцены с текстом) и лоре.
+
+Запуск: python -m benchmarks.bench_serialization [--scenes 1000]
+Результат печатается в формате JSON.
+"""
+import argparse
+import json
+import sys
+
+import yaml
+
+from benchmarks.common import best_of
+from utils import serialization
+
+
+def make_project(scenes: int, scene_chars: int = 2000) -> dict:
+    paragraph = "Ветер гнал по небу рваные облака, и замок на холме казался пустым. "
+    text = (paragraph * (scene_chars // len(paragraph) + 1))[:scene_chars]
+    per_chapter = 20
+    return {
+        "title": "Синтетическая рукопись",
+        "chapters": [
+            {
+                "title": f"Глава {c + 1}",
+                "scenes": [
+                    {"id": f"{c:04d}{s:04d}", "title": f"Сцена {s + 1}", "content": text}
+                    for s in range(min(per_chapter, scenes - c * per_chapter))
+                ]
+            }
+            for c in range((scenes + per_chapter - 1) // per_chapter)
+        ],
+        "characters": [{"name": f"Персонаж {i}", "description": "Рыжий малый", "traits": []} for i in range(200)]
+    }
+
+
+def run(scenes: int = 1000, lore_entries: int = 5000, repeat: int = 5) -> dict:
+    project = make_project(scenes)
+    # Файлы читаются байтами (read_bytes), поэтому и разбираем байты
+    project_text = json.dumps(project, ensure_ascii=False, indent=2).encode("utf-8")
+    lore = [{"text": f"Правило мира номер {i}: руна {i} защищает от огня."} for i in range(lore_entries)]
+    lore_text = yaml.safe_dump(lore, allow_unicode=True)
+
+    results = {
+        "project_bytes": len(project_text),
+        "json_dumps_stdlib_ms": best_of(lambda: json.dumps(project, ensure_ascii=False, indent=2), repeat),
+        "json_dumps_ms": best_of(lambda: serialization.json_dumps(project, indent=True), repeat),
+        "json_loads_stdlib_ms": best_of(lambda: json.loads(project_text), repeat),
+        "json_loads_ms": best_of(lambda: serialization.json_loads(project_text), repeat),
+        "lore_bytes": len(lore_text.encode("utf-8")),
+        "yaml_load_stdlib_ms": best_of(lambda: yaml.safe_load(lore_text), repeat),
+        "yaml_load_ms": best_of(lambda: serialization.yaml_loads(lore_text), repeat),
+        "yaml_dump_stdlib_ms": best_of(lambda: yaml.safe_dump(lore, allow_unicode=True), repeat),
+        "yaml_dump_ms": best_of(lambda: serialization.yaml_dumps(lore), repeat),
+        "orjson": serialization.orjson is not None,
+        "libyaml": serialization.SafeLoader is not yaml.SafeLoader,
+    }
+    for op in ("json_dumps", "json_loads", "yaml_load", "yaml_dump"):
+        results[f"{op}_speedup"] = results[f"{op}_stdlib_ms"] / max(results[f"{op}_ms"], 1e-6)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenes", type=int, default=1000)
+    parser.add_argument("--lore", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    json.dump(run(args.scenes, args.lore, args.repeat), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
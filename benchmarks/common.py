@@ -0,0 +1,43 @@
+"""Общие помощники бенчмарков: замер времени и временная рабочая папка"""
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def best_of(fn: Callable[[], Any], repeat: int) -> float:
+    """Лучшее время из repeat запусков, мс"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def timed(fn: Callable[[], Any]) -> Tuple[Any, float]:
+    """Результат fn и время одного запуска, мс"""
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+@contextmanager
+def workdir() -> Iterator[Path]:
+    """
+    Временная рабочая папка: пути по умолчанию (data/, logs/, projects/)
+    относительные, поэтому бенчмарки не трогают данные репозитория.
+    """
+    previous = os.getcwd()
+    directory = Path(tempfile.mkdtemp(prefix="writerai-bench-"))
+    os.chdir(directory)
+    try:
+        yield directory
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(directory, ignore_errors=True)
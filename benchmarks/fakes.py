@@ -0,0 +1,130 @@
+"""
+Детерминированные заглушки модели и эмбеддингов для бенчмарков.
+
+Ответы и векторы зависят только от входа, а задержки задаются явно,
+поэтому результаты воспроизводимы и не требуют запущенной Ollama.
+"""
+import asyncio
+import hashlib
+import time
+from typing import Any, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Чат-модель, которая отвечает фиксированным числом слов, выбранных
+    детерминированно по промпту.
+
+    :param ttft: Задержка до первого токена (время обработки промпта), с
+    :param tokens_per_sec: Скорость генерации; 0 — без задержки
+    :param response_tokens: Длина ответа в словах
+    """
+    ttft: float = 0.0
+    tokens_per_sec: float = 0.0
+    response_tokens: int = 32
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-bench"
+
+    def _words(self, messages: List[BaseMessage]) -> List[str]:
+        rng = np.random.default_rng(_seed("\n".join(str(m.content) for m in messages)))
+        vocabulary = ("замок", "ветер", "рыцарь", "дорога", "ночь", "огонь", "тень", "голос")
+        return [vocabulary[i] for i in rng.integers(0, len(vocabulary), self.response_tokens)]
+
+    def _metadata(self, messages: List[BaseMessage]) -> dict:
+        prompt_tokens = sum(len(str(m.content).split()) for m in messages)
+        eval_seconds = self.response_tokens / self.tokens_per_sec if self.tokens_per_sec else 0.0
+        # Формат статистики как у Ollama: длительности в наносекундах
+        return {
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(self.ttft * 1e9),
+            "eval_count": self.response_tokens,
+            "eval_duration": int(eval_seconds * 1e9),
+            "load_duration": 0
+        }
+
+    def get_num_tokens(self, text: str) -> int:
+        # Токены считаются по словам, без загрузки токенизатора transformers
+        return len(text.split())
+
+    def _token_delay(self) -> float:
+        return 1 / self.tokens_per_sec if self.tokens_per_sec else 0.0
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        time.sleep(self.ttft + self._token_delay() * self.response_tokens)
+        message = AIMessage(content=" ".join(self._words(messages)), response_metadata=self._metadata(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        await asyncio.sleep(self.ttft + self._token_delay() * self.response_tokens)
+        message = AIMessage(content=" ".join(self._words(messages)), response_metadata=self._metadata(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        self.calls += 1
+        time.sleep(self.ttft)
+        words = self._words(messages)
+        for i, word in enumerate(words):
+            time.sleep(self._token_delay())
+            last = i == len(words) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=word if i == 0 else " " + word,
+                response_metadata=self._metadata(messages) if last else {}))
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Эмбеддинги из хэша текста: одинаковый текст — одинаковый вектор.
+    Запоминает пакеты документов и запросы, которые пришлось посчитать
+    (batches, embedded, queries) — для проверок кэширования в тестах.
+
+    :param size: Размерность векторов
+    :param latency: Задержка на один вызов модели, с
+    :param per_text: Дополнительная задержка на каждый текст, с
+    """
+
+    def __init__(self, size: int = 256, latency: float = 0.0, per_text: float = 0.0):
+        self.size = size
+        self.latency = latency
+        self.per_text = per_text
+        self.model = f"fake-{size}"
+        self.calls = 0
+        self.texts = 0
+        self.batches: List[List[str]] = []
+        self.queries: List[str] = []
+
+    @property
+    def embedded(self) -> List[str]:
+        """Все посчитанные документы по порядку"""
+        return [text for batch in self.batches for text in batch]
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.random.default_rng(_seed(text)).standard_normal(self.size).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        self.batches.append(list(texts))
+        time.sleep(self.latency + self.per_text * len(texts))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        self.queries.append(text)
+        time.sleep(self.latency)
+        return self._vector(text)
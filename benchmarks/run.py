@@ -0,0 +1,116 @@
+"""
+Запуск всех бенчмарков с сохранением результатов в JSON.
+
+    python -m benchmarks.run --output bench.json [--quick] [--only lore logs]
+    python -m benchmarks.run --compare old.json new.json [--threshold 1.2]
+
+Сравнение печатает отношение new/old для всех замеров времени (*_ms)
+и завершается с кодом 1, если какой-то замер вырос больше threshold раз.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from typing import Callable, Dict, Iterator, Tuple
+
+from benchmarks import bench_handler, bench_imports, bench_logs, bench_lore, bench_project, bench_serialization
+from benchmarks.common import ROOT
+
+# Полный и быстрый (--quick) варианты каждого набора
+SUITES: Dict[str, Tuple[Callable[[], dict], Callable[[], dict]]] = {
+    "handler": (bench_handler.run, lambda: bench_handler.run(lore_entries=100, repeat=2)),
+    "lore": (bench_lore.run, lambda: bench_lore.run(sizes=(100, 1000), repeat=1)),
+    "project": (bench_project.run, lambda: bench_project.run(scenes=200, repeat=2)),
+    "logs": (bench_logs.run, lambda: bench_logs.run(entries=500, repeat=2)),
+    "imports": (bench_imports.run, lambda: bench_imports.run(repeat=1)),
+    "serialization": (bench_serialization.run,
+                      lambda: bench_serialization.run(scenes=200, lore_entries=1000, repeat=2)),
+}
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(suites=None, quick: bool = False) -> dict:
+    results = {}
+    for name in suites or SUITES:
+        full, short = SUITES[name]
+        print(f"[bench] {name}", file=sys.stderr)
+        results[name] = short() if quick else full()
+    return {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": quick
+        },
+        "results": results
+    }
+
+
+def _timings(data: dict, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    for key, value in data.items():
+        if isinstance(value, dict):
+            yield from _timings(value, f"{prefix}{key}.")
+        elif key.endswith("_ms") and isinstance(value, (int, float)):
+            yield prefix + key, value
+
+
+def compare(old: dict, new: dict, threshold: float = 1.2) -> Tuple[list, list]:
+    """
+    :return: (строки отчёта [(замер, old, new, отношение)], замеры с регрессией)
+    """
+    before = dict(_timings(old["results"]))
+    rows, regressions = [], []
+    for key, value in _timings(new["results"]):
+        if key not in before:
+            continue
+        ratio = value / before[key] if before[key] > 0 else float("inf")
+        rows.append((key, before[key], value, ratio))
+        # Замеры меньше миллисекунды слишком шумные, чтобы считать их регрессией
+        if ratio > threshold and value - before[key] > 1.0:
+            regressions.append(key)
+    return rows, regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", "-o", help="Файл для результатов (по умолчанию stdout)")
+    parser.add_argument("--quick", action="store_true", help="Уменьшенные размеры данных")
+    parser.add_argument("--only", nargs="+", choices=list(SUITES), help="Запустить только эти наборы")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Сравнить два файла результатов")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.compare[1], encoding="utf-8") as f:
+            new = json.load(f)
+        rows, regressions = compare(old, new, args.threshold)
+        print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+        for key, before, after, ratio in rows:
+            mark = "  <-- регрессия" if key in regressions else ""
+            print(f"{key:55s} {before:10.2f} {after:10.2f} {ratio:6.2f}x{mark}")
+        return 1 if regressions else 0
+
+    report = run(args.only, args.quick)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+
+from core.llm_handler import LLMHandler
+from core.scheduler import INTERACTIVE, SchedulerRejected, current_session, get_scheduler
+from logger.log_writer import log_interaction
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchResult:
+    """Результат одного запроса из пакета"""
+    index: int
+    prompt: str
+    text: Optional[str]
+    latency_ms: float
+    attempts: int
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BatchGenerator:
+    """
+    Параллельная генерация нескольких продолжений поверх LLMHandler.
+
+    Все промпты собираются из одного снимка контекста, поэтому альтернативные
+    варианты не влияют друг на друга и не попадают в буфер контекста.
+    Каждая попытка занимает слот модели в планировщике запросов: пакет
+    одной вкладки делит модель с остальными сессиями по очереди.
+    """
+
+    def __init__(
+        self,
+        handler: LLMHandler,
+        concurrency: int = 4,
+        timeout: Optional[float] = 120.0,
+        retries: int = 2,
+        backoff: float = 1.0
+    ):
+        """
+        :param handler: Обработчик, чья модель и шаблон используются
+        :param concurrency: Максимум одновременных запросов к модели
+        :param timeout: Таймаут одной попытки в секундах (None — без таймаута)
+        :param retries: Количество повторов после неудачной попытки
+        :param backoff: Базовая пауза перед повтором, удваивается с каждой попыткой
+        """
+        self.handler = handler
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    async def run(self, prompts: List[str], use_template: bool = True) -> AsyncIterator[BatchResult]:
+        """
+        Запускает пакет и отдаёт результаты в порядке завершения.
+        """
+        slots = get_scheduler().slots_for(self.handler.model_name)
+        if self.concurrency > slots:
+            logger.warning("Пакет: concurrency=%d больше слотов модели %s (%d) — лишние запросы ждут в очереди",
+                           self.concurrency, self.handler.model_name, slots)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        session = current_session()
+        tasks = [
+            asyncio.create_task(self._run_one(
+                i, prompt, self.handler.prepare_messages(prompt, use_template), semaphore, session))
+            for i, prompt in enumerate(prompts)
+        ]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def gather(self, prompts: List[str], use_template: bool = True) -> List[BatchResult]:
+        return [result async for result in self.run(prompts, use_template)]
+
+    async def _run_one(self, index: int, prompt: str, messages, semaphore: asyncio.Semaphore,
+                       session: str) -> BatchResult:
+        async with semaphore:
+            started = time.perf_counter()
+            error = None
+
+            for attempt in range(1, self.retries + 2):
+                try:
+                    response = await self._invoke(messages, session)
+                except SchedulerRejected as e:
+                    error = str(e)
+                except asyncio.TimeoutError:
+                    error = f"timeout after {self.timeout}s"
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                else:
+                    latency_ms = (time.perf_counter() - started) * 1000
+                    log_interaction(prompt=prompt, response=response.content, meta={
+                        "batch_index": index, "attempts": attempt, "latency_ms": latency_ms
+                    }, model_name=self.handler.model_name)
+                    return BatchResult(index, prompt, response.content, latency_ms, attempt)
+
+                if attempt <= self.retries:
+                    await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+
+            latency_ms = (time.perf_counter() - started) * 1000
+            return BatchResult(index, prompt, None, latency_ms, self.retries + 1, error)
+
+    async def _invoke(self, messages, session: str):
+        """Одна попытка: ожидание слота модели, затем запрос (таймаут — только на запрос)"""
+        scheduler = get_scheduler()
+        ticket = scheduler.enqueue(self.handler.model_name, INTERACTIVE, session)
+        try:
+            await asyncio.to_thread(scheduler.wait, ticket)
+            return await asyncio.wait_for(self.handler.llm.ainvoke(messages), self.timeout)
+        finally:
+            scheduler.release(ticket)
+
+
+def generate_batch(handler: LLMHandler, prompts: List[str], **kwargs) -> List[BatchResult]:
+    """
+    Синхронная обёртка: выполняет пакет и возвращает результаты в порядке завершения.
+    """
+    use_template = kwargs.pop("use_template", True)
+    return asyncio.run(BatchGenerator(handler, **kwargs).gather(prompts, use_template))
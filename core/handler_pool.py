@@ -0,0 +1,145 @@
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Optional
+
+from core.response_cache import get_response_cache
+
+if TYPE_CHECKING:
+    from core.llm_handler import LLMHandler
+
+DEFAULT_TEMPLATE_PATH = "core/prompts/base.json"
+
+
+class HandlerPool:
+    """
+    Общий для процесса пул LLMHandler с LRU-вытеснением.
+
+    Обработчики кэшируются по ключу (модель, температура, шаблон, проект,
+    память, seed, кэш ответов, раскладка промпта), поэтому повторные генерации не создают заново
+    клиента Ollama, память и FAISS-индекс, а состояние памяти сохраняется
+    между запросами. Вытесненные и сброшенные обработчики закрываются
+    (см. LLMHandler.close).
+    """
+
+    def __init__(self, max_size: int = 8, factory: Optional[Callable[..., "LLMHandler"]] = None):
+        """
+        :param factory: Конструктор обработчиков; по умолчанию LLMHandler,
+            который импортируется при первом запросе, а не вместе с пулом
+        """
+        self.max_size = max_size
+        self.factory = factory
+        self._handlers: "OrderedDict[tuple, LLMHandler]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Отдельная блокировка на ключ, чтобы один и тот же обработчик
+        # не собирался дважды и сборка не блокировала остальные ключи
+        self._key_locks: dict = {}
+
+    def get(
+        self,
+        model_name: str = "ollama:llama3",
+        temperature: float = 0.7,
+        template_path: str = DEFAULT_TEMPLATE_PATH,
+        project: Optional[str] = None,
+        use_memory: bool = True,
+        seed: Optional[int] = None,
+        use_cache: bool = False,
+        prompt_layout: str = "rolling"
+    ) -> "LLMHandler":
+        key = (model_name, float(temperature), template_path,
+               project, use_memory, seed, use_cache, prompt_layout)
+
+        with self._lock:
+            handler = self._handlers.get(key)
+            if handler is not None:
+                self._handlers.move_to_end(key)
+                return handler
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                handler = self._handlers.get(key)
+                if handler is not None:
+                    self._handlers.move_to_end(key)
+                    return handler
+
+            if self.factory is None:
+                from core.llm_handler import LLMHandler
+
+                self.factory = LLMHandler
+            handler = self.factory(
+                model_name=model_name,
+                temperature=temperature,
+                template_path=template_path,
+                use_memory=use_memory,
+                project=project,
+                seed=seed,
+                cache=get_response_cache() if use_cache else None,
+                prompt_layout=prompt_layout
+            )
+
+            with self._lock:
+                self._handlers[key] = handler
+                self._key_locks.pop(key, None)
+                evicted = []
+                while len(self._handlers) > self.max_size:
+                    evicted.append(self._handlers.popitem(last=False)[1])
+            # Закрытие дожидается фоновых обновлений памяти — вне общей блокировки
+            for stale in evicted:
+                stale.close()
+            return handler
+
+    def invalidate(
+        self,
+        template_path: Optional[str] = None,
+        project: Optional[str] = None,
+        memory_only: bool = False
+    ) -> int:
+        """
+        Удаляет из пула обработчики, подходящие под все заданные условия.
+        Без аргументов очищает пул целиком.
+        :return: количество удалённых обработчиков
+        """
+        with self._lock:
+            stale = [
+                key for key in self._handlers
+                if (template_path is None or key[2] == template_path)
+                and (project is None or key[3] == project)
+                and (not memory_only or key[4])
+            ]
+            handlers = [self._handlers.pop(key) for key in stale]
+        for handler in handlers:
+            handler.close()
+        return len(handlers)
+
+    def invalidate_lore(self) -> int:
+        """Лор общий для всех проектов — сбрасываем все обработчики с памятью"""
+        return self.invalidate(memory_only=True)
+
+    def refresh_lore(self) -> int:
+        """
+        Применяет изменения файла лора ко всем обработчикам с памятью на месте,
+        не теряя их сводку и память о персонажах.
+        :return: количество обновлённых обработчиков
+        """
+        with self._lock:
+            managers = [h.memory_manager for h in self._handlers.values()
+                        if getattr(h, "memory_manager", None) is not None]
+        for manager in managers:
+            manager.reload_lore()
+        return len(managers)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._handlers)
+
+
+_pool = HandlerPool()
+
+
+def get_handler(**kwargs) -> "LLMHandler":
+    """Получить обработчик из общего пула (создаётся при первом обращении)"""
+    return _pool.get(**kwargs)
+
+
+def get_pool() -> HandlerPool:
+    return _pool
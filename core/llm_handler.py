@@ -1,17 +1,42 @@
 import json
+import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Callable, Iterator, List, Optional, Tuple
 
 from langchain_ollama import ChatOllama
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, BaseMessage
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain.chains import ConversationChain
-from langchain.prompts import PromptTemplate
-from core.prompts.prompt_editor import load_prompt
 
 from logger.log_writer import log_interaction
 from core.memory.context_buffer import ContextBuffer
-from core.memory.memory_manager import MemoryManager
+from core.memory.context_assembler import ContextAssembler
+from utils.metrics import get_metrics
+from core.project.project_manager import get_memory_path, get_scene_index
+from core.response_cache import ResponseCache
+from core.scheduler import SPECULATIVE, get_scheduler
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+
+    from core.memory.memory_manager import MemoryManager
+
+MEMORY_SYSTEM_PROMPT = (
+    "Ты помощник писателя. Ниже — текущий контекст истории. "
+    "Продолжи историю на основе запроса автора."
+)
+
+
+@dataclass
+class Draft:
+    """Ответ, сгенерированный заранее и ещё не принятый в контекст (см. LLMHandler.draft)"""
+    prompt: str
+    messages: List[BaseMessage]
+    text: str
+    meta: dict
+    log_prompt: Optional[str] = None
 
 
 class LLMHandler:
@@ -20,58 +45,89 @@ class LLMHandler:
         model_name: str = "ollama:llama3",
         temperature: float = 0.7,
         template_path: str = "core/prompts/base.json",
-        use_memory: bool = False
+        use_memory: bool = False,
+        project: Optional[str] = None,
+        llm: Optional[BaseChatModel] = None,
+        seed: Optional[int] = None,
+        cache: Optional[ResponseCache] = None,
+        context_tokens: int = 4096,
+        prompt_layout: str = "rolling",
+        keep_alive: Optional[str] = "30m",
+        embeddings: Optional["Embeddings"] = None
     ):
         """
         :param model_name: Модель, например "ollama:llama3"
         :param temperature: Креативность модели
         :param template_path: Путь к JSON-файлу с prompt-шаблоном
         :param use_memory: Включить ли LangChain-память через MemoryManager
+        :param project: Имя проекта, к которому привязан обработчик
+        :param llm: Готовая чат-модель (например, заглушка в тестах) вместо клиента Ollama
+        :param seed: Фиксированный seed генерации
+        :param cache: Кэш ответов; используется только для детерминированных запросов
+        :param context_tokens: Бюджет токенов контекстного окна модели
+        :param prompt_layout: "rolling" — скользящее окно истории;
+            "stable" — неизменный префикс (система, примеры) и история, которая
+            только дописывается, чтобы Ollama переиспользовала KV-кэш промпта.
+            В режиме памяти история тогда берётся из этого же буфера,
+            а не из памяти сводки, которая сдвигает окно на каждом ходе
+        :param keep_alive: Сколько Ollama держит модель в памяти после запроса
+        :param embeddings: Модель эмбеддингов для памяти вместо общего сервиса Ollama
         """
+        if prompt_layout not in ("rolling", "stable"):
+            raise ValueError(f"Unsupported prompt layout: {prompt_layout}")
+        started = time.perf_counter()
         self.model_name = model_name
         self.temperature = temperature
         self.template_path = Path(template_path)
         self.use_memory = use_memory
+        self.project = project
+        self.seed = seed
+        self.cache = cache
+        self.context_tokens = context_tokens
+        self.prompt_layout = prompt_layout
+        self.keep_alive = keep_alive
+
+        self.llm: BaseChatModel = llm or self._get_llm()
+        # История ограничена бюджетом токенов, а не числом сообщений
+        if prompt_layout == "stable":
+            # Половина окна под историю, при переполнении — сброс до четверти окна
+            self.context = ContextBuffer(
+                max_messages=None, max_tokens=context_tokens // 2, shrink_to=0.5)
+        else:
+            self.context = ContextBuffer(max_messages=None, max_tokens=context_tokens)
+        self.assembler = ContextAssembler(budget=context_tokens)
+        self.last_metrics: dict = {}
 
-        self.llm: BaseChatModel = self._get_llm()
-        self.context = ContextBuffer(max_messages=5)
-
-        self.memory_manager: Optional[MemoryManager] = None
-        self.conversation_chain: Optional[ConversationChain] = None
+        self.memory_manager: Optional["MemoryManager"] = None
 
         if self.use_memory:
-            self.memory_manager = MemoryManager(self.llm)
-            memory = self.memory_manager.get_combined_memory()
-
-            custom_prompt = PromptTemplate(
-                input_variables=["input", "summary", "entities", "lore"],
-                template="""
-Ты помощник писателя. Вот текущий контекст:
-
-📘 Сводка сюжета:
-{summary}
-
-👤 Персонажи:
-{entities}
-
-🌍 Правила мира:
-{lore}
-
-Теперь продолжи историю на основе следующего запроса:
-{input}
-""".strip()
-            )
-
-            self.conversation_chain = ConversationChain(
-                llm=self.llm,
-                memory=memory,
-                prompt=custom_prompt
-            )
+            # Память и FAISS импортируются только для обработчиков с памятью
+            from core.memory.memory_manager import MemoryManager
+
+            # Для проекта в контекст попадают и близкие к запросу фрагменты его сцен,
+            # а сводка и персонажи сохраняются между перезапусками
+            scene_index = get_scene_index(project) if project else None
+            self.memory_manager = MemoryManager(
+                self.llm, embedding_model=embeddings, scene_index=scene_index,
+                memory_path=str(get_memory_path(project)) if project else None,
+                model_name=model_name)
+            if prompt_layout == "stable":
+                # Реплики из снимка памяти — начало истории после перезапуска
+                for message in self.memory_manager.summary_memory.chat_memory.messages:
+                    self.context.add(_role(message), message.content)
+
+        get_metrics().observe("handler_init", time.perf_counter() - started, memory=use_memory)
 
     def _get_llm(self) -> BaseChatModel:
         if self.model_name.startswith("ollama:"):
             model_id = self.model_name.split(":", 1)[1]
-            return ChatOllama(model=model_id, temperature=self.temperature)
+            return ChatOllama(
+                model=model_id,
+                temperature=self.temperature,
+                seed=self.seed,
+                num_ctx=self.context_tokens,
+                keep_alive=self.keep_alive
+            )
         raise ValueError(f"Unsupported model: {self.model_name}")
 
     def _load_prompt_template(self) -> dict:
@@ -86,70 +142,282 @@ class LLMHandler:
         """
         Генерация ответа, используя либо LangChain memory, либо локальный буфер.
         """
-        if self.use_memory and self.conversation_chain:
-            response = self.conversation_chain.predict(input=prompt)
-            log_interaction(prompt=prompt, response=response)
-            return response
+        if self.memory_manager is not None:
+            messages, stages = self._traced(self._memory_messages, prompt)
+            return self._complete(prompt, messages, stages, log_prompt=prompt)
 
         # Без памяти — обычная генерация с буфером
-        messages = []
-        if system_prompt:
-            messages.append(SystemMessage(content=system_prompt))
-
-        for m in self.context.buffer:
-            if m["role"] == "user":
-                messages.append(HumanMessage(content=m["content"]))
-            elif m["role"] == "assistant":
-                messages.append(AIMessage(content=m["content"]))
-
-        messages.append(HumanMessage(content=prompt))
+        messages, stages = self._traced(self._build_messages, prompt, system_prompt)
+        return self._complete(prompt, messages, stages)
 
-        response = self.llm.invoke(messages)
+    def generate_from_template(self, user_prompt: str) -> str:
+        """
+        Генерация ответа с использованием prompt-шаблона (если он задан).
+        """
+        if self.memory_manager is not None:
+            messages, stages = self._traced(self._memory_messages, user_prompt)
+            return self._complete(user_prompt, messages, stages, log_prompt=user_prompt)
 
-        self.context.add("user", prompt)
-        self.context.add("assistant", response.content)
+        messages, stages = self._traced(self._template_messages, user_prompt)
+        return self._complete(user_prompt, messages, stages)
 
-        log_interaction(prompt="\n".join(
-            [m.content for m in messages]), response=response.content)
+    def stream(self, prompt: str, system_prompt: Optional[str] = None) -> Iterator[str]:
+        """
+        Потоковый вариант generate: отдаёт фрагменты текста по мере генерации.
+        Контекст и лог обновляются, когда поток прочитан до конца.
+        """
+        if self.memory_manager is not None:
+            messages, stages = self._traced(self._memory_messages, prompt)
+            return self._stream(prompt, messages, stages, log_prompt=prompt)
 
-        return response.content
+        messages, stages = self._traced(self._build_messages, prompt, system_prompt)
+        return self._stream(prompt, messages, stages)
 
-    def generate_from_template(self, user_prompt: str) -> str:
+    def stream_from_template(self, user_prompt: str) -> Iterator[str]:
         """
-        Генерация ответа с использованием prompt-шаблона (если он задан).
+        Потоковый вариант generate_from_template.
         """
-        if self.use_memory and self.conversation_chain:
-            response = self.conversation_chain.predict(input=user_prompt)
-            log_interaction(prompt=user_prompt, response=response)
-            return response
-
-        template = json.loads(load_prompt(str(self.template_path)))
-        messages = []
+        if self.memory_manager is not None:
+            messages, stages = self._traced(self._memory_messages, user_prompt)
+            return self._stream(user_prompt, messages, stages, log_prompt=user_prompt)
 
-        if "system" in template:
-            messages.append(SystemMessage(content=template["system"]))
+        messages, stages = self._traced(self._template_messages, user_prompt)
+        return self._stream(user_prompt, messages, stages)
 
-        for ex in template.get("examples", []):
-            messages.append(HumanMessage(content=ex.get("user", "")))
-            messages.append(AIMessage(content=ex.get("assistant", "")))
+    def prepare_messages(self, user_prompt: str, use_template: bool = True) -> List[BaseMessage]:
+        """
+        Собирает сообщения для запроса, не изменяя контекст и память.
+        """
+        if self.memory_manager is not None:
+            return self._memory_messages(user_prompt)
+        if use_template:
+            return self._template_messages(user_prompt)
+        return self._build_messages(user_prompt)
+
+    def draft(self, user_prompt: str, cancel: Optional[threading.Event] = None,
+              use_template: bool = True, adopted: Optional[threading.Event] = None) -> Optional[Draft]:
+        """
+        Фоновая генерация ответа без изменения контекста, памяти и лога.
+        Запросы к модели идут с низшим приоритетом (SPECULATIVE); генерация
+        прерывается, если установлен cancel или модель понадобилась автору.
+        :param adopted: Установлен, когда автор уже ждёт этот черновик, — тогда
+            генерация дописывается до конца, не уступая модель, как интерактивная
+        :return: черновик для accept_draft или None, если генерация прервана
+        """
+        scheduler = get_scheduler()
+        with scheduler.priority(SPECULATIVE):
+            messages = self.prepare_messages(user_prompt, use_template)
+            started = time.perf_counter()
+            chunks = []
+            server_metrics = {}
+            with scheduler.slot(self.model_name), closing(self.llm.stream(messages)) as stream:
+                for chunk in stream:
+                    if cancel is not None and cancel.is_set():
+                        return None
+                    if not (adopted is not None and adopted.is_set()) and scheduler.should_yield(self.model_name, SPECULATIVE):
+                        return None
+                    chunks.append(chunk.content)
+                    server_metrics = _ollama_metrics(chunk) or server_metrics
+
+        log_prompt = user_prompt if self.memory_manager is not None else None
+        return Draft(user_prompt, messages, "".join(chunks), {
+            "stream": False,
+            "draft_latency_ms": (time.perf_counter() - started) * 1000,
+            "prompt_layout": self.prompt_layout,
+            **server_metrics
+        }, log_prompt)
+
+    def accept_draft(self, draft: Draft) -> str:
+        """
+        Принимает черновик как обычный ход: ответ попадает в контекст и память,
+        запрос логируется с пометкой speculative. Контекст берётся тот,
+        с которым черновик собирался.
+        """
+        self._finish(draft.prompt, draft.messages, draft.text, draft.log_prompt, {
+            # Автор получает ответ сразу, а время модели ушло на фоновую генерацию
+            **draft.meta, "ttft_ms": 0.0, "latency_ms": draft.meta["draft_latency_ms"],
+            "cache_hit": False, "speculative": True
+        })
+        return draft.text
+
+    def _traced(self, build: Callable[..., List[BaseMessage]], *args) -> Tuple[List[BaseMessage], dict]:
+        """
+        Собирает сообщения и длительности этапов сборки (мс) для meta лога.
+        """
+        with get_metrics().trace() as stages:
+            messages = build(*args)
+        return messages, stages
 
-        for m in self.context.buffer:
-            if m["role"] == "user":
-                messages.append(HumanMessage(content=m["content"]))
-            elif m["role"] == "assistant":
-                messages.append(AIMessage(content=m["content"]))
+    def _build_messages(
+        self,
+        user_prompt: str,
+        system_prompt: Optional[str] = None,
+        examples: Optional[List[dict]] = None
+    ) -> List[BaseMessage]:
+        with get_metrics().span("prompt_assembly"):
+            return self.assembler.assemble(
+                user_prompt,
+                system_prompt=system_prompt,
+                examples=examples,
+                history=self.context
+            )
 
-        messages.append(HumanMessage(content=user_prompt))
+    def _template_messages(self, user_prompt: str) -> List[BaseMessage]:
+        template = self._load_prompt_template()
+        return self._build_messages(
+            user_prompt,
+            system_prompt=template.get("system"),
+            examples=template.get("examples", [])
+        )
 
-        response = self.llm.invoke(messages)
+    def _memory_messages(self, user_prompt: str) -> List[BaseMessage]:
+        """
+        Собирает промпт из разделов памяти в пределах бюджета context_tokens.
+        Перед этим дожидается фоновых обновлений памяти от прошлых ответов.
+        Загрузка памяти не обращается к модели (см. DeferredEntityMemory).
+        """
+        metrics = get_metrics()
+        with metrics.span("memory_flush"):
+            self.memory_manager.flush()
+        with metrics.span("memory_load"):
+            memory = self.memory_manager.load_context(user_prompt)
+        with metrics.span("prompt_assembly"):
+            stable = self.prompt_layout == "stable"
+            if stable:
+                history = self.context
+            else:
+                history = ContextBuffer(max_messages=None, counter=self.assembler.counter)
+                for message in memory["history"]:
+                    history.add(_role(message), message.content)
+            return self.assembler.assemble(
+                user_prompt,
+                system_prompt=MEMORY_SYSTEM_PROMPT,
+                lore=memory["lore"],
+                history=history,
+                characters=memory["characters"],
+                summary=memory["summary"],
+                scenes=memory["scenes"],
+                history_first=stable
+            )
 
+    def _remember(self, user_prompt: str, response: str):
+        if self.memory_manager is not None:
+            # Сводка и персонажи обновятся в фоне, не задерживая ответ
+            self.memory_manager.save_context({"input": user_prompt}, {"response": response})
+            if self.prompt_layout != "stable":
+                return
         self.context.add("user", user_prompt)
-        self.context.add("assistant", response.content)
-
-        log_interaction(prompt="\n".join(
-            [m.content for m in messages]), response=response.content)
+        self.context.add("assistant", response)
 
-        return response.content
+    def _cache_key(self, messages: List[BaseMessage]) -> Optional[str]:
+        """
+        Ключ кэша для запроса или None, если ответ недетерминирован:
+        при temperature > 0 кэш используется только с зафиксированным seed.
+        """
+        if self.cache is None or (self.temperature > 0 and self.seed is None):
+            return None
+        return ResponseCache.make_key(self.model_name, self.temperature, self.seed, messages)
+
+    def _complete(self, user_prompt: str, messages: List[BaseMessage], stages: Optional[dict] = None,
+                  log_prompt: Optional[str] = None) -> str:
+        started = time.perf_counter()
+        cache_key = self._cache_key(messages)
+        response = self.cache.get(cache_key) if cache_key else None
+        cache_hit = response is not None
+
+        server_metrics = {}
+
+        if not cache_hit:
+            with get_scheduler().slot(self.model_name):
+                message = self.llm.invoke(messages)
+            response = message.content
+            server_metrics = _ollama_metrics(message)
+            if cache_key:
+                self.cache.put(cache_key, response)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        # Без стриминга первый токен приходит вместе со всем ответом
+        self._finish(user_prompt, messages, response, log_prompt, {
+            "stream": False, "ttft_ms": elapsed_ms, "latency_ms": elapsed_ms, "cache_hit": cache_hit,
+            "prompt_layout": self.prompt_layout, **server_metrics
+        }, stages)
+        return response
+
+    def _stream(self, user_prompt: str, messages: List[BaseMessage], stages: Optional[dict] = None,
+                log_prompt: Optional[str] = None) -> Iterator[str]:
+        started = time.perf_counter()
+        ttft_ms = None
+        cache_key = self._cache_key(messages)
+        cached = self.cache.get(cache_key) if cache_key else None
+
+        server_metrics = {}
+
+        if cached is not None:
+            ttft_ms = (time.perf_counter() - started) * 1000
+            chunks = [cached]
+            yield cached
+        else:
+            chunks = []
+            with get_scheduler().slot(self.model_name):
+                for chunk in self.llm.stream(messages):
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                    chunks.append(chunk.content)
+                    # Статистика Ollama приходит в последнем фрагменте
+                    server_metrics = _ollama_metrics(chunk) or server_metrics
+                    yield chunk.content
+            if cache_key:
+                self.cache.put(cache_key, "".join(chunks))
+
+        self._finish(user_prompt, messages, "".join(chunks), log_prompt, {
+            "stream": True,
+            "ttft_ms": ttft_ms,
+            "latency_ms": (time.perf_counter() - started) * 1000,
+            "cache_hit": cached is not None,
+            "prompt_layout": self.prompt_layout,
+            **server_metrics
+        }, stages)
+
+    def _finish(self, user_prompt: str, messages: List[BaseMessage], response: str, log_prompt: Optional[str],
+                meta: dict, stages: Optional[dict] = None):
+        self._remember(user_prompt, response)
+        self._record_metrics(meta, stages)
+        self.last_metrics = meta
+
+        # Фрагменты промпта логируются по отдельности, чтобы общий префикс
+        # (системный промпт, примеры, история) хранился один раз
+        segments = None if log_prompt is not None else [(m.type, m.content) for m in messages]
+        with get_metrics().span("logging"):
+            log_interaction(prompt=log_prompt, response=response, meta=meta,
+                            model_name=self.model_name, segments=segments)
+
+    def _record_metrics(self, meta: dict, stages: Optional[dict]):
+        """
+        Отправляет длительности запроса в реестр метрик и дополняет meta
+        этапами сборки промпта и генерации (мс).
+        """
+        metrics = get_metrics()
+        stages = dict(stages or {})
+        stages["llm"] = meta["latency_ms"]
+        metrics.observe("llm", meta["latency_ms"] / 1000, model=self.model_name)
+        metrics.inc("llm_requests", model=self.model_name, cache_hit=meta["cache_hit"])
+
+        if "prompt_eval_ms" in meta:
+            stages["llm_prompt_eval"] = meta["prompt_eval_ms"]
+            stages["llm_eval"] = meta["eval_ms"]
+            metrics.observe("llm_prompt_eval", meta["prompt_eval_ms"] / 1000, model=self.model_name)
+            metrics.observe("llm_eval", meta["eval_ms"] / 1000, model=self.model_name)
+            metrics.inc("llm_tokens", meta.get("prompt_eval_count") or 0, model=self.model_name, kind="prompt")
+            metrics.inc("llm_tokens", meta.get("eval_count") or 0, model=self.model_name, kind="eval")
+        meta["stages"] = stages
+
+    def close(self):
+        """
+        Освобождает ресурсы памяти (фоновый поток, файл снимка).
+        Вызывается пулом, когда обработчик вытесняется или сбрасывается.
+        """
+        if self.memory_manager is not None:
+            self.memory_manager.close()
 
     def get_context_data(self) -> dict:
         """
@@ -164,3 +432,34 @@ class LLMHandler:
                 "characters": {},
                 "lore": []
             }
+
+
+def _role(message: BaseMessage) -> str:
+    return "user" if isinstance(message, HumanMessage) else "assistant"
+
+
+def _ollama_metrics(message) -> dict:
+    """
+    Время обработки промпта и генерации из метаданных ответа Ollama.
+    Длительности Ollama отдаёт в наносекундах.
+    """
+    metadata = getattr(message, "response_metadata", None)
+    if not isinstance(metadata, dict) or "prompt_eval_duration" not in metadata:
+        return {}
+
+    metrics = {
+        "prompt_eval_count": metadata.get("prompt_eval_count"),
+        "prompt_eval_ms": metadata.get("prompt_eval_duration", 0) / 1e6,
+        "eval_count": metadata.get("eval_count"),
+        "eval_ms": metadata.get("eval_duration", 0) / 1e6,
+        "load_ms": metadata.get("load_duration", 0) / 1e6
+    }
+    metrics["prompt_tokens_per_sec"] = _rate(metrics["prompt_eval_count"], metrics["prompt_eval_ms"])
+    metrics["tokens_per_sec"] = _rate(metrics["eval_count"], metrics["eval_ms"])
+    return metrics
+
+
+def _rate(tokens: Optional[int], duration_ms: float) -> Optional[float]:
+    if not tokens or not duration_ms:
+        return None
+    return tokens / duration_ms * 1000
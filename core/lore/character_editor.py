@@ -1,38 +1,70 @@
-import yaml
 from pathlib import Path
 
+from core.lore.character_repository import (
+    CharacterRepository,
+    DirectoryCharacterBackend,
+    YamlCharacterBackend,
+)
+
 CHARACTER_FILE = Path("data/characters.yaml")
+# Если папка существует, каждый персонаж хранится в отдельном файле
+CHARACTER_DIR = Path("data/characters")
+
+_repository = None
+
+
+def get_repository() -> CharacterRepository:
+    """Общий репозиторий персонажей процесса"""
+    global _repository
+    if _repository is None:
+        if CHARACTER_DIR.is_dir():
+            backend = DirectoryCharacterBackend(CHARACTER_DIR)
+        else:
+            backend = YamlCharacterBackend(CHARACTER_FILE)
+        _repository = CharacterRepository(backend)
+    return _repository
+
+
+def migrate_to_directory() -> int:
+    """
+    Переносит персонажей из data/characters.yaml в data/characters/
+    (по файлу на персонажа) и переключает репозиторий на новый формат.
+    :return: количество перенесённых персонажей
+    """
+    global _repository
+    characters = CharacterRepository(YamlCharacterBackend(CHARACTER_FILE)).all()
+    CHARACTER_DIR.mkdir(parents=True, exist_ok=True)
+    repository = CharacterRepository(DirectoryCharacterBackend(CHARACTER_DIR))
+    for name, data in characters.items():
+        repository.upsert(name, data)
+    _repository = repository
+    return len(characters)
 
 
 def load_characters():
-    if CHARACTER_FILE.exists():
-        with open(CHARACTER_FILE, "r", encoding="utf-8") as f:
-            return yaml.safe_load(f) or {}
-    return {}
+    return get_repository().all()
 
 
 def save_characters(characters):
-    with open(CHARACTER_FILE, "w", encoding="utf-8") as f:
-        yaml.dump(characters, f, allow_unicode=True)
+    repository = get_repository()
+    for name in repository.list():
+        if name not in characters:
+            repository.delete(name)
+    for name, data in characters.items():
+        repository.upsert(name, data)
 
 
 def get_character(name):
-    characters = load_characters()
-    return characters.get(name)
+    return get_repository().get(name)
 
 
 def add_or_update_character(name, data):
-    characters = load_characters()
-    characters[name] = data
-    save_characters(characters)
+    get_repository().upsert(name, data)
 
 
 def delete_character(name):
-    characters = load_characters()
-    if name in characters:
-        del characters[name]
-        save_characters(characters)
+    get_repository().delete(name)
 
 
 def list_characters():
-    return list(load_characters().keys())
+    return get_repository().list()
@@ -0,0 +1,171 @@
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from core.memory.bm25_index import stem
+from utils.serialization import read_yaml, write_yaml
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Сколько букв окончания допускается после имени: «Артур» — «Артура», «Артуром»
+MAX_ENDING = 2
+
+
+def _normalize_name(name: str) -> str:
+    return name.strip().casefold().replace("ё", "е")
+
+
+def _mentions(word: str, words: set, stems: set) -> bool:
+    if word in words or stem(word) in stems:
+        return True
+    return any(w.startswith(word) and len(w) - len(word) <= MAX_ENDING for w in words)
+
+
+class YamlCharacterBackend:
+    """Все персонажи в одном YAML-файле (формат data/characters.yaml)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def version(self):
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self) -> Dict[str, dict]:
+        return read_yaml(self.path) or {}
+
+    def save(self, name: str, characters: Dict[str, dict]):
+        write_yaml(self.path, characters)
+
+    def delete(self, name: str, characters: Dict[str, dict]):
+        write_yaml(self.path, characters)
+
+
+class DirectoryCharacterBackend:
+    """
+    Один YAML-файл на персонажа: сохранение переписывает только его файл.
+    Имя персонажа хранится внутри файла, имя файла — производное от него.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def _file(self, name: str) -> Path:
+        return self.directory / (re.sub(r'[\\/:*?"<>|\s]+', "_", name.strip()) + ".yaml")
+
+    def version(self):
+        if not self.directory.exists():
+            return None
+        with os.scandir(self.directory) as entries:
+            return tuple(sorted(
+                (e.name, e.stat().st_mtime_ns, e.stat().st_size)
+                for e in entries if e.name.endswith(".yaml")))
+
+    def load(self) -> Dict[str, dict]:
+        characters = {}
+        for path in sorted(self.directory.glob("*.yaml")):
+            data = read_yaml(path) or {}
+            name = data.pop("name", path.stem)
+            characters[name] = data
+        return characters
+
+    def save(self, name: str, characters: Dict[str, dict]):
+        write_yaml(self._file(name), {"name": name, **characters[name]})
+
+    def delete(self, name: str, characters: Dict[str, dict]):
+        path = self._file(name)
+        if path.exists():
+            path.unlink()
+
+
+class CharacterRepository:
+    """
+    Кэширующий репозиторий персонажей.
+
+    Данные читаются с диска только когда backend сообщает о новой версии
+    (mtime/размер файлов), поиск по имени идёт через индекс без учёта
+    регистра. Запись атомарная; формат хранения задаёт backend.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.RLock()
+        self._version = object()
+        self._characters: Dict[str, dict] = {}
+        self._index: Dict[str, str] = {}
+
+    def _fresh(self) -> Dict[str, dict]:
+        with self._lock:
+            version = self.backend.version()
+            if version != self._version:
+                self._characters = self.backend.load()
+                self._index = {_normalize_name(n): n for n in self._characters}
+                self._version = version
+            return self._characters
+
+    def list(self) -> List[str]:
+        return list(self._fresh())
+
+    def all(self) -> Dict[str, dict]:
+        return dict(self._fresh())
+
+    def get(self, name: str) -> Optional[dict]:
+        return self._fresh().get(name)
+
+    def find(self, name: str) -> Optional[str]:
+        """Имя персонажа так, как оно записано в репозитории, или None"""
+        with self._lock:
+            self._fresh()
+            return self._index.get(_normalize_name(name))
+
+    def upsert(self, name: str, data: dict):
+        with self._lock:
+            characters = self._fresh()
+            characters[name] = data
+            self._index[_normalize_name(name)] = name
+            self.backend.save(name, characters)
+            self._version = self.backend.version()
+
+    def delete(self, name: str):
+        with self._lock:
+            characters = self._fresh()
+            if name not in characters:
+                return
+            del characters[name]
+            self._index.pop(_normalize_name(name), None)
+            self.backend.delete(name, characters)
+            self._version = self.backend.version()
+
+    def mentioned(self, text: str) -> List[str]:
+        """
+        Персонажи, упомянутые в тексте, с учётом падежных окончаний.
+        Составное имя считается упомянутым, если встретились все его слова.
+        """
+        words = set(_WORD_RE.findall(_normalize_name(text)))
+        if not words:
+            return []
+        stems = {stem(w) for w in words}
+        with self._lock:
+            names = list(self._fresh())
+        return [
+            name for name in names
+            if all(_mentions(w, words, stems) for w in _WORD_RE.findall(_normalize_name(name)))
+        ]
+
+    def describe(self, name: str) -> Optional[str]:
+        """Описание персонажа одной строкой для промпта"""
+        canonical = self.find(name)
+        if canonical is None:
+            return None
+        data = self._fresh().get(canonical) or {}
+        parts = [f"{canonical} — {data['role']}" if data.get("role") else canonical]
+        for label, key in (("Описание", "description"), ("Черты", "traits"), ("Мотивация", "motivation")):
+            if data.get(key):
+                parts.append(f"{label}: {data[key]}")
+        return ". ".join(parts)
+
@@ -1,11 +1,11 @@
 import streamlit as st
-from core.llm_handler import LLMHandler
+from core.handler_pool import get_handler, get_pool
 
 
 def lore_editor_ui():
     st.title("🌍 Редактор Лора")
 
-    handler = LLMHandler(use_memory=True)
+    handler = get_handler(use_memory=True)
     memory = handler.memory_manager  # доступ к MemoryManager
 
     # Получаем текущий лор
@@ -19,4 +19,6 @@ def lore_editor_ui():
         new_lore = [line.strip()
                     for line in edited.splitlines() if line.strip()]
         memory.update_lore(new_lore)
+        # Остальные обработчики в пуле подхватывают изменения точечно
+        get_pool().refresh_lore()
         st.success("Лор обновлён и сохранён!")
@@ -0,0 +1,115 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple
+
+# Служебные слова, которые встречаются почти в каждой записи и только шумят
+STOPWORDS = frozenset("""
+и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по
+только ее её мне было вот от меня еще ещё нет о из ему теперь когда даже ну ли если
+уже или ни быть был него до вас нибудь опять уж вам ведь там потом себя ничего ей
+может они тут где есть надо ней для мы тебя их чем была сам чтоб без будто чего раз
+тоже себе под будет ж тогда кто этот того потому этого какой совсем ним здесь этом
+один почти мой тем чтобы нее сейчас были куда зачем всех никогда можно при наконец
+два об другой хоть после над больше тот через эти нас про всего них какая много
+разве три эту моя впрочем хорошо свою этой перед иногда лучше чуть том нельзя такой
+им более всегда конечно всю между это
+the a an of to in and or is are
+""".split())
+
+# Окончания для лёгкого стемминга, от длинных к коротким
+SUFFIXES = sorted("""
+иями ями ами ией иям иях ость ости остью ого его ому ему ыми ими ешь ишь ете ите
+ется ются ится ятся ался ился ило ыла ила ыло ать ять ить еть уть
+ой ей ый ий ая яя ое ее ые ие ом ем ам ям ах ях ов ев ую юю ью ию ся сь
+а я о е ы и у ю ь й
+""".split(), key=len, reverse=True)
+
+MIN_STEM = 3
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def stem(word: str) -> str:
+    """Отрезает одно самое длинное окончание, оставляя основу не короче MIN_STEM"""
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Слова текста в нижнем регистре, без служебных слов, со стеммингом"""
+    words = _WORD_RE.findall(text.lower().replace("ё", "е"))
+    return [stem(w) for w in words if len(w) > 1 and w not in STOPWORDS]
+
+
+class Hit(NamedTuple):
+    doc_id: str
+    score: float
+    matched: int  # сколько разных термов запроса нашлось в документе
+
+
+class BM25Index:
+    """
+    Инвертированный индекс с ранжированием BM25.
+
+    Документы идентифицируются внешними id и добавляются/удаляются
+    по одному, поэтому индекс можно менять без перестройки.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, List[str]] = {}
+        self.lengths: Dict[str, int] = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.lengths
+
+    def add(self, doc_id: str, text: str):
+        if doc_id in self.lengths:
+            self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.doc_terms[doc_id] = list(terms)
+        length = sum(terms.values())
+        self.lengths[doc_id] = length
+        self.total_length += length
+
+    def remove(self, doc_id: str):
+        if doc_id not in self.lengths:
+            return
+        for term in self.doc_terms.pop(doc_id):
+            docs = self.postings[term]
+            del docs[doc_id]
+            if not docs:
+                del self.postings[term]
+        self.total_length -= self.lengths.pop(doc_id)
+
+    def search(self, query: str, k: int = 5) -> List[Hit]:
+        if not self.lengths:
+            return []
+        n = len(self.lengths)
+        avg_length = self.total_length / n or 1
+
+        scores: Dict[str, float] = {}
+        matched: Counter = Counter()
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = 1 - self.b + self.b * self.lengths[doc_id] / avg_length
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+                matched[doc_id] += 1
+
+        ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [Hit(doc_id, scores[doc_id], matched[doc_id]) for doc_id in ranked]
@@ -0,0 +1,152 @@
+from typing import List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from core.memory.context_buffer import ContextBuffer
+from core.memory.token_counter import TokenCounter, get_token_counter
+
+# Накладные токены на служебную разметку одного сообщения
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_HEADER = "Сводка сюжета:"
+CHARACTERS_HEADER = "Персонажи:"
+LORE_HEADER = "Правила мира:"
+SCENES_HEADER = "Из написанных сцен:"
+
+
+class ContextAssembler:
+    """
+    Сборка контекста запроса в пределах бюджета токенов.
+
+    Порядок заполнения бюджета: системный промпт и сам запрос (обязательно),
+    затем примеры из шаблона, найденный лор, персонажи, сводка сюжета,
+    реплики истории от новых к старым и, в последнюю очередь, фрагменты
+    написанных сцен. Сводка и реплика, которые не помещаются целиком,
+    обрезаются с начала; более старые реплики отбрасываются. Из списков
+    (лор, персонажи, сцены) берутся только целые записи. С history_first
+    история заполняется сразу после примеров — раньше меняющихся разделов.
+
+    В промпте разделы идут от неизменных к меняющимся: система, примеры,
+    история, затем найденный по запросу лор, сводка, персонажи и сцены,
+    и последним — запрос. Так начало промпта совпадает между ходами
+    и Ollama переиспользует его KV-кэш.
+    """
+
+    def __init__(self, budget: int = 4096, reserve: int = 512,
+                 counter: Optional[TokenCounter] = None, min_turn_tokens: int = 32):
+        """
+        :param budget: Размер контекстного окна модели в токенах
+        :param reserve: Сколько токенов оставить на ответ модели
+        :param min_turn_tokens: Меньше этого реплику не обрезаем, а отбрасываем
+        """
+        self.budget = budget
+        self.reserve = reserve
+        self.counter = counter or get_token_counter()
+        self.min_turn_tokens = min_turn_tokens
+
+    def assemble(
+        self,
+        user_prompt: str,
+        system_prompt: Optional[str] = None,
+        examples: Optional[List[dict]] = None,
+        lore: Optional[List[str]] = None,
+        history: Optional[ContextBuffer] = None,
+        characters: Optional[List[str]] = None,
+        summary: Optional[str] = None,
+        scenes: Optional[List[str]] = None,
+        history_first: bool = False
+    ) -> List[BaseMessage]:
+        """
+        :param history_first: Отдать бюджет истории раньше лора, персонажей и сводки,
+            чтобы она не обрезалась из-за них и начало промпта не сдвигалось
+        """
+        left = self.budget - self.reserve
+
+        prompt_cost = self._cost(user_prompt)
+        system = system_prompt or ""
+        if system:
+            system = self.counter.truncate(system, left - prompt_cost - MESSAGE_OVERHEAD, keep_end=False)
+            left -= self._cost(system)
+        left -= prompt_cost
+
+        example_messages = []
+        for ex in examples or []:
+            pair = [HumanMessage(content=ex.get("user", "")),
+                    AIMessage(content=ex.get("assistant", ""))]
+            cost = sum(self._cost(m.content) for m in pair)
+            if cost > left:
+                break
+            example_messages.extend(pair)
+            left -= cost
+
+        turns = []
+        if history_first:
+            turns, left = self._fit_history(history, left)
+
+        lore_section, left = self._fit(LORE_HEADER, [f"- {item}" for item in lore or []], left)
+        character_section, left = self._fit(CHARACTERS_HEADER, characters, left)
+
+        summary_section = ""
+        summary_room = left - MESSAGE_OVERHEAD - self.counter.count(SUMMARY_HEADER) - 1
+        if summary and summary_room >= self.min_turn_tokens:
+            summary_section = f"{SUMMARY_HEADER}\n{self.counter.truncate(summary, summary_room)}"
+            left -= self._cost(summary_section)
+
+        if not history_first:
+            turns, left = self._fit_history(history, left)
+
+        scene_section, left = self._fit(SCENES_HEADER, scenes, left, separator="\n---\n")
+
+        messages: List[BaseMessage] = []
+        if system:
+            messages.append(SystemMessage(content=system))
+        messages.extend(example_messages)
+        for turn in reversed(turns):
+            if turn["role"] == "user":
+                messages.append(HumanMessage(content=turn["content"]))
+            elif turn["role"] == "assistant":
+                messages.append(AIMessage(content=turn["content"]))
+        for section in (lore_section, summary_section, character_section, scene_section):
+            if section:
+                messages.append(SystemMessage(content=section))
+        messages.append(HumanMessage(content=user_prompt))
+        return messages
+
+    def _fit_history(self, history: Optional[ContextBuffer], left: int) -> Tuple[List[dict], int]:
+        """Реплики от новых к старым; не поместившаяся целиком обрезается с начала"""
+        turns = []
+        if history is None:
+            return turns, left
+        for turn, tokens in history.turns():
+            cost = tokens + MESSAGE_OVERHEAD
+            if cost <= left:
+                turns.append(turn)
+                left -= cost
+                continue
+            if left - MESSAGE_OVERHEAD >= self.min_turn_tokens:
+                content = self.counter.truncate(turn["content"], left - MESSAGE_OVERHEAD)
+                turns.append({"role": turn["role"], "content": content})
+                left -= self._cost(content)
+            break
+        return turns, left
+
+    def _fit(self, header: str, items: Optional[List[str]], left: int,
+             separator: str = "\n") -> Tuple[str, int]:
+        """
+        Раздел из заголовка и целых записей, взятых по порядку, пока он помещается в бюджет.
+        :return: текст раздела (пустой, если не поместилась ни одна запись) и остаток бюджета
+        """
+        kept = []
+        cost = self.counter.count(header) + MESSAGE_OVERHEAD
+        for item in items or []:
+            item_cost = self.counter.count(item) + self.counter.count(separator) + 1
+            if cost + item_cost > left:
+                break
+            kept.append(item)
+            cost += item_cost
+        if not kept:
+            return "", left
+        return header + "\n" + separator.join(kept), left - cost
+
+    def _cost(self, text: str) -> int:
+        return self.counter.count(text) + MESSAGE_OVERHEAD
@@ -1,12 +1,59 @@
+from collections import deque
+from typing import Iterator, Optional, Tuple
+
+from core.memory.token_counter import TokenCounter, get_token_counter
+
+
 class ContextBuffer:
-    def __init__(self, max_messages=5):
+    """
+    Буфер последних реплик диалога.
+
+    Ограничивается числом сообщений и/или суммарным числом токенов.
+    Токены каждой реплики считаются один раз при добавлении, а общий
+    итог поддерживается инкрементально.
+
+    По умолчанию окно сдвигается на одну реплику при каждом переполнении.
+    С shrink_to < 1 при переполнении отбрасывается сразу большая часть
+    старых реплик (до shrink_to * max_tokens), и следующие запросы снова
+    только дописываются в конец — так начало промпта долго остаётся неизменным.
+    """
+
+    def __init__(self, max_messages: Optional[int] = 5, max_tokens: Optional[int] = None,
+                 counter: Optional[TokenCounter] = None, shrink_to: float = 1.0):
         self.max_messages = max_messages
-        self.buffer = []
+        self.max_tokens = max_tokens
+        self.shrink_to = shrink_to
+        self.counter = counter or get_token_counter()
+        self.buffer = deque()
+        self._tokens = deque()
+        self.total_tokens = 0
 
     def add(self, role: str, content: str):
+        tokens = self.counter.count(content)
         self.buffer.append({"role": role, "content": content})
-        if len(self.buffer) > self.max_messages:
-            self.buffer.pop(0)
+        self._tokens.append(tokens)
+        self.total_tokens += tokens
+
+        if not self._over_limit(1.0):
+            return
+        # Последняя реплика остаётся, даже если одна превышает лимит
+        while len(self.buffer) > 1 and self._over_limit(self.shrink_to):
+            self.buffer.popleft()
+            self.total_tokens -= self._tokens.popleft()
+
+    def _over_limit(self, ratio: float) -> bool:
+        if self.max_messages is not None and len(self.buffer) > self.max_messages * ratio:
+            return True
+        return self.max_tokens is not None and self.total_tokens > self.max_tokens * ratio
+
+    def turns(self) -> Iterator[Tuple[dict, int]]:
+        """Реплики от новых к старым вместе с числом токенов"""
+        return zip(reversed(self.buffer), reversed(self._tokens))
+
+    def clear(self):
+        self.buffer.clear()
+        self._tokens.clear()
+        self.total_tokens = 0
 
     def get_context(self) -> str:
         return "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in self.buffer)
@@ -0,0 +1,170 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils.metrics import get_metrics
+from utils.serialization import read_json, write_json
+
+EMBEDDINGS_DIR = "data/embeddings"
+
+
+class EmbeddingCache:
+    """
+    Персистентный кэш эмбеддингов одной модели.
+
+    Векторы лежат подряд в файле <model>.f32 (матрица float32, читается через
+    memmap), а хэши текстов — построчно в <model>.keys в том же порядке.
+    Оба файла только дописываются; строкой считается вектор, для которого
+    записан ключ, поэтому оборванная запись просто игнорируется.
+    """
+
+    def __init__(self, directory: Path, model: str):
+        slug = re.sub(r"[^\w.-]+", "_", model)
+        self.directory = Path(directory)
+        self.vectors_path = self.directory / f"{slug}.f32"
+        self.keys_path = self.directory / f"{slug}.keys"
+        self.meta_path = self.directory / f"{slug}.json"
+
+        self.dim: Optional[int] = None
+        self._rows: Dict[str, int] = {}
+        self._count = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._load()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        if self._matrix is None:
+            self._matrix = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(self._count, self.dim))
+        return self._matrix[row]
+
+    def add(self, keys: List[str], vectors: List[List[float]]):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = matrix.shape[1]
+            self.directory.mkdir(parents=True, exist_ok=True)
+            write_json(self.meta_path, {"dim": self.dim})
+
+        with open(self.vectors_path, "ab") as f:
+            f.write(matrix.tobytes())
+        with open(self.keys_path, "a", encoding="utf-8") as f:
+            f.write("".join(k + "\n" for k in keys))
+
+        for key in keys:
+            self._rows.setdefault(key, self._count)
+            self._count += 1
+        # memmap открывается заново с новым размером при следующем чтении
+        self._matrix = None
+
+    def _load(self):
+        if not (self.meta_path.exists() and self.keys_path.exists() and self.vectors_path.exists()):
+            return
+        self.dim = read_json(self.meta_path)["dim"]
+        complete = self.vectors_path.stat().st_size // (4 * self.dim)
+
+        consumed = 0
+        with open(self.keys_path, "rb") as f:
+            for line in f:
+                if self._count >= complete or not line.endswith(b"\n"):
+                    break
+                self._rows.setdefault(line.decode("utf-8").rstrip("\n"), self._count)
+                self._count += 1
+                consumed += len(line)
+
+        # Хвосты оборванной записи отрезаем, чтобы не сбить нумерацию строк
+        _truncate(self.keys_path, consumed)
+        _truncate(self.vectors_path, self._count * 4 * self.dim)
+
+
+class EmbeddingService(Embeddings):
+    """
+    Общий сервис эмбеддингов поверх любой модели LangChain.
+
+    - одинаковые тексты внутри запроса эмбеддятся один раз;
+    - запросы к модели отправляются пачками не больше batch_size;
+    - эмбеддинги документов сохраняются в EmbeddingCache и переживают
+      перезапуск, эмбеддинги поисковых запросов кэшируются в памяти.
+    """
+
+    def __init__(self, base: Embeddings, model: Optional[str] = None, batch_size: int = 32,
+                 cache_dir: str = EMBEDDINGS_DIR, query_cache_size: int = 1024):
+        self.base = base
+        self.model = model or getattr(base, "model", None) or type(base).__name__
+        self.batch_size = batch_size
+        self.cache = EmbeddingCache(Path(cache_dir), self.model)
+        self.query_cache_size = query_cache_size
+        self._queries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.key(t) for t in texts]
+
+        with self._lock:
+            missing: Dict[str, str] = {}
+            for key, text in zip(keys, texts):
+                if key not in missing and key not in self.cache:
+                    missing[key] = text
+
+            pending = list(missing.items())
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start:start + self.batch_size]
+                self.calls += 1
+                with get_metrics().span("embedding", kind="documents"):
+                    vectors = self.base.embed_documents([text for _, text in batch])
+                self.cache.add([key for key, _ in batch], vectors)
+
+            return [self.cache.get(key).tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._lock:
+            if text in self._queries:
+                self._queries.move_to_end(text)
+                return self._queries[text]
+
+        self.calls += 1
+        with get_metrics().span("embedding", kind="query"):
+            vector = self.base.embed_query(text)
+
+        with self._lock:
+            self._queries[text] = vector
+            while len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+        return vector
+
+
+def _truncate(path: Path, size: int):
+    if path.stat().st_size > size:
+        with open(path, "r+b") as f:
+            f.truncate(size)
+
+
+_services: Dict[str, EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model: str = "nomic-embed-text") -> EmbeddingService:
+    """Общий для процесса сервис эмбеддингов модели Ollama (один на модель)"""
+    with _services_lock:
+        if model not in _services:
+            from langchain.embeddings import OllamaEmbeddings
+
+            _services[model] = EmbeddingService(OllamaEmbeddings(model=model), model=model)
+        return _services[model]
@@ -0,0 +1,79 @@
+"""
+Хранилища сущностей для ConversationEntityMemory.
+
+Вынесены из MemoryStore и CharacterRepository, чтобы эти модули не тянули
+langchain.memory при импорте: редактор персонажей и проекты работают без LLM.
+"""
+from typing import Any, List, Optional
+
+from langchain.memory.entity import BaseEntityStore, InMemoryEntityStore
+from pydantic import Field
+
+NOTES_LABEL = "Заметки:"
+
+
+class SQLiteEntityStore(BaseEntityStore):
+    """Хранилище персонажей ConversationEntityMemory поверх MemoryStore"""
+    store: Any = Field(exclude=True)
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        value = self.store.get_entity(key)
+        return default if value is None else value
+
+    def set(self, key: str, value: Optional[str]) -> None:
+        self.store.set_entity(key, value)
+
+    def delete(self, key: str) -> None:
+        self.store.delete_entity(key)
+
+    def exists(self, key: str) -> bool:
+        return self.store.get_entity(key) is not None
+
+    def clear(self) -> None:
+        self.store.clear_entities()
+
+
+class CharacterEntityStore(BaseEntityStore):
+    """
+    Хранилище сущностей для ConversationEntityMemory: известные персонажи
+    берутся из CharacterRepository, а заметки, которые память извлекает
+    из диалога, пишутся в fallback-хранилище и дополняют карточку.
+
+    get отдаёт карточку вместе с заметками (для промпта), а set сохраняет
+    только заметки: если модель вернула текст вместе с карточкой,
+    карточка из него вырезается, чтобы не копиться в заметках.
+    """
+    repository: Any = Field(exclude=True)
+    fallback: BaseEntityStore = Field(default_factory=InMemoryEntityStore)
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        card = self.repository.describe(key)
+        notes = self.fallback.get(key)
+        if card is None:
+            return default if notes is None else notes
+        return f"{card}\n{NOTES_LABEL} {notes}" if notes else card
+
+    def notes(self, key: str) -> str:
+        """Только заметки из диалога, без карточки"""
+        return self.fallback.get(key) or ""
+
+    def mentioned(self, text: str) -> List[str]:
+        """Известные персонажи, упомянутые в тексте (см. CharacterRepository.mentioned)"""
+        return self.repository.mentioned(text)
+
+    def set(self, key: str, value: Optional[str]) -> None:
+        card = self.repository.describe(key)
+        if card and value:
+            value = value.replace(card, "").strip()
+            if value.startswith(NOTES_LABEL):
+                value = value[len(NOTES_LABEL):].strip()
+        self.fallback.set(key, value)
+
+    def delete(self, key: str) -> None:
+        self.fallback.delete(key)
+
+    def exists(self, key: str) -> bool:
+        return self.repository.find(key) is not None or self.fallback.exists(key)
+
+    def clear(self) -> None:
+        self.fallback.clear()
@@ -0,0 +1,89 @@
+import threading
+from typing import Any, Dict, List
+
+import faiss
+from langchain.vectorstores import FAISS
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStoreRetriever
+from pydantic import Field, PrivateAttr
+
+from core.memory.bm25_index import BM25Index
+from utils.metrics import get_metrics
+
+
+class HybridLoreRetriever(VectorStoreRetriever):
+    """
+    Поиск по лору: BM25 по точным словам плюс векторная близость.
+
+    Списки объединяются через Reciprocal Rank Fusion. Если все k лучших
+    записей BM25 содержат не меньше exact_min_terms слов запроса, эмбеддинг
+    запроса не считается вовсе — хватает точного совпадения.
+
+    Наследуется от VectorStoreRetriever, чтобы подставляться в
+    VectorStoreRetrieverMemory вместо обычного ретривера. Записи можно
+    добавлять и удалять на ходу через apply — поиск при этом не прерывается.
+    """
+    bm25: Any = Field(exclude=True)
+    k: int = 5
+    rrf_k: int = 60
+    exact_min_terms: int = 2
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore: FAISS, k: int = 5, **kwargs) -> "HybridLoreRetriever":
+        """Строит BM25-индекс по документам векторного хранилища (id документов общие)"""
+        bm25 = BM25Index()
+        for doc_id in vectorstore.index_to_docstore_id.values():
+            bm25.add(doc_id, vectorstore.docstore.search(doc_id).page_content)
+        return cls(vectorstore=vectorstore, bm25=bm25, k=k, search_kwargs={"k": k}, **kwargs)
+
+    def apply(self, added: Dict[str, str], removed: List[str]):
+        """
+        Точечно меняет индексы: добавляет записи {id: текст} и удаляет по id.
+        Эмбеддятся только добавленные тексты.
+        """
+        texts = list(added.values())
+        vectors = self.vectorstore.embedding_function.embed_documents(texts) if texts else []
+        with self._lock:
+            if removed:
+                self.vectorstore.delete(removed)
+                for doc_id in removed:
+                    self.bm25.remove(doc_id)
+            if texts:
+                if not self.vectorstore.index.ntotal and self.vectorstore.index.d != len(vectors[0]):
+                    # Индекс пустого лора создаётся без размерности (см. LoreIndex)
+                    self.vectorstore.index = faiss.IndexFlatL2(len(vectors[0]))
+                self.vectorstore.add_embeddings(list(zip(texts, vectors)), ids=list(added))
+                for doc_id, text in added.items():
+                    self.bm25.add(doc_id, text)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        metrics = get_metrics()
+        with self._lock, metrics.span("bm25_search"):
+            hits = self.bm25.search(query, k=self.k)
+            if hits and len(hits) >= min(self.k, len(self.bm25)) and all(h.matched >= self.exact_min_terms for h in hits):
+                return [self.vectorstore.docstore.search(h.doc_id) for h in hits]
+            empty = not len(self.bm25)
+        if empty:
+            return []
+
+        # Эмбеддинг запроса считаем вне блокировки — это запрос к модели
+        embedding = self.vectorstore.embedding_function.embed_query(query)
+
+        scores: Dict[str, float] = {}
+        documents: Dict[str, Document] = {}
+        with self._lock:
+            # Лор мог измениться, пока считался эмбеддинг, — ищем заново
+            hits = self.bm25.search(query, k=self.k)
+            with metrics.span("faiss_search"):
+                vector_docs = self.vectorstore.similarity_search_by_vector(embedding, k=self.k)
+            for rank, hit in enumerate(hits):
+                scores[hit.doc_id] = 1 / (self.rrf_k + rank + 1)
+                documents[hit.doc_id] = self.vectorstore.docstore.search(hit.doc_id)
+        for rank, doc in enumerate(vector_docs):
+            scores[doc.id] = scores.get(doc.id, 0.0) + 1 / (self.rrf_k + rank + 1)
+            documents.setdefault(doc.id, doc)
+
+        ranked = sorted(scores, key=scores.get, reverse=True)[:self.k]
+        return [documents[doc_id] for doc_id in ranked]
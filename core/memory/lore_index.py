@@ -0,0 +1,120 @@
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain.docstore import InMemoryDocstore
+from langchain.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from utils.serialization import JSONDecodeError, atomic_path, read_json, write_json
+
+
+class LoreIndex:
+    """
+    Персистентный FAISS-индекс лора, который хранится рядом с файлом лора.
+
+    Каждая запись лора идентифицируется хэшем от (модель эмбеддингов, текст).
+    При старте индекс читается с диска; заново эмбеддятся
+    только новые или изменённые записи. Индекс читается целиком, а не через
+    mmap: отображённый индекс faiss нельзя менять, а правки лора применяются
+    к живому индексу. Для пустого лора векторы не считаются вовсе. Хэш служит и id документа
+    в хранилище, поэтому правки лора применяются к живому индексу
+    точечно (см. diff и save).
+    """
+
+    def __init__(self, lore_path: str, embedding_model: Embeddings, model_name: Optional[str] = None):
+        self.embedding_model = embedding_model
+        self.model_name = model_name or getattr(
+            embedding_model, "model", None) or type(embedding_model).__name__
+        self.index_path = Path(lore_path).with_suffix(".faiss")
+        self.manifest_path = self.index_path.with_name(
+            self.index_path.name + ".json")
+
+    def entry_hash(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def load_vectorstore(self, texts: List[str]) -> FAISS:
+        """
+        Возвращает векторное хранилище для текстов лора, переиспользуя
+        сохранённые векторы и досчитывая эмбеддинги только для новых записей.
+        """
+        unique = list(dict.fromkeys(texts))
+        hashes = [self.entry_hash(t) for t in unique]
+
+        index, stored = self._read()
+        if index is not None and len(stored) == len(hashes) and set(stored) == set(hashes):
+            # После точечных правок порядок записей в индексе может отличаться от файла лора
+            by_hash = dict(zip(hashes, unique))
+            return self._wrap(index, [by_hash[h] for h in stored], stored)
+
+        known = {h: i for i, h in enumerate(stored)}
+        missing = [t for t, h in zip(unique, hashes) if h not in known]
+        fresh = iter(self.embedding_model.embed_documents(missing)) if missing else iter(())
+
+        vectors = []
+        for h in hashes:
+            if h in known:
+                vectors.append(index.reconstruct(known[h]))
+            else:
+                vectors.append(np.asarray(next(fresh), dtype="float32"))
+
+        if not vectors and index is None:
+            # Пустой лор: размерность векторов станет известна с первой записью
+            return self._wrap(faiss.IndexFlatL2(0), [], [])
+
+        new_index = faiss.IndexFlatL2(len(vectors[0]) if vectors else index.d)
+        if vectors:
+            new_index.add(np.vstack(vectors))
+
+        self._write(new_index, hashes)
+        return self._wrap(new_index, unique, hashes)
+
+    def diff(self, vectorstore: FAISS, texts: List[str]) -> Tuple[Dict[str, str], List[str]]:
+        """
+        Разница между содержимым хранилища и новым списком текстов лора.
+        :return: (новые записи {хэш: текст}, хэши удалённых записей)
+        """
+        wanted = {self.entry_hash(t): t for t in texts}
+        current = set(vectorstore.index_to_docstore_id.values())
+        added = {h: t for h, t in wanted.items() if h not in current}
+        removed = [h for h in current if h not in wanted]
+        return added, removed
+
+    def save(self, vectorstore: FAISS):
+        """Сохраняет изменённое хранилище на диск"""
+        ids = vectorstore.index_to_docstore_id
+        self._write(vectorstore.index, [ids[i] for i in range(len(ids))])
+
+    def _wrap(self, index, texts: List[str], hashes: List[str]) -> FAISS:
+        docstore = InMemoryDocstore({
+            h: Document(page_content=t, id=h) for t, h in zip(texts, hashes)
+        })
+        return FAISS(
+            embedding_function=self.embedding_model,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=dict(enumerate(hashes))
+        )
+
+    def _read(self) -> Tuple[Optional[object], List[str]]:
+        if not (self.index_path.exists() and self.manifest_path.exists()):
+            return None, []
+        try:
+            manifest = read_json(self.manifest_path)
+            index = faiss.read_index(str(self.index_path))
+        except (JSONDecodeError, RuntimeError):
+            return None, []
+
+        hashes = manifest.get("hashes", [])
+        # Манифест и индекс пишутся отдельно — проверяем, что они согласованы
+        if manifest.get("model") != self.model_name or index.ntotal != len(hashes):
+            return None, []
+        return index, hashes
+
+    def _write(self, index, hashes: List[str]):
+        with atomic_path(self.index_path) as tmp_index:
+            faiss.write_index(index, str(tmp_index))
+        write_json(self.manifest_path, {"model": self.model_name, "hashes": hashes})
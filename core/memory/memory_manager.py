@@ -1,25 +1,100 @@
 import os
-import json
-import yaml
+from typing import Any, Dict, List, Optional
 
+from langchain.chains import LLMChain
 from langchain.memory import (
     ConversationSummaryBufferMemory,
     ConversationEntityMemory,
     VectorStoreRetrieverMemory,
     CombinedMemory
 )
-from langchain.vectorstores import FAISS
-from langchain.embeddings import OllamaEmbeddings
 from langchain.llms.base import BaseLLM
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.memory.entity import InMemoryEntityStore
 from langchain_core.memory import BaseMemory
+from langchain_core.messages import get_buffer_string
 from pydantic import Field
 
+from core.lore.character_editor import get_repository
+from core.memory.entity_store import CharacterEntityStore
+from core.memory.embedding_service import get_embedding_service
+from core.memory.hybrid_retriever import HybridLoreRetriever
+from core.memory.lore_index import LoreIndex
+from core.memory.memory_store import MemoryStore
+from core.memory.memory_worker import MemoryWorker
+from core.scheduler import BACKGROUND, get_scheduler
+from utils.metrics import get_metrics
+from utils.serialization import read_json, read_yaml, write_json, write_yaml
+
+
+class SceneRetrieverMemory(BaseMemory):
+    """
+    Фрагменты уже написанных сцен проекта, близкие к запросу (см. SceneIndex).
+    Только чтение: индекс обновляется при сохранении сцен.
+    """
+    index: Any = Field(exclude=True)
+    memory_key: str = "scenes"
+    input_key: str = "input"
+    k: int = 4
+
+    @property
+    def memory_variables(self) -> list:
+        return [self.memory_key]
+
+    def load_memory_variables(self, inputs: dict) -> dict:
+        passages = self.index.search(inputs.get(self.input_key, ""), k=self.k)
+        return {self.memory_key: "\n---\n".join(passages)}
+
+    def save_context(self, inputs: dict, outputs: dict) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class DeferredEntityMemory(ConversationEntityMemory):
+    """
+    Память о персонажах без запроса к модели при сборке промпта.
+
+    Персонажи — только известные редактору персонажей (CharacterEntityStore):
+    вместо извлечения имён запросом к LLM ищутся упоминания их имён в тексте.
+    Промпт получает персонажей из запроса и из последнего хода (entity_cache).
+    Заметки о них обновляются в save_context, который MemoryManager выполняет
+    в фоне; модель при этом видит и переписывает только заметки, а не карточку.
+    """
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        names = dict.fromkeys(self.entity_cache + self.entity_store.mentioned(inputs[self.input_key or "input"]))
+        entities = {entity: self.entity_store.get(entity, "") for entity in names}
+        buffer = self.buffer[-self.k * 2:]
+        if not self.return_messages:
+            buffer = get_buffer_string(buffer, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix)
+        return {self.chat_history_key: buffer, "entities": entities}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        input_text = inputs[self.input_key or "input"]
+        self.entity_cache = self.entity_store.mentioned(f"{input_text}\n{next(iter(outputs.values()), '')}")
+        # Реплики — в буфер истории, как у базового класса
+        BaseChatMemory.save_context(self, inputs, outputs)
+
+        history = get_buffer_string(
+            self.buffer[-self.k * 2:], human_prefix=self.human_prefix, ai_prefix=self.ai_prefix)
+        chain = LLMChain(llm=self.llm, prompt=self.entity_summarization_prompt)
+        for entity in self.entity_cache:
+            notes = chain.predict(summary=self.entity_store.notes(entity), entity=entity,
+                                  history=history, input=input_text)
+            self.entity_store.set(entity, notes.strip())
+
 
 class FlattenedMemory(BaseMemory):
     memory: CombinedMemory = Field(exclude=True)
+    variables: List[str] = ["summary", "entities", "lore"]
 
-    def __init__(self, memory: CombinedMemory):
-        super().__init__(memory=memory)
+    def __init__(self, memory: CombinedMemory, variables: Optional[List[str]] = None):
+        if variables is None:
+            super().__init__(memory=memory)
+        else:
+            super().__init__(memory=memory, variables=variables)
 
     def load_memory_variables(self, inputs: dict) -> dict:
         raw = self.memory.load_memory_variables(inputs)
@@ -41,7 +116,7 @@ class FlattenedMemory(BaseMemory):
 
     @property
     def memory_variables(self) -> list:
-        return ["summary", "entities", "lore"]
+        return list(self.variables)
 
 
 class MemoryManager:
@@ -49,32 +124,65 @@ class MemoryManager:
     Менеджер памяти для WriterAI, объединяющий:
     - Сводку сюжета (summary)
     - Память о персонажах (entities)
-    - Знания о мире (лоре) на основе векторного поиска
+    - Знания о мире (лоре) на основе гибридного поиска (BM25 + векторы)
+    - Фрагменты написанных сцен проекта (scenes), если передан индекс сцен
 
     Поддерживает загрузку и обновление лора из JSON/YAML файлов.
+    Векторный индекс лора кэшируется на диске рядом с файлом лора (см. LoreIndex).
+
+    Сводка и персонажи обновляются дополнительными запросами к LLM, поэтому
+    save_context ставит их в фоновую очередь (см. MemoryWorker); flush
+    дожидается, пока все обновления будут применены. Эти запросы идут через
+    планировщик с фоновым приоритетом и уступают модель интерактивным.
+
+    С memory_path сводка и персонажи хранятся в SQLite (см. MemoryStore):
+    снимок читается при создании и обновляется после каждого хода.
     """
 
-    def __init__(self, llm: BaseLLM, embedding_model=None, lore_path: str = None):
+    def __init__(self, llm: BaseLLM, embedding_model=None, lore_path: str = None, scene_index=None,
+                 memory_path: Optional[str] = None, model_name: Optional[str] = None):
         self.llm = llm
-        self.embedding_model = embedding_model or OllamaEmbeddings(
-            model="nomic-embed-text")
+        # Имя модели в планировщике запросов — то же, что у LLMHandler
+        self.model_name = model_name or getattr(llm, "model", None) or type(llm).__name__
+        self.memory_store = MemoryStore(memory_path) if memory_path else None
+        # Сервис эмбеддингов общий для всех MemoryManager и кэширует векторы на диске
+        self.embedding_model = embedding_model or get_embedding_service(
+            "nomic-embed-text")
         self.lore_path = lore_path or "data/lore.yaml"
+        self.lore_index = LoreIndex(self.lore_path, self.embedding_model)
 
         # Инициализация компонентов памяти
         self.summary_memory = self._init_summary_memory()
         self.character_memory = self._init_entity_memory()
-        self.lore_texts = self._load_lore_texts()
-        self.lore_memory = self._init_lore_memory(self.lore_texts)
+        if self.memory_store is not None:
+            with get_metrics().span("memory_restore"):
+                self.memory_store.restore(self.summary_memory, self.character_memory)
+        with get_metrics().span("lore_load"):
+            self.lore_texts = self._load_lore_texts()
+            self.lore_memory = self._init_lore_memory(self.lore_texts)
+        self.scene_memory = SceneRetrieverMemory(index=scene_index) if scene_index is not None else None
 
         # Объединённая память
+        memories = [
+            self.summary_memory,
+            self.character_memory,
+            self.lore_memory
+        ]
+        if self.scene_memory is not None:
+            memories.append(self.scene_memory)
         self.combined_memory = CombinedMemory(
-            memories=[
-                self.summary_memory,
-                self.character_memory,
-                self.lore_memory
-            ],
+            memories=memories,
             exclude_input_keys=["history"]
         )
+        self.worker = MemoryWorker()
+
+    @property
+    def memory_variables(self) -> list:
+        """Переменные памяти, которые подставляются в промпт"""
+        variables = ["summary", "entities", "lore"]
+        if self.scene_memory is not None:
+            variables.append(self.scene_memory.memory_key)
+        return variables
 
     def _init_summary_memory(self):
         return ConversationSummaryBufferMemory(
@@ -85,18 +193,27 @@ class MemoryManager:
         )
 
     def _init_entity_memory(self):
-        return ConversationEntityMemory(
+        # Карточки персонажей берутся из редактора персонажей, а заметки из диалога
+        # хранятся отдельно (в снимке проекта, если он есть)
+        if self.memory_store is not None:
+            notes = self.memory_store.entity_store()
+        else:
+            notes = InMemoryEntityStore()
+        entity_store = CharacterEntityStore(repository=get_repository(), fallback=notes)
+        return DeferredEntityMemory(
             llm=self.llm,
             memory_key="entities",
             input_key="input",
-            return_messages=True
+            return_messages=True,
+            entity_store=entity_store
         )
 
     def _init_lore_memory(self, texts):
-        vectorstore = FAISS.from_texts(texts, embedding=self.embedding_model)
-        retriever = vectorstore.as_retriever(search_kwargs={"k": 5})
+        vectorstore = self.lore_index.load_vectorstore(texts)
+        # Точные названия (руны, школы, имена) находит BM25, остальное — векторы
+        self.lore_retriever = HybridLoreRetriever.from_vectorstore(vectorstore, k=5)
         return VectorStoreRetrieverMemory(
-            retriever=retriever,
+            retriever=self.lore_retriever,
             memory_key="lore"
         )
 
@@ -104,37 +221,107 @@ class MemoryManager:
         if not os.path.exists(self.lore_path):
             return []
 
-        with open(self.lore_path, "r", encoding="utf-8") as f:
-            if self.lore_path.endswith(".json"):
-                data = json.load(f)
-            elif self.lore_path.endswith((".yaml", ".yml")):
-                data = yaml.safe_load(f)
-            else:
-                raise ValueError("Unsupported lore file format")
+        if self.lore_path.endswith(".json"):
+            data = read_json(self.lore_path)
+        elif self.lore_path.endswith((".yaml", ".yml")):
+            data = read_yaml(self.lore_path)
+        else:
+            raise ValueError("Unsupported lore file format")
 
         if isinstance(data, list):
             return [item["text"] if isinstance(item, dict) and "text" in item else str(item) for item in data]
         else:
             return [str(data)]
 
+    def _apply_lore(self, texts: list) -> int:
+        """
+        Применяет новый список лора к живому индексу: добавляются и удаляются
+        только изменившиеся записи, поэтому работающая цепочка сразу видит правки.
+        :return: количество изменённых записей
+        """
+        vectorstore = self.lore_retriever.vectorstore
+        added, removed = self.lore_index.diff(vectorstore, texts)
+        if added or removed:
+            self.lore_retriever.apply(added, removed)
+            self.lore_index.save(vectorstore)
+        self.lore_texts = texts
+        return len(added) + len(removed)
+
+    def reload_lore(self) -> int:
+        """Перечитывает файл лора (например, после правки в другом обработчике)"""
+        return self._apply_lore(self._load_lore_texts())
+
     def update_lore(self, new_lore: list):
-        self.lore_texts = new_lore
-        self.lore_memory = self._init_lore_memory(self.lore_texts)
+        self._apply_lore(new_lore)
 
         if self.lore_path.endswith(".json"):
-            with open(self.lore_path, "w", encoding="utf-8") as f:
-                json.dump(new_lore, f, ensure_ascii=False, indent=2)
+            write_json(self.lore_path, new_lore, indent=True)
         elif self.lore_path.endswith((".yaml", ".yml")):
-            with open(self.lore_path, "w", encoding="utf-8") as f:
-                yaml.safe_dump(new_lore, f, allow_unicode=True)
+            write_yaml(self.lore_path, new_lore)
+
+    def save_context(self, inputs: dict, outputs: dict):
+        """
+        Ставит обновление сводки и персонажей в фоновую очередь.
+        Лор и сцены только читаются, реплики диалога в них не попадают.
+        """
+        for memory in (self.summary_memory, self.character_memory):
+            self.worker.submit(self._background, memory.save_context, inputs, outputs)
+        if self.memory_store is not None:
+            self.worker.submit(self.memory_store.save, self.summary_memory, self.character_memory)
+
+    def _background(self, task, *args):
+        """Выполняет задачу, занимая слот модели с фоновым приоритетом"""
+        with get_scheduler().slot(self.model_name, BACKGROUND, session=f"memory-{id(self):x}"):
+            return task(*args)
+
+    def flush(self):
+        """Дожидается применения всех отложенных обновлений памяти"""
+        self.worker.flush()
+
+    def load_context(self, query: str) -> dict:
+        """
+        Разделы памяти для запроса по отдельности, чтобы их можно было уложить
+        в бюджет токенов (см. ContextAssembler): сводка сюжета, недавние реплики,
+        карточки персонажей, правила мира и фрагменты сцен.
+        """
+        entities = self.character_memory.load_memory_variables({"input": query})["entities"]
+        characters = []
+        for name, description in entities.items():
+            if not description:
+                characters.append(name)
+            elif description.startswith(name):
+                characters.append(description)
+            else:
+                characters.append(f"{name}: {description}")
+        scenes = []
+        if self.scene_memory is not None:
+            scenes = self.scene_memory.index.search(query, k=self.scene_memory.k)
+        return {
+            "summary": self.summary_memory.moving_summary_buffer,
+            "history": list(self.summary_memory.chat_memory.messages),
+            "characters": characters,
+            "lore": [doc.page_content for doc in self.lore_retriever.invoke(query)],
+            "scenes": scenes
+        }
+
+    def close(self):
+        """Дожидается фоновых обновлений, останавливает их поток и закрывает снимок памяти"""
+        self.worker.stop()
+        if self.memory_store is not None:
+            self.memory_store.close()
 
     def get_combined_memory(self):
-        return FlattenedMemory(self.combined_memory)
+        return FlattenedMemory(self.combined_memory, self.memory_variables)
 
     def get_memory_summary(self):
+        """
+        Последнее применённое состояние памяти. Фоновые обновления не ждём —
+        pending показывает, сколько их ещё в очереди.
+        """
         dummy_input = {"input": ""}
         return {
             "summary": self.summary_memory.load_memory_variables(dummy_input),
             "characters": self.character_memory.load_memory_variables(dummy_input),
-            "lore": self.lore_texts
+            "lore": self.lore_texts,
+            "pending": self.worker.pending
         }
@@ -0,0 +1,97 @@
+import sqlite3
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from utils.serialization import json_dumps, json_loads
+
+if TYPE_CHECKING:
+    from langchain.memory import ConversationEntityMemory, ConversationSummaryBufferMemory
+
+    from core.memory.entity_store import SQLiteEntityStore
+
+MEMORY_DB_NAME = "memory.sqlite"
+
+
+class MemoryStore:
+    """
+    Снимок памяти проекта в SQLite: сводка сюжета, буфер последних реплик
+    и персонажи.
+
+    Персонажи хранятся построчно и пишутся по одному при каждом изменении,
+    сводка и буфер — двумя строками в таблице state после каждого хода.
+    При старте читаются только эти строки, без запросов к LLM.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS entities (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+
+    def get_state(self, key: str, default=None):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json_loads(row[0]) if row else default
+
+    def set_state(self, **values):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                [(k, json_dumps(v)) for k, v in values.items()])
+            self._db.commit()
+
+    def restore(self, summary: "ConversationSummaryBufferMemory", entities: "ConversationEntityMemory"):
+        """Восстанавливает сводку, буфер реплик и список недавних персонажей"""
+        from langchain_core.messages import messages_from_dict
+
+        summary.moving_summary_buffer = self.get_state("summary", "")
+        summary.chat_memory.messages = messages_from_dict(self.get_state("messages", []))
+        entities.entity_cache = self.get_state("entity_cache", [])
+
+    def save(self, summary: "ConversationSummaryBufferMemory", entities: "ConversationEntityMemory"):
+        """Сохраняет состояние после хода; сами персонажи уже записаны в entities"""
+        from langchain_core.messages import messages_to_dict
+
+        self.set_state(
+            summary=summary.moving_summary_buffer,
+            messages=messages_to_dict(summary.chat_memory.messages),
+            entity_cache=entities.entity_cache
+        )
+
+    def entity_store(self) -> "SQLiteEntityStore":
+        # langchain.memory нужен только памяти LLM, а не редакторам проекта
+        from core.memory.entity_store import SQLiteEntityStore
+
+        return SQLiteEntityStore(store=self)
+
+    def get_entity(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM entities WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_entity(self, key: str, value: Optional[str]):
+        if value is None:
+            return self.delete_entity(key)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO entities (key, value) VALUES (?, ?)", (key, value))
+            self._db.commit()
+
+    def delete_entity(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM entities WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear_entities(self):
+        with self._lock:
+            self._db.execute("DELETE FROM entities")
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
@@ -0,0 +1,70 @@
+import logging
+import queue
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryWorker:
+    """
+    Фоновый поток для обслуживания памяти (сводка сюжета, персонажи).
+
+    Эти обновления делают собственные запросы к LLM, поэтому выполняются
+    вне генерации: ответ пользователю возвращается сразу, а задачи
+    применяются по порядку в отдельном потоке. flush() дожидается,
+    пока очередь опустеет, — его вызывают перед следующим запросом.
+    stop() останавливает поток; следующий submit запустит его снова.
+    """
+
+    def __init__(self, name: str = "memory-worker"):
+        self.name = name
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.last_error: Optional[BaseException] = None
+
+    @property
+    def pending(self) -> int:
+        return self._queue.unfinished_tasks
+
+    def submit(self, task: Callable, *args):
+        self._ensure_started()
+        self._queue.put((task, args))
+
+    def flush(self):
+        """Дожидается выполнения всех поставленных задач"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stop(self):
+        """Выполняет поставленные задачи и завершает поток"""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            task, args = item
+            try:
+                task(*args)
+            except Exception as e:
+                # Сбой обновления памяти не должен ронять следующие генерации
+                self.last_error = e
+                logger.exception("Ошибка фонового обновления памяти")
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,79 @@
+import re
+from functools import lru_cache
+from typing import Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class TokenCounter:
+    """
+    Подсчёт токенов с кэшированием результатов.
+
+    Использует tiktoken, если он установлен и кодировка доступна,
+    иначе — приближённую оценку по словам и знакам препинания.
+    Точное число токенов зависит от модели, поэтому бюджет стоит
+    задавать с запасом.
+    """
+
+    def __init__(self, encoding: str = "cl100k_base", cache_size: int = 4096):
+        self._encoder = self._load_encoder(encoding)
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    @staticmethod
+    def _load_encoder(encoding: str):
+        if tiktoken is None:
+            return None
+        try:
+            return tiktoken.get_encoding(encoding)
+        except Exception:
+            # Кодировка скачивается при первом использовании — офлайн её может не быть
+            return None
+
+    def _count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoder is not None:
+            return len(self._encoder.encode(text))
+        # Кириллица в BPE-токенизаторах дробится сильнее латиницы
+        words = _WORD_RE.findall(text)
+        return max(1, round(len(words) * 1.5))
+
+    def truncate(self, text: str, max_tokens: int, keep_end: bool = True) -> str:
+        """
+        Обрезает текст до max_tokens токенов, по умолчанию сохраняя конец.
+        """
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        if self._encoder is not None:
+            tokens = self._encoder.encode(text)
+            tokens = tokens[-max_tokens:] if keep_end else tokens[:max_tokens]
+            return self._encoder.decode(tokens)
+
+        # Без токенизатора подбираем длину пропорционально и уточняем бинарным поиском
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            part = text[-mid:] if keep_end else text[:mid]
+            if self._count(part) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[-lo:] if keep_end and lo else text[:lo]
+
+
+_counter: Optional[TokenCounter] = None
+
+
+def get_token_counter() -> TokenCounter:
+    """Общий для процесса счётчик токенов (кэш разделяется всеми обработчиками)"""
+    global _counter
+    if _counter is None:
+        _counter = TokenCounter()
+    return _counter
@@ -6,7 +6,42 @@ from core.project.project_manager import (
     load_project,
     save_project,
     delete_project,
+    index_scene,
+    unindex_scene,
 )
+from core.scheduler import SchedulerRejected
+from core.speculation import continuation_prompt, get_speculative_queue
+from utils.config import load_config, save_config
+
+
+def _continuation_settings(config: dict) -> dict:
+    """Модель, температура и раскладка промпта продолжений — те же, что на странице генерации"""
+    return {
+        "model_name": f"ollama:{config.get('model', 'llama3')}",
+        "temperature": float(config.get("temperature", 0.7)),
+        "prompt_layout": config.get("prompt_layout", "rolling")
+    }
+
+
+def _continue_scene(project_title: str, scene: Scene, settings: dict) -> str:
+    """
+    Продолжение сцены: готовый черновик упреждающей генерации, если текст
+    сцены не менялся, иначе обычный запрос к модели.
+    """
+    # Обработчик из общего пула: тот же, что выполнял упреждающую генерацию
+    from core.handler_pool import get_handler
+
+    handler = get_handler(use_memory=True, project=project_title, **settings)
+    draft = get_speculative_queue().take(project_title, scene, adopt=True, **settings)
+    if draft is not None:
+        st.caption("⚡ Продолжение подготовлено заранее")
+        return handler.accept_draft(draft)
+    try:
+        with st.spinner("ИИ думает..."):
+            return handler.generate_from_template(continuation_prompt(scene.title, scene.content))
+    except SchedulerRejected as e:
+        st.error(f"Модель перегружена, попробуйте позже: {e}")
+        return ""
 
 
 def project_editor_ui():
@@ -32,6 +67,16 @@ def project_editor_ui():
                 delete_project(selected_project_name)
                 st.rerun()
 
+    config = load_config()
+    speculative = st.sidebar.checkbox(
+        "⚡ Предгенерация продолжений", value=config.get("speculative", False),
+        help="После сохранения сцены продолжение генерируется в фоне, "
+             "пока модель свободна, и кнопка «Продолжить» срабатывает сразу")
+    if speculative != config.get("speculative", False):
+        save_config({**config, "speculative": speculative})
+    settings = _continuation_settings(config)
+    queue = get_speculative_queue()
+
     if selected_project_name:
         project = load_project(selected_project_name)
         st.sidebar.markdown("---")
@@ -50,6 +95,9 @@ def project_editor_ui():
             if st.button(f"❌ Удалить главу '{ch.title}'", key=f"del_ch_{ch.title}"):
                 project.chapters = [c for c in project.chapters if c != ch]
                 save_project(project)
+                for sc in ch.scenes:
+                    unindex_scene(project.title, sc)
+                    queue.invalidate(project.title, sc.id)
                 st.rerun()
 
             new_scene_title = st.text_input(
@@ -63,18 +111,38 @@ def project_editor_ui():
                 st.markdown(f"#### ✏️ Сцена: {sc.title}")
                 sc_title = st.text_input(
                     "Название сцены", value=sc.title, key=f"sc_title_{ch.title}_{sc.title}")
-                sc_content = st.text_area(
-                    "Текст сцены", value=sc.content, height=300, key=f"sc_text_{ch.title}_{sc.title}")
+
+                # Текст сцены подгружается с диска только для открытых сцен
+                opened = st.checkbox(
+                    "Открыть текст", key=f"open_scene_{ch.title}_{sc.title}")
+                if opened:
+                    sc_content = st.text_area(
+                        "Текст сцены", value=sc.content, height=300, key=f"sc_text_{ch.title}_{sc.title}")
 
                 if st.button("Сохранить сцену", key=f"save_scene_{ch.title}_{sc.title}"):
                     sc.title = sc_title
-                    sc.content = sc_content
+                    if opened:
+                        sc.content = sc_content
                     save_project(project)
+                    if opened:
+                        index_scene(project.title, sc)
+                    if opened and speculative and sc.content.strip():
+                        queue.submit(project.title, sc, use_memory=True, **settings)
+                    elif opened:
+                        queue.invalidate(project.title, sc.id)
                     st.success("Сцена сохранена")
 
+                if opened and st.button("✍️ Продолжить сцену", key=f"continue_scene_{ch.title}_{sc.title}"):
+                    # Продолжается текст из редактора, даже если он ещё не сохранён
+                    sc.content = sc_content
+                    st.text_area("Продолжение", value=_continue_scene(project.title, sc, settings),
+                                 height=300, key=f"continuation_{ch.title}_{sc.title}")
+
                 if st.button("❌ Удалить сцену", key=f"del_scene_{ch.title}_{sc.title}"):
                     ch.scenes = [s for s in ch.scenes if s != sc]
                     save_project(project)
+                    unindex_scene(project.title, sc)
+                    queue.invalidate(project.title, sc.id)
                     st.rerun()
 
         # Добавление новой главы
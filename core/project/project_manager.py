@@ -1,12 +1,30 @@
+import logging
 import os
+import threading
 from pathlib import Path
-from typing import List
-from core.project.project_model import Project
+from typing import Dict, List, Optional
+from core.handler_pool import get_pool
+from core.memory.memory_store import MEMORY_DB_NAME
+from core.memory.memory_worker import MemoryWorker
+from core.project.project_model import Project, Scene
+from core.project.project_store import ProjectStore
+from core.project.scene_index import SceneIndex
 
 # Папка по умолчанию для хранения проектов
 PROJECTS_DIR = Path("projects")
 PROJECTS_DIR.mkdir(exist_ok=True)
 
+_store = ProjectStore(PROJECTS_DIR)
+
+# Индексы сцен общие для редактора и генерации, по одному на проект
+_scene_indexes: Dict[str, SceneIndex] = {}
+_scene_indexes_lock = threading.Lock()
+# Индексация сцен делает запросы к модели эмбеддингов — она идёт в фоне,
+# по порядку сохранений, чтобы сохранение сцены не зависело от Ollama
+_indexer = MemoryWorker(name="scene-indexer")
+
+logger = logging.getLogger(__name__)
+
 
 def create_project(title: str) -> Project:
     """Создание нового проекта"""
@@ -16,31 +34,109 @@ def create_project(title: str) -> Project:
 
 
 def get_project_path(name: str) -> Path:
-    """Получить путь к файлу проекта"""
+    """Получить путь к файлу проекта в старом формате (один JSON)"""
     return PROJECTS_DIR / f"{name}.json"
 
 
 def list_projects() -> List[str]:
-    """Список доступных проектов (по имени файла без .json)"""
-    return [f.stem for f in PROJECTS_DIR.glob("*.json")]
+    """Список доступных проектов (включая ещё не перенесённые JSON-файлы)"""
+    legacy = [f.stem for f in PROJECTS_DIR.glob("*.json")]
+    return sorted(set(_store.list()) | set(legacy))
 
 
-def load_project(name: str) -> Project:
-    """Загрузка проекта по имени"""
+def load_project(name: str, lazy: bool = True) -> Project:
+    """
+    Загрузка проекта по имени; проект в старом формате переносится в хранилище.
+    При lazy=True тексты сцен читаются с диска при первом обращении.
+    """
+    if _store.exists(name):
+        return _store.load(name, lazy=lazy)
     path = get_project_path(name)
     if not path.exists():
         raise FileNotFoundError(f"Проект '{name}' не найден")
-    return Project.load(path)
+    return _store.migrate_json(path)
 
 
 def save_project(project: Project):
-    """Сохранение проекта"""
-    path = get_project_path(project.title)
-    project.save(path)
+    """Сохранение проекта (записываются только изменённые сцены)"""
+    _store.save(project)
 
 
 def delete_project(name: str):
     """Удаление проекта по имени"""
+    # Обработчики проекта держат открытым его снимок памяти и могли бы писать в него дальше
+    get_pool().invalidate(project=name)
+    with _scene_indexes_lock:
+        _scene_indexes.pop(name, None)
+    _store.delete(name)
     path = get_project_path(name)
     if path.exists():
         path.unlink()
+
+
+def migrate_legacy_projects() -> List[str]:
+    """Перенос всех проектов из projects/*.json в инкрементальное хранилище"""
+    migrated = []
+    for path in PROJECTS_DIR.glob("*.json"):
+        if not _store.exists(path.stem):
+            _store.migrate_json(path)
+            migrated.append(path.stem)
+    return migrated
+
+
+def get_memory_path(name: str) -> Path:
+    """Путь к снимку памяти (сводка, персонажи) проекта"""
+    return _store.project_dir(name) / MEMORY_DB_NAME
+
+
+def get_scene_index(name: str) -> SceneIndex:
+    """
+    Векторный индекс сцен проекта (хранится в папке проекта).
+    При первом обращении индекс сверяется с текущими сценами проекта;
+    сверка идёт вне общей блокировки, а её ошибки только логируются.
+    """
+    with _scene_indexes_lock:
+        index = _scene_indexes.get(name)
+        created = index is None
+        if created:
+            # Модель эмбеддингов подгружается только при первой индексации
+            from core.memory.embedding_service import get_embedding_service
+
+            index = SceneIndex(_store.project_dir(name), get_embedding_service("nomic-embed-text"))
+            _scene_indexes[name] = index
+    if created and name in list_projects():
+        try:
+            index.sync(load_project(name))
+        except Exception:
+            logger.exception("Не удалось сверить индекс сцен проекта %s", name)
+    return index
+
+
+def index_scene(project_name: str, scene: Scene):
+    """Обновление индекса после сохранения сцены (в фоне, см. flush_scene_indexing)"""
+    _indexer.submit(_update_index, project_name, scene.id, scene.content)
+
+
+def unindex_scene(project_name: str, scene: Scene):
+    """Удаление сцены из индекса (в фоне)"""
+    _indexer.submit(_update_index, project_name, scene.id, None)
+
+
+def flush_scene_indexing():
+    """Дожидается, пока все сохранённые сцены будут проиндексированы"""
+    _indexer.flush()
+
+
+def _update_index(project_name: str, scene_id: str, text: Optional[str]):
+    if project_name not in list_projects():
+        # Проект удалён, пока задача ждала в очереди
+        return
+    try:
+        index = get_scene_index(project_name)
+        if text is None:
+            index.remove_scene(scene_id)
+        else:
+            index.update_scene(scene_id, text)
+    except Exception:
+        # Без индекса сцена просто не попадёт в контекст генерации; повторим при следующем сохранении
+        logger.exception("Не удалось обновить индекс сцен проекта %s", project_name)
@@ -1,22 +1,56 @@
-import json
+import uuid
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
+
+from utils.serialization import json_loads, write_json
 
 
 class Scene:
-    def __init__(self, title: str, content: str = ""):
+    """
+    Сцена главы. Текст может загружаться лениво: если передан loader,
+    он будет вызван при первом обращении к content.
+    """
+    __slots__ = ("id", "title", "_content", "_loader")
+
+    def __init__(
+        self,
+        title: str,
+        content: str = "",
+        id: Optional[str] = None,
+        loader: Optional[Callable[[], str]] = None
+    ):
+        self.id = id or uuid.uuid4().hex
         self.title = title
-        self.content = content
+        self._content = None if loader else content
+        self._loader = loader
+
+    @property
+    def content(self) -> str:
+        if self._content is None:
+            self._content = self._loader()
+            self._loader = None
+        return self._content
+
+    @content.setter
+    def content(self, value: str):
+        self._content = value
+        self._loader = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._content is not None
 
     def to_dict(self):
-        return {"title": self.title, "content": self.content}
+        return {"id": self.id, "title": self.title, "content": self.content}
 
     @staticmethod
     def from_dict(data):
-        return Scene(title=data["title"], content=data.get("content", ""))
+        return Scene(title=data["title"], content=data.get("content", ""), id=data.get("id"))
 
 
 class Chapter:
+    __slots__ = ("title", "scenes")
+
     def __init__(self, title: str, scenes: Optional[List[Scene]] = None):
         self.title = title
         self.scenes = scenes or []
@@ -34,6 +68,8 @@ class Chapter:
 
 
 class Character:
+    __slots__ = ("name", "description", "traits")
+
     def __init__(self, name: str, description: str = "", traits: Optional[List[str]] = None):
         self.name = name
         self.description = description
@@ -76,9 +112,9 @@ class Project:
         return Project(title=data["title"], chapters=chapters, characters=characters)
 
     def save(self, path: Path):
-        path.write_text(json.dumps(self.to_dict(), indent=2), encoding='utf-8')
+        write_json(path, self.to_dict(), indent=True)
 
     @staticmethod
     def load(path: Path):
-        data = json.loads(path.read_text(encoding='utf-8'))
+        data = json_loads(path.read_bytes())
         return Project.from_dict(data)
@@ -0,0 +1,220 @@
+import hashlib
+import os
+import shutil
+import threading
+from functools import partial
+from pathlib import Path
+from typing import List, Optional
+
+from core.project.project_model import Project, Chapter, Scene, Character
+from utils.serialization import json_loads, write_json
+
+MANIFEST_NAME = "manifest.json"
+
+
+class ProjectStore:
+    """
+    Инкрементальное хранилище проектов.
+
+    Каждый проект — папка с двумя файлами:
+    - manifest.json — структура проекта (главы, сцены, персонажи) и смещения
+      текстов сцен в журнале;
+    - scenes.<N>.log — журнал только на добавление с текстами сцен.
+
+    При сохранении в журнал дописываются только изменённые сцены, после чего
+    манифест атомарно подменяется. Если процесс упадёт посреди записи, старый
+    манифест продолжит ссылаться на целые данные. Когда мёртвых данных в журнале
+    становится слишком много, журнал уплотняется в новое поколение.
+
+    Манифест служит индексом смещений: при ленивой загрузке тексты сцен
+    читаются из журнала только при первом обращении к Scene.content.
+    """
+
+    def __init__(self, root: Path, compact_ratio: float = 0.5, compact_min_bytes: int = 1024 * 1024):
+        self.root = Path(root)
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        self._lock = threading.RLock()
+        # Кэш манифестов: папка -> ((mtime_ns, size), манифест, сцены по id)
+        self._manifests: dict = {}
+
+    def project_dir(self, name: str) -> Path:
+        return self.root / name
+
+    def exists(self, name: str) -> bool:
+        return (self.project_dir(name) / MANIFEST_NAME).exists()
+
+    def list(self) -> List[str]:
+        return sorted(p.parent.name for p in self.root.glob(f"*/{MANIFEST_NAME}"))
+
+    def load(self, name: str, lazy: bool = True) -> Project:
+        """
+        Загрузка проекта. При lazy=True читается только манифест, а тексты
+        сцен подгружаются из журнала при первом обращении.
+        """
+        directory = self.project_dir(name)
+        # Манифест в кэше меняют save и уплотнение — структуру читаем под блокировкой
+        with self._lock:
+            manifest = self._read_manifest(directory)
+            if manifest is None:
+                raise FileNotFoundError(f"Проект '{name}' не найден")
+
+            chapters = []
+            for ch in manifest["chapters"]:
+                scenes = []
+                for sc in ch["scenes"]:
+                    loader = partial(self._read_scene, directory, sc["id"])
+                    if lazy:
+                        scenes.append(Scene(title=sc["title"], id=sc["id"], loader=loader))
+                    else:
+                        scenes.append(Scene(title=sc["title"], content=loader(), id=sc["id"]))
+                chapters.append(Chapter(title=ch["title"], scenes=scenes))
+
+            characters = [Character.from_dict(c) for c in manifest.get("characters", [])]
+            return Project(title=manifest["title"], chapters=chapters, characters=characters)
+
+    def save(self, project: Project) -> int:
+        """
+        Сохраняет проект, дописывая в журнал только изменённые сцены.
+        :return: количество байт, дописанных в журнал
+        """
+        with self._lock:
+            directory = self.project_dir(project.title)
+            directory.mkdir(parents=True, exist_ok=True)
+
+            old = self._read_manifest(directory) or {"log": "scenes.0.log", "chapters": []}
+            known = {sc["id"]: sc for ch in old["chapters"] for sc in ch["scenes"]}
+            log_path = directory / old["log"]
+
+            appended = 0
+            chapters = []
+            with open(log_path, "ab") as log:
+                offset = log.seek(0, os.SEEK_END)
+                for ch in project.chapters:
+                    scenes = []
+                    for sc in ch.scenes:
+                        entry = self._scene_entry(sc, known.get(sc.id))
+                        if entry is None:
+                            data = sc.content.encode("utf-8")
+                            log.write(data)
+                            entry = {
+                                "id": sc.id,
+                                "offset": offset,
+                                "length": len(data),
+                                "hash": _content_hash(sc.content)
+                            }
+                            offset += len(data)
+                            appended += len(data)
+                        entry["title"] = sc.title
+                        scenes.append(entry)
+                    chapters.append({"title": ch.title, "scenes": scenes})
+                log.flush()
+                os.fsync(log.fileno())
+
+            manifest = {
+                "title": project.title,
+                "log": old["log"],
+                "chapters": chapters,
+                "characters": [c.to_dict() for c in project.characters]
+            }
+            self._write_manifest(directory, manifest)
+
+            live = sum(sc["length"] for ch in chapters for sc in ch["scenes"])
+            size = log_path.stat().st_size
+            if size > self.compact_min_bytes and size - live > size * self.compact_ratio:
+                self._compact(directory, manifest)
+            return appended
+
+    def compact(self, name: str):
+        """Переписывает журнал проекта, оставляя только актуальные тексты сцен"""
+        with self._lock:
+            directory = self.project_dir(name)
+            manifest = self._read_manifest(directory)
+            if manifest is not None:
+                self._compact(directory, manifest)
+
+    def delete(self, name: str):
+        with self._lock:
+            directory = self.project_dir(name)
+            self._manifests.pop(directory, None)
+            if directory.exists():
+                shutil.rmtree(directory)
+
+    def migrate_json(self, json_path: Path) -> Project:
+        """
+        Переносит проект из старого формата (один JSON-файл) в хранилище.
+        Исходный файл переименовывается в *.json.migrated и остаётся как резервная копия.
+        """
+        project = Project.load(json_path)
+        self.save(project)
+        json_path.rename(json_path.with_name(json_path.name + ".migrated"))
+        return project
+
+    def _scene_entry(self, scene: Scene, previous: Optional[dict]) -> Optional[dict]:
+        if previous is None:
+            return None
+        # Незагруженная сцена не менялась — не читаем её текст ради хэша
+        if scene.is_loaded and previous["hash"] != _content_hash(scene.content):
+            return None
+        return dict(previous)
+
+    def _read_scene(self, directory: Path, scene_id: str) -> str:
+        with self._lock:
+            manifest = self._read_manifest(directory)
+            entry = self._manifests[directory][2][scene_id]
+            with open(directory / manifest["log"], "rb") as log:
+                log.seek(entry["offset"])
+                return log.read(entry["length"]).decode("utf-8")
+
+    def _compact(self, directory: Path, manifest: dict):
+        old_log = directory / manifest["log"]
+        generation = int(manifest["log"].split(".")[1]) + 1
+        new_name = f"scenes.{generation}.log"
+
+        offset = 0
+        with open(old_log, "rb") as src, open(directory / new_name, "wb") as dst:
+            for ch in manifest["chapters"]:
+                for sc in ch["scenes"]:
+                    src.seek(sc["offset"])
+                    dst.write(src.read(sc["length"]))
+                    sc["offset"] = offset
+                    offset += sc["length"]
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        manifest["log"] = new_name
+        self._write_manifest(directory, manifest)
+        old_log.unlink()
+
+    def _read_manifest(self, directory: Path) -> Optional[dict]:
+        path = directory / MANIFEST_NAME
+        with self._lock:
+            try:
+                version = _file_version(path)
+            except FileNotFoundError:
+                self._manifests.pop(directory, None)
+                return None
+
+            cached = self._manifests.get(directory)
+            if cached is None or cached[0] != version:
+                manifest = json_loads(path.read_bytes())
+                self._cache_manifest(directory, version, manifest)
+            return self._manifests[directory][1]
+
+    def _cache_manifest(self, directory: Path, version: tuple, manifest: dict):
+        scenes = {sc["id"]: sc for ch in manifest["chapters"] for sc in ch["scenes"]}
+        self._manifests[directory] = (version, manifest, scenes)
+
+    def _write_manifest(self, directory: Path, manifest: dict):
+        write_json(directory / MANIFEST_NAME, manifest, fsync=True)
+        # Обновляем кэш сразу: mtime двух быстрых записей может совпасть
+        self._cache_manifest(directory, _file_version(directory / MANIFEST_NAME), manifest)
+
+
+def _file_version(path: Path) -> tuple:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
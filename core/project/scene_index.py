@@ -0,0 +1,210 @@
+import hashlib
+import re
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import numpy as np
+
+from utils.metrics import get_metrics
+from utils.serialization import JSONDecodeError, atomic_path, read_json, write_json
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+
+INDEX_NAME = "scene_index"
+
+
+def chunk_text(text: str, chunk_size: int = 800) -> List[str]:
+    """
+    Делит текст сцены на фрагменты до chunk_size символов по границам абзацев;
+    слишком длинные абзацы режутся по предложениям.
+    """
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n|\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= chunk_size:
+            pieces.append(paragraph)
+            continue
+        for sentence in re.split(r"(?<=[.!?…])\s+", paragraph):
+            while len(sentence) > chunk_size:
+                pieces.append(sentence[:chunk_size])
+                sentence = sentence[chunk_size:]
+            if sentence:
+                pieces.append(sentence)
+
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 1 > chunk_size:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class SceneIndex:
+    """
+    Векторный индекс фрагментов сцен одного проекта.
+
+    Хранится в папке проекта (scene_index/) по файлу на сцену: нормированные
+    эмбеддинги её фрагментов (<ключ>.npy) и сами фрагменты с хэшем текста
+    (<ключ>.json). Изменившаяся сцена переразбивается на фрагменты,
+    эмбеддятся и переписываются на диске только её данные.
+    Поиск — точное скалярное произведение по общей матрице в памяти.
+    """
+
+    def __init__(self, directory: Path, embeddings: "Embeddings", chunk_size: int = 800):
+        self.directory = Path(directory)
+        self.embeddings = embeddings
+        self.chunk_size = chunk_size
+        self.scenes_dir = self.directory / INDEX_NAME
+
+        self._lock = threading.Lock()
+        self.chunks: List[dict] = []
+        self.scene_hashes: dict = {}
+        self.matrix: Optional[np.ndarray] = None
+        self._load()
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def update_scene(self, scene_id: str, text: str) -> bool:
+        """
+        Переиндексирует сцену, если её текст изменился.
+        :return: True, если индекс был обновлён
+        """
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            if self.scene_hashes.get(scene_id) == digest:
+                return False
+
+        chunks = chunk_text(text, self.chunk_size)
+        vectors = self._normalize(self.embeddings.embed_documents(chunks)) if chunks else None
+
+        with self._lock:
+            self._drop(scene_id)
+            if chunks:
+                self.chunks = self.chunks + [{"scene_id": scene_id, "text": c} for c in chunks]
+                self.matrix = vectors if self.matrix is None else np.vstack([self.matrix, vectors])
+            self.scene_hashes[scene_id] = digest
+            self._save_scene(scene_id, digest, chunks, vectors)
+        return True
+
+    def remove_scene(self, scene_id: str):
+        with self._lock:
+            if scene_id in self.scene_hashes:
+                self._drop(scene_id)
+                del self.scene_hashes[scene_id]
+                for path in self._scene_files(scene_id):
+                    path.unlink(missing_ok=True)
+
+    def sync(self, project) -> int:
+        """
+        Приводит индекс в соответствие с проектом.
+        :return: количество переиндексированных сцен
+        """
+        live = {}
+        for chapter in project.chapters:
+            for scene in chapter.scenes:
+                live[scene.id] = scene
+        for scene_id in list(self.scene_hashes):
+            if scene_id not in live:
+                self.remove_scene(scene_id)
+        return sum(self.update_scene(scene_id, scene.content) for scene_id, scene in live.items())
+
+    def search(self, query: str, k: int = 5) -> List[str]:
+        with self._lock:
+            # Матрица и фрагменты заменяются целиком — снимок согласован
+            matrix, chunks = self.matrix, self.chunks
+        if matrix is None:
+            return []
+        vector = self._normalize([self.embeddings.embed_query(query)])[0]
+        return [chunks[i]["text"] for i in self._top(matrix, vector, k)]
+
+    def search_vector(self, vector: np.ndarray, k: int = 5) -> List[int]:
+        """Номера k ближайших фрагментов к уже нормированному вектору"""
+        with self._lock:
+            matrix = self.matrix
+        if matrix is None:
+            return []
+        return self._top(matrix, vector, k)
+
+    @staticmethod
+    def _top(matrix: np.ndarray, vector: np.ndarray, k: int) -> List[int]:
+        with get_metrics().span("scene_search"):
+            scores = matrix @ vector
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            return top[np.argsort(-scores[top])].tolist()
+
+    def _drop(self, scene_id: str):
+        keep = [i for i, c in enumerate(self.chunks) if c["scene_id"] != scene_id]
+        if len(keep) == len(self.chunks):
+            return
+        self.chunks = [self.chunks[i] for i in keep]
+        self.matrix = self.matrix[keep] if keep else None
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return matrix / norms
+
+    def _scene_files(self, scene_id: str) -> Tuple[Path, Path]:
+        # id сцены может содержать что угодно — имя файла берём из его хэша
+        stem = hashlib.sha1(scene_id.encode("utf-8")).hexdigest()
+        return self.scenes_dir / f"{stem}.npy", self.scenes_dir / f"{stem}.json"
+
+    def _save_scene(self, scene_id: str, digest: str, chunks: List[str], vectors: Optional[np.ndarray]):
+        vectors_path, meta_path = self._scene_files(scene_id)
+        if vectors is not None:
+            with atomic_path(vectors_path) as tmp:
+                with open(tmp, "wb") as f:
+                    np.save(f, vectors)
+        else:
+            vectors_path.unlink(missing_ok=True)
+        # Метаданные пишутся последними: по ним сцена считается проиндексированной
+        write_json(meta_path, {"scene_id": scene_id, "hash": digest, "chunks": chunks})
+
+    def _load(self):
+        self._migrate_legacy()
+        if not self.scenes_dir.exists():
+            return
+        chunks, matrices = [], []
+        for meta_path in sorted(self.scenes_dir.glob("*.json")):
+            try:
+                meta = read_json(meta_path)
+                vectors = np.load(meta_path.with_suffix(".npy")) if meta["chunks"] else None
+            except (JSONDecodeError, OSError, ValueError, KeyError):
+                # Недописанная сцена будет переиндексирована при sync
+                continue
+            if vectors is not None and len(vectors) != len(meta["chunks"]):
+                continue
+            self.scene_hashes[meta["scene_id"]] = meta["hash"]
+            chunks.extend({"scene_id": meta["scene_id"], "text": c} for c in meta["chunks"])
+            if vectors is not None:
+                matrices.append(vectors)
+        self.chunks = chunks
+        self.matrix = np.vstack(matrices) if matrices else None
+
+    def _migrate_legacy(self):
+        """Разносит общий индекс (scene_index.npy + scene_index.json) по файлам сцен"""
+        legacy_meta = self.directory / f"{INDEX_NAME}.json"
+        legacy_matrix = self.directory / f"{INDEX_NAME}.npy"
+        meta = read_json(legacy_meta)
+        if meta is None:
+            return
+        matrix = np.load(legacy_matrix) if meta["chunks"] and legacy_matrix.exists() else None
+        if matrix is not None and len(matrix) == len(meta["chunks"]):
+            for scene_id, digest in meta["scene_hashes"].items():
+                rows = [i for i, c in enumerate(meta["chunks"]) if c["scene_id"] == scene_id]
+                self._save_scene(scene_id, digest, [meta["chunks"][i]["text"] for i in rows],
+                                 matrix[rows] if rows else None)
+        legacy_matrix.unlink(missing_ok=True)
+        legacy_meta.unlink()
@@ -2,6 +2,8 @@ import streamlit as st
 import json
 from pathlib import Path
 
+from core.handler_pool import get_pool
+
 PROMPT_FILE = Path("core/prompts/base.json")
 
 
@@ -23,6 +25,7 @@ def prompt_editor_ui():
             parsed = json.loads(editor)  # Валидация
             PROMPT_FILE.write_text(json.dumps(
                 parsed, indent=2, ensure_ascii=False))
+            get_pool().invalidate(template_path=str(PROMPT_FILE))
             st.success("✅ Шаблон сохранён!")
         except json.JSONDecodeError as e:
             st.error(f"❌ Ошибка в JSON: {str(e)}")
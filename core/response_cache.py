@@ -0,0 +1,136 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+CACHE_PATH = "cache/responses.sqlite"
+
+
+class ResponseCache:
+    """
+    Двухуровневый кэш ответов модели с адресацией по содержимому.
+
+    Первый уровень — ограниченный LRU-словарь в памяти, второй — SQLite
+    на диске с вытеснением давно не использованных записей по суммарному размеру.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, memory_items: int = 256, max_disk_bytes: int = 64 * 1024 * 1024):
+        self.path = Path(path)
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._db.commit()
+        self._disk_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, temperature: float, seed: Optional[int], messages: List["BaseMessage"]) -> str:
+        payload = json.dumps({
+            "model": model,
+            "temperature": temperature,
+            "seed": seed,
+            "messages": [[m.type, m.content] for m in messages]
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return self._memory[key]
+
+            row = self._db.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+
+            self._db.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self._counters["disk_hits"] += 1
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, key: str, response: str):
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._remember(key, response)
+
+            old = self._db.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time())
+            )
+            self._disk_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            total = hits + self._counters["misses"]
+            return {
+                **self._counters,
+                "hits": hits,
+                "hit_rate": hits / total if total else 0.0,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._disk_bytes = 0
+
+    def _remember(self, key: str, response: str):
+        self._memory[key] = response
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        while self._disk_bytes > self.max_disk_bytes:
+            row = self._db.execute(
+                "SELECT key, size FROM responses ORDER BY accessed LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            self._disk_bytes -= row[1]
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Общий для процесса кэш ответов (создаётся при первом обращении)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -0,0 +1,316 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from utils.config import load_config
+from utils.metrics import get_metrics
+
+# Классы приоритета, от высшего к низшему
+INTERACTIVE = "interactive"    # автор ждёт ответа
+BACKGROUND = "background"      # сводка и персонажи после хода
+SPECULATIVE = "speculative"    # упреждающие продолжения сцен
+PRIORITIES = (INTERACTIVE, BACKGROUND, SPECULATIVE)
+
+# Ollama по умолчанию обслуживает до 4 запросов к модели параллельно
+DEFAULT_SLOTS = 4
+
+
+def default_slots() -> int:
+    """Слотов на модель: OLLAMA_NUM_PARALLEL, если задан, иначе как у Ollama по умолчанию"""
+    value = os.environ.get("OLLAMA_NUM_PARALLEL", "").strip()
+    return int(value) if value.isdigit() and int(value) > 0 else DEFAULT_SLOTS
+
+
+class SchedulerRejected(RuntimeError):
+    """Запрос к модели не принят: очередь переполнена или ожидание истекло"""
+
+
+def current_session() -> str:
+    """Сессия Streamlit текущего потока; вне Streamlit — имя потока"""
+    if "streamlit" in sys.modules:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is not None:
+            return ctx.session_id
+    return threading.current_thread().name
+
+
+class Ticket:
+    """Место в очереди к модели; после выдачи — занятый слот"""
+    __slots__ = ("model", "priority", "session", "enqueued", "state")
+
+    def __init__(self, model: str, priority: str, session: str):
+        self.model = model
+        self.priority = priority
+        self.session = session
+        self.enqueued = time.monotonic()
+        # waiting → granted → released; ожидание может закончиться cancelled
+        self.state = "waiting"
+
+
+class _ModelQueue:
+    def __init__(self, model: str, slots: int):
+        self.model = model
+        self.slots = slots
+        self.active = 0
+        # Для каждого класса: сессия -> её запросы; сессии обслуживаются по кругу
+        self.waiting: Dict[str, "OrderedDict[str, deque]"] = {p: OrderedDict() for p in PRIORITIES}
+        self.size = 0
+
+
+class RequestScheduler:
+    """
+    Планировщик запросов к моделям Ollama.
+
+    У каждой модели ограниченное число слотов — одновременных запросов.
+    Остальные ждут в очереди: сначала интерактивные, затем фоновые задачи
+    памяти, затем упреждающая генерация. Внутри класса сессии обслуживаются
+    по кругу, поэтому одна вкладка с пакетом запросов не задерживает
+    остальных. Фоновая задача, ждущая дольше aging секунд, обслуживается
+    вне очереди, чтобы сводка не отставала под постоянной нагрузкой.
+
+    Интерактивные и упреждающие запросы сверх max_queue отклоняются
+    (SchedulerRejected); фоновые принимаются всегда — их не больше, чем
+    обработчиков в пуле.
+    """
+
+    def __init__(
+        self,
+        slots: Optional[int] = None,
+        model_slots: Optional[Dict[str, int]] = None,
+        max_queue: int = 16,
+        timeout: Optional[float] = 300.0,
+        aging: float = 5.0,
+        quiet: float = 1.0
+    ):
+        """
+        :param slots: Слотов на модель по умолчанию; None — см. default_slots
+        :param model_slots: Слоты для отдельных моделей, например {"ollama:llama3": 2}
+        :param max_queue: Максимум ожидающих запросов к одной модели
+        :param timeout: Сколько интерактивный запрос ждёт слот, с
+        :param aging: Через сколько секунд ожидания фоновая задача идёт вне очереди
+        :param quiet: Сколько секунд без интерактивных запросов считается затишьем
+        """
+        self.slots = slots or default_slots()
+        self.model_slots = dict(model_slots or {})
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.aging = aging
+        self.quiet = quiet
+        self._cond = threading.Condition()
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._interactive = 0
+        self._last_interactive = 0.0
+        self._local = threading.local()
+
+    @contextmanager
+    def priority(self, priority: str) -> Iterator[None]:
+        """Класс по умолчанию для slot() в этом потоке внутри блока"""
+        outer = getattr(self._local, "priority", None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = outer
+
+    def slots_for(self, model: str) -> int:
+        return self.model_slots.get(model, self.slots)
+
+    def current_priority(self) -> str:
+        return getattr(self._local, "priority", None) or INTERACTIVE
+
+    @contextmanager
+    def slot(self, model: str, priority: Optional[str] = None, session: Optional[str] = None,
+             timeout: Optional[float] = None) -> Iterator[Ticket]:
+        """Занимает слот модели на время блока"""
+        ticket = self.enqueue(model, priority, session)
+        try:
+            self.wait(ticket, timeout)
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def enqueue(self, model: str, priority: Optional[str] = None, session: Optional[str] = None) -> Ticket:
+        """
+        Ставит запрос в очередь модели (слот выдаётся сразу, если свободен).
+        :raises SchedulerRejected: очередь модели переполнена
+        """
+        priority = priority or self.current_priority()
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        ticket = Ticket(model, priority, session or current_session())
+
+        with self._cond:
+            queue = self._queue(model)
+            if priority != BACKGROUND and queue.size >= self.max_queue:
+                get_metrics().inc("scheduler_requests", model=model, priority=priority, outcome="rejected")
+                raise SchedulerRejected(f"Очередь к модели {model} переполнена ({queue.size} запросов)")
+            sessions = queue.waiting[priority]
+            sessions.setdefault(ticket.session, deque()).append(ticket)
+            queue.size += 1
+            if priority == INTERACTIVE:
+                self._interactive += 1
+            self._dispatch(queue)
+        return ticket
+
+    def wait(self, ticket: Ticket, timeout: Optional[float] = None):
+        """
+        Дожидается слота для запроса.
+        :raises SchedulerRejected: ожидание истекло или запрос отменён
+        """
+        if timeout is None and ticket.priority == INTERACTIVE:
+            timeout = self.timeout
+        with self._cond:
+            granted = self._cond.wait_for(lambda: ticket.state != "waiting", timeout=timeout)
+            if ticket.state == "granted":
+                return
+            if not granted:
+                self._remove(ticket, outcome="timeout")
+            raise SchedulerRejected(f"Нет свободного слота модели {ticket.model}")
+
+    def release(self, ticket: Ticket):
+        """Освобождает слот или убирает запрос из очереди, если слот не был выдан"""
+        with self._cond:
+            if ticket.state == "granted":
+                ticket.state = "released"
+                queue = self._queues[ticket.model]
+                queue.active -= 1
+                if ticket.priority == INTERACTIVE:
+                    self._interactive -= 1
+                    self._last_interactive = time.monotonic()
+                self._dispatch(queue)
+            elif ticket.state == "waiting":
+                self._remove(ticket, outcome="cancelled")
+
+    def should_yield(self, model: str, priority: str) -> bool:
+        """
+        Стоит ли запросу класса priority уступить модель: её ждут запросы
+        выше классом, а упреждающая генерация уступает и любому интерактивному.
+        """
+        rank = PRIORITIES.index(priority)
+        with self._cond:
+            if priority == SPECULATIVE and self._interactive > 0:
+                return True
+            queue = self._queues.get(model)
+            return queue is not None and any(queue.waiting[p] for p in PRIORITIES[:rank])
+
+    def busy(self) -> bool:
+        """Есть ли интерактивные запросы — выполняющиеся или ожидающие"""
+        with self._cond:
+            return self._interactive > 0
+
+    def wait_idle(self, cancel: Optional[threading.Event] = None, poll: float = 0.1) -> bool:
+        """
+        Дожидается затишья: нет интерактивных запросов уже quiet секунд.
+        :return: False, если ожидание прервано событием cancel
+        """
+        with self._cond:
+            while True:
+                if cancel is not None and cancel.is_set():
+                    return False
+                if self._interactive == 0:
+                    remaining = self._last_interactive + self.quiet - time.monotonic()
+                    if remaining <= 0:
+                        return True
+                    self._cond.wait(min(remaining, poll))
+                else:
+                    self._cond.wait(poll)
+
+    def stats(self) -> Dict[str, dict]:
+        """Слоты и очереди по моделям для диагностики"""
+        with self._cond:
+            return {
+                model: {
+                    "slots": queue.slots,
+                    "active": queue.active,
+                    **{f"waiting_{p}": sum(len(d) for d in queue.waiting[p].values()) for p in PRIORITIES}
+                }
+                for model, queue in sorted(self._queues.items())
+            }
+
+    def _queue(self, model: str) -> _ModelQueue:
+        queue = self._queues.get(model)
+        if queue is None:
+            queue = self._queues[model] = _ModelQueue(model, self.slots_for(model))
+        return queue
+
+    def _dispatch(self, queue: _ModelQueue):
+        while queue.active < queue.slots and queue.size:
+            ticket = self._pick(queue)
+            ticket.state = "granted"
+            queue.active += 1
+            queue.size -= 1
+            waited = time.monotonic() - ticket.enqueued
+            metrics = get_metrics()
+            metrics.observe("scheduler_wait", waited, model=ticket.model, priority=ticket.priority)
+            metrics.inc("scheduler_requests", model=ticket.model, priority=ticket.priority, outcome="admitted")
+        self._publish(queue)
+        self._cond.notify_all()
+
+    def _pick(self, queue: _ModelQueue) -> Ticket:
+        order = PRIORITIES
+        background = queue.waiting[BACKGROUND]
+        if background and any(time.monotonic() - d[0].enqueued > self.aging for d in background.values()):
+            order = (BACKGROUND,) + tuple(p for p in PRIORITIES if p != BACKGROUND)
+
+        for priority in order:
+            sessions = queue.waiting[priority]
+            if not sessions:
+                continue
+            session, tickets = next(iter(sessions.items()))
+            ticket = tickets.popleft()
+            if tickets:
+                # Следующий запрос этой сессии — после запросов остальных сессий
+                sessions.move_to_end(session)
+            else:
+                del sessions[session]
+            return ticket
+        raise RuntimeError("Пустая очередь")
+
+    def _remove(self, ticket: Ticket, outcome: str):
+        queue = self._queues[ticket.model]
+        sessions = queue.waiting[ticket.priority]
+        tickets = sessions.get(ticket.session)
+        if tickets is not None and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del sessions[ticket.session]
+            queue.size -= 1
+        ticket.state = "cancelled"
+        if ticket.priority == INTERACTIVE:
+            self._interactive -= 1
+            self._last_interactive = time.monotonic()
+        get_metrics().inc("scheduler_requests", model=ticket.model, priority=ticket.priority, outcome=outcome)
+        self._publish(queue)
+        self._cond.notify_all()
+
+    def _publish(self, queue: _ModelQueue):
+        metrics = get_metrics()
+        metrics.set_gauge("scheduler_queue_depth", queue.size, model=queue.model)
+        metrics.set_gauge("scheduler_active", queue.active, model=queue.model)
+
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """
+    Общий для процесса планировщик. Слоты и размер очереди берутся из
+    config.json: llm_slots, llm_model_slots, llm_max_queue; без llm_slots
+    число слотов задаёт OLLAMA_NUM_PARALLEL (см. default_slots).
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            config = load_config()
+            _scheduler = RequestScheduler(
+                slots=int(config.get("llm_slots") or default_slots()),
+                model_slots=config.get("llm_model_slots"),
+                max_queue=int(config.get("llm_max_queue", 16)))
+        return _scheduler
@@ -0,0 +1,245 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+from core.scheduler import get_scheduler
+from utils.metrics import get_metrics
+
+if TYPE_CHECKING:
+    from core.llm_handler import Draft, LLMHandler
+    from core.project.project_model import Scene
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних символов сцены уходит в промпт продолжения
+TAIL_CHARS = 4000
+
+CONTINUATION_PROMPT = """Продолжи сцену «{title}», сохраняя стиль, голос и темп автора.
+Не пересказывай написанное — сразу пиши следующий фрагмент.
+
+{text}"""
+
+
+def continuation_prompt(title: str, text: str, tail_chars: int = TAIL_CHARS) -> str:
+    """Промпт «продолжить сцену» по её концу"""
+    return CONTINUATION_PROMPT.format(title=title, text=text[-tail_chars:])
+
+
+def scene_key(title: str, text: str, model_name: str, temperature: float,
+              prompt_layout: str = "rolling") -> str:
+    """Хэш содержимого сцены и настроек модели, к которым привязан черновик"""
+    payload = f"{model_name}\0{float(temperature)!r}\0{prompt_layout}\0{title}\0{text}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class SpeculativeJob:
+    key: str
+    prompt: str
+    handler_kwargs: dict
+    cancel: threading.Event = field(default_factory=threading.Event)
+    # Автор ждёт черновик: генерация больше не уступает модель (см. LLMHandler.draft)
+    adopted: threading.Event = field(default_factory=threading.Event)
+    # queued → running → ready | cancelled | failed; прерванная задача снова queued
+    status: str = "queued"
+    draft: Optional["Draft"] = None
+    error: Optional[str] = None
+    ready_at: Optional[float] = None
+
+
+class SpeculativeQueue:
+    """
+    Упреждающая генерация продолжений сцен.
+
+    После сохранения сцены submit ставит в очередь генерацию её вероятного
+    продолжения. Черновик привязан к хэшу текста сцены и настроек модели:
+    если сцена снова изменилась, прежняя задача отменяется, а её результат
+    не будет выдан. take отдаёт готовый черновик при совпадении хэша —
+    кнопка «продолжить» срабатывает мгновенно. Если черновик ещё пишется,
+    take(adopt=True) дожидается его, и генерация дописывается без уступок.
+
+    Задачи выполняет один фоновый поток с низшим приоритетом планировщика
+    (RequestScheduler): он ждёт затишья в интерактивных запросах, а пришедший
+    интерактивный запрос прерывает черновик — задача вернётся в очередь.
+    """
+
+    def __init__(
+        self,
+        handler_factory: Optional[Callable[..., "LLMHandler"]] = None,
+        max_ready: int = 16,
+        ttl: float = 900.0
+    ):
+        """
+        :param handler_factory: Источник обработчиков; по умолчанию общий пул (get_handler)
+        :param max_ready: Сколько готовых черновиков хранить, старые вытесняются
+        :param ttl: Время жизни готового черновика, с — контекст памяти устаревает
+        """
+        self.handler_factory = handler_factory
+        self.max_ready = max_ready
+        self.ttl = ttl
+        self._jobs: Dict[Tuple[str, str], SpeculativeJob] = {}
+        self._pending: deque = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, project: str, scene: "Scene", model_name: str = "ollama:llama3",
+               temperature: float = 0.7, prompt_layout: str = "rolling",
+               **handler_kwargs) -> SpeculativeJob:
+        """
+        Ставит в очередь продолжение сцены. Задача для той же сцены с другим
+        текстом отменяется; для того же текста возвращается существующая.
+        """
+        key = scene_key(scene.title, scene.content, model_name, temperature, prompt_layout)
+        with self._cond:
+            current = self._jobs.get((project, scene.id))
+            if current is not None and current.key == key and current.status in ("queued", "running", "ready"):
+                return current
+            self._drop((project, scene.id))
+
+            job = SpeculativeJob(
+                key=key,
+                prompt=continuation_prompt(scene.title, scene.content),
+                handler_kwargs={"model_name": model_name, "temperature": temperature,
+                                "project": project, "prompt_layout": prompt_layout,
+                                **handler_kwargs})
+            self._jobs[(project, scene.id)] = job
+            self._pending.append(job)
+            self._ensure_started()
+            self._cond.notify_all()
+        get_metrics().inc("speculative_jobs", status="submitted")
+        return job
+
+    def invalidate(self, project: str, scene_id: str):
+        """Отменяет задачу сцены и забывает её черновик (сцена изменена или удалена)"""
+        with self._cond:
+            self._drop((project, scene_id))
+
+    def take(self, project: str, scene: "Scene", model_name: str = "ollama:llama3",
+             temperature: float = 0.7, prompt_layout: str = "rolling",
+             adopt: bool = False) -> Optional["Draft"]:
+        """
+        Готовый черновик для текущего текста сцены или None.
+        :param adopt: Дождаться уже идущей генерации того же текста. Она начата
+            раньше нового запроса и с этого момента не уступает модель, поэтому
+            ожидание не дольше обычной генерации
+        """
+        key = scene_key(scene.title, scene.content, model_name, temperature, prompt_layout)
+        with self._cond:
+            job = self._jobs.get((project, scene.id))
+            if job is not None and job.key == key and job.status == "running" and adopt:
+                job.adopted.set()
+                get_metrics().inc("speculative_jobs", status="adopted")
+                self._cond.wait_for(lambda: job.status != "running")
+
+            draft = None
+            if job is not None and job.key == key and job.status == "ready" and not self._expired(job):
+                draft = job.draft
+            if job is not None:
+                # Черновик выдаётся один раз, а незавершённая задача больше не нужна —
+                # автор сейчас получит ответ интерактивным запросом
+                self._drop((project, scene.id))
+
+        get_metrics().inc("speculative_hits" if draft is not None else "speculative_misses")
+        return draft
+
+    def status(self, project: str, scene_id: str) -> Optional[str]:
+        with self._cond:
+            job = self._jobs.get((project, scene_id))
+            if job is None:
+                return None
+            return "expired" if job.status == "ready" and self._expired(job) else job.status
+
+    def __len__(self):
+        with self._cond:
+            return len(self._jobs)
+
+    def _drop(self, scene: Tuple[str, str]):
+        job = self._jobs.pop(scene, None)
+        if job is not None:
+            job.cancel.set()
+            if job.status in ("queued", "running"):
+                job.status = "cancelled"
+                get_metrics().inc("speculative_jobs", status="cancelled")
+            self._cond.notify_all()
+
+    def _expired(self, job: SpeculativeJob) -> bool:
+        return job.ready_at is not None and time.monotonic() - job.ready_at > self.ttl
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="speculative", daemon=True)
+            self._thread.start()
+
+    def _next_job(self) -> SpeculativeJob:
+        with self._cond:
+            while True:
+                while self._pending:
+                    job = self._pending.popleft()
+                    if job.status == "queued" and not job.cancel.is_set():
+                        return job
+                self._cond.wait()
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if not get_scheduler().wait_idle(job.cancel):
+                continue
+            with self._cond:
+                if job.cancel.is_set():
+                    continue
+                job.status = "running"
+            try:
+                self._execute(job)
+            except Exception as e:
+                logger.exception("Упреждающая генерация не удалась")
+                with self._cond:
+                    job.status, job.error = "failed", str(e)
+                    self._cond.notify_all()
+                get_metrics().inc("speculative_jobs", status="failed")
+
+    def _execute(self, job: SpeculativeJob):
+        if self.handler_factory is None:
+            from core.handler_pool import get_handler
+
+            self.handler_factory = get_handler
+        handler = self.handler_factory(**job.handler_kwargs)
+        started = time.perf_counter()
+        draft = handler.draft(job.prompt, cancel=job.cancel, adopted=job.adopted)
+
+        with self._cond:
+            if job.cancel.is_set():
+                return
+            if draft is None:
+                # Модель понадобилась автору — повторим, когда она освободится
+                job.status = "queued"
+                self._pending.append(job)
+                get_metrics().inc("speculative_jobs", status="preempted")
+            else:
+                job.status, job.draft, job.ready_at = "ready", draft, time.monotonic()
+                get_metrics().observe("speculative_draft", time.perf_counter() - started,
+                                      model=job.handler_kwargs["model_name"])
+                get_metrics().inc("speculative_jobs", status="ready")
+                self._evict()
+            self._cond.notify_all()
+
+    def _evict(self):
+        ready = [(job.ready_at, scene) for scene, job in self._jobs.items() if job.status == "ready"]
+        for _, scene in sorted(ready)[:max(0, len(ready) - self.max_ready)]:
+            self._drop(scene)
+
+
+_queue: Optional[SpeculativeQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_speculative_queue() -> SpeculativeQueue:
+    """Общая для процесса очередь упреждающих продолжений"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = SpeculativeQueue()
+        return _queue
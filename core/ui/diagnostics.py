@@ -0,0 +1,45 @@
+import streamlit as st
+from core.handler_pool import get_pool
+from core.response_cache import get_response_cache
+from core.scheduler import get_scheduler
+from utils.metrics import get_metrics
+
+
+def diagnostics_ui():
+    st.title("🩺 Диагностика")
+
+    metrics = get_metrics()
+    snapshot = metrics.snapshot()
+
+    st.subheader("Этапы генерации")
+    if snapshot["stages"]:
+        st.dataframe(snapshot["stages"], use_container_width=True)
+    else:
+        st.info("Пока нет данных — сгенерируйте текст.")
+
+    st.subheader("Счётчики")
+    if snapshot["counters"]:
+        st.dataframe(snapshot["counters"], use_container_width=True)
+
+    st.subheader("Очереди к моделям")
+    queues = get_scheduler().stats()
+    if queues:
+        st.dataframe([{"model": model, **stats} for model, stats in queues.items()],
+                     use_container_width=True)
+    else:
+        st.info("Запросов к моделям ещё не было.")
+
+    col1, col2 = st.columns(2)
+    col1.metric("Обработчиков в пуле", len(get_pool()))
+    cache_stats = get_response_cache().stats()
+    col2.metric("Кэш ответов: попадания", f"{cache_stats['hit_rate']:.0%}")
+
+    prometheus = metrics.to_prometheus()
+    st.download_button("⬇️ Экспорт (Prometheus)", data=prometheus,
+                       file_name="writerai_metrics.prom", mime="text/plain")
+    with st.expander("Текст в формате Prometheus"):
+        st.code(prometheus, language="text")
+
+    if st.button("Сбросить метрики"):
+        metrics.reset()
+        st.rerun()
@@ -1,6 +1,8 @@
 import streamlit as st
 import logging
-from core.llm_handler import LLMHandler
+from core.handler_pool import get_handler
+from core.project.project_manager import list_projects
+from core.scheduler import SchedulerRejected
 from utils.config import load_config, save_config
 
 # Настройка логирования
@@ -25,52 +27,98 @@ def generation_ui():
     config = load_config()
     default_model = config.get("model", "llama3")
     default_temp = config.get("temperature", 0.7)
+    default_layout = config.get("prompt_layout", "rolling")
 
     st.sidebar.header("⚙️ Настройки")
     model_choice = st.sidebar.selectbox("Модель", ["llama3", "mistral"], index=[
                                         "llama3", "mistral"].index(default_model))
     temperature = st.sidebar.slider(
-        "Креативность", 0.1, 1.0, float(default_temp))
+        "Креативность", 0.0, 1.0, float(default_temp))
+    prompt_layout = st.sidebar.selectbox(
+        "Раскладка промпта", ["rolling", "stable"], index=["rolling", "stable"].index(default_layout),
+        help="stable — начало промпта не меняется между запросами, и Ollama "
+             "переиспользует его кэш; rolling — скользящее окно истории")
 
     if st.sidebar.button("🔖 Сохранить настройки"):
-        save_config({"model": model_choice, "temperature": temperature})
+        save_config({**config, "model": model_choice, "temperature": temperature,
+                     "prompt_layout": prompt_layout})
         st.sidebar.success("Настройки сохранены!")
 
     user_text = st.text_area("Введите ваш текст:",
                              height=300, placeholder="Начните писать здесь...")
 
+    stream_output = st.sidebar.checkbox("Потоковый вывод", value=True)
+    use_cache = st.sidebar.checkbox(
+        "Кэшировать ответы", value=False,
+        help="Работает при креативности 0 или с фиксированным seed")
+    seed = st.sidebar.number_input("Seed (0 — случайный)", min_value=0, value=0, step=1)
+    project_name = st.sidebar.selectbox(
+        "Проект", ["—"] + list_projects(),
+        help="Фрагменты сцен проекта, близкие к запросу, попадут в контекст")
+
     if st.button("✍️ Сгенерировать продолжение"):
         if user_text.strip():
-            with st.spinner("ИИ думает..."):
-                handler = LLMHandler(
-                    model_name=f"ollama:{model_choice}",
-                    temperature=temperature,
-                    use_memory=True
-                )
-
-                generated_text = handler.generate_from_template(user_text)
-
-                st.success("✅ Продолжение готово:")
-                st.text_area("Ответ", value=generated_text, height=300)
-
-                st.session_state.history.append({
-                    "input": user_text,
-                    "output": generated_text
-                })
-
-                log_interaction(user_text, generated_text)
-
-                with st.expander("🧠 Контекст памяти"):
-                    memory = handler.get_context_data()
-
-                    st.subheader("📘 Сводка сюжета")
-                    st.json(memory["summary"])
-
-                    st.subheader("👤 Персонажи")
-                    st.json(memory["characters"])
-
-                    st.subheader("🌍 Лор / Магические правила")
-                    for item in memory["lore"]:
-                        st.markdown(f"- {item}")
+            handler = get_handler(
+                model_name=f"ollama:{model_choice}",
+                temperature=temperature,
+                use_memory=True,
+                project=None if project_name == "—" else project_name,
+                seed=int(seed) or None,
+                use_cache=use_cache,
+                prompt_layout=prompt_layout
+            )
+
+            try:
+                if stream_output:
+                    st.success("✍️ Продолжение:")
+                    generated_text = st.write_stream(
+                        handler.stream_from_template(user_text))
+                else:
+                    with st.spinner("ИИ думает..."):
+                        generated_text = handler.generate_from_template(user_text)
+
+                    st.success("✅ Продолжение готово:")
+                    st.text_area("Ответ", value=generated_text, height=300)
+            except SchedulerRejected as e:
+                st.error(f"Модель перегружена, попробуйте позже: {e}")
+                return
+
+            ttft_ms = handler.last_metrics.get("ttft_ms")
+            if ttft_ms is not None:
+                st.caption(f"Первый токен: {ttft_ms:.0f} мс")
+            prompt_eval_ms = handler.last_metrics.get("prompt_eval_ms")
+            if prompt_eval_ms is not None:
+                st.caption(
+                    f"Обработка промпта: {prompt_eval_ms:.0f} мс "
+                    f"({handler.last_metrics.get('prompt_eval_count')} токенов)")
+            tokens_per_sec = handler.last_metrics.get("tokens_per_sec")
+            if tokens_per_sec:
+                st.caption(f"Скорость генерации: {tokens_per_sec:.1f} токенов/с")
+            if handler.cache is not None:
+                stats = handler.cache.stats()
+                st.caption(
+                    f"Кэш: {stats['hits']} попаданий / {stats['misses']} промахов")
+
+            st.session_state.history.append({
+                "input": user_text,
+                "output": generated_text
+            })
+
+            log_interaction(user_text, generated_text)
+
+            with st.expander("🧠 Контекст памяти"):
+                memory = handler.get_context_data()
+                if memory.get("pending"):
+                    st.caption("⏳ Память ещё обновляется — показано последнее сохранённое состояние")
+
+                st.subheader("📘 Сводка сюжета")
+                st.json(memory["summary"])
+
+                st.subheader("👤 Персонажи")
+                st.json(memory["characters"])
+
+                st.subheader("🌍 Лор / Магические правила")
+                for item in memory["lore"]:
+                    st.markdown(f"- {item}")
         else:
             st.warning("Введите текст для генерации.")
@@ -1,24 +1,59 @@
+import math
+from datetime import datetime, time
+
 import streamlit as st
-from core.llm_handler import LLMHandler
-from logger.log_writer import list_log_files, load_logs_from_file
+from logger.log_writer import entry_prompt, list_log_files, list_models, query_logs
 
 LOGS_PATH = "logs"
+PAGE_SIZE = 20
 
 
 def history_ui():
     st.title("📜 История запросов")
 
     log_files = list_log_files()
-    if log_files:
-        selected_log = st.selectbox(
-            "Выберите файл лога", log_files, index=len(log_files)-1)
-        logs = load_logs_from_file(selected_log)
-
-        for entry in reversed(logs):
-            with st.expander(f"{entry.get('timestamp', 'нет времени')} | {entry.get('model_name', 'модель?')}"):
-                st.markdown(
-                    f"**Prompt:**\n```text\n{entry.get('prompt', '')}```")
-                st.markdown(
-                    f"**Response:**\n```text\n{entry.get('response', '')}```")
-    else:
+    if not log_files:
         st.info("Файлы логов не найдены.")
+        return
+
+    # Фильтры обслуживаются индексом логов, без полного чтения файлов
+    today = datetime.utcnow().date()
+    col_dates, col_model, col_text = st.columns(3)
+    dates = col_dates.date_input("Период", value=(today, today))
+    model = col_model.selectbox("Модель", ["Все"] + list_models())
+    text = col_text.text_input("Поиск по тексту")
+
+    if isinstance(dates, (list, tuple)):
+        start_date, end_date = (dates[0], dates[-1]) if dates else (None, None)
+    else:
+        start_date = end_date = dates
+    start = datetime.combine(start_date, time.min) if start_date else None
+    end = datetime.combine(end_date, time.max) if end_date else None
+
+    page = st.session_state.get("history_page", 0)
+    logs, total = query_logs(
+        page=page,
+        page_size=PAGE_SIZE,
+        start=start,
+        end=end,
+        model=None if model == "Все" else model,
+        text=text.strip()
+    )
+
+    pages = max(1, math.ceil(total / PAGE_SIZE))
+    page = st.number_input(
+        f"Страница (всего {pages}, записей {total})",
+        min_value=1, max_value=pages, value=min(page + 1, pages)) - 1
+    if page != st.session_state.get("history_page", 0):
+        st.session_state.history_page = page
+        st.rerun()
+
+    for i, entry in enumerate(logs):
+        with st.expander(f"{entry.get('timestamp', 'нет времени')} | {entry.get('model_name', 'модель?')}"):
+            # Полный промпт собирается из блобов только по запросу
+            full = "prompt_refs" in entry and st.checkbox(
+                "Показать полный промпт", key=f"full_prompt_{page}_{i}")
+            st.markdown(
+                f"**Prompt:**\n```text\n{entry_prompt(entry, full=full)}```")
+            st.markdown(
+                f"**Response:**\n```text\n{entry.get('response', '')}```")
@@ -0,0 +1,84 @@
+import hashlib
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional
+
+BLOB_DIR = "blobs"
+
+
+class BlobStore:
+    """
+    Хранилище фрагментов промптов с адресацией по содержимому.
+
+    Каждый фрагмент (системный промпт, пример, реплика истории) записывается
+    один раз в файл <root>/<первые 2 символа хэша>/<хэш>, а записи лога
+    ссылаются на него по хэшу.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._known: set = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def put(self, text: str) -> str:
+        digest = self.hash(text)
+        if digest in self._known:
+            return digest
+
+        path = self.path(digest)
+        with self._lock:
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(f"{digest}.{threading.get_ident()}.tmp")
+                tmp.write_text(text, encoding="utf-8")
+                os.replace(tmp, path)
+            self._known.add(digest)
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        return _read_blob(str(self.path(digest)))
+
+
+@lru_cache(maxsize=1024)
+def _read_blob(path: str) -> Optional[str]:
+    # Блоб неизменен после записи, поэтому его можно кэшировать по пути
+    try:
+        return Path(path).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+
+
+def store_segments(entry: dict, store: BlobStore) -> dict:
+    """
+    Заменяет тексты фрагментов промпта в записи лога ссылками на блобы.
+    """
+    segments = entry.pop("prompt_segments", None)
+    if segments is not None:
+        entry["prompt_refs"] = [
+            {"role": role, "hash": store.put(content)} for role, content in segments
+        ]
+    return entry
+
+
+def resolve_prompt(entry: dict, store: BlobStore, last_only: bool = False) -> str:
+    """
+    Восстанавливает промпт записи лога. Старые записи хранят его целиком,
+    новые — списком ссылок на блобы.
+    :param last_only: Вернуть только последний фрагмент (запрос пользователя)
+    """
+    if "prompt_refs" not in entry:
+        return entry.get("prompt", "")
+
+    refs: List[dict] = entry["prompt_refs"]
+    if last_only:
+        refs = refs[-1:]
+    return "\n".join(store.get(ref["hash"]) or "" for ref in refs)
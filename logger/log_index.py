@@ -0,0 +1,235 @@
+import io
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import zstandard
+
+from logger.blob_store import BlobStore, BLOB_DIR, resolve_prompt
+from utils.serialization import JSONDecodeError, json_loads
+
+ARCHIVE_SUFFIX = ".zst"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    timestamp TEXT,
+    model TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_timestamp ON entries (timestamp);
+CREATE INDEX IF NOT EXISTS entries_model ON entries (model);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_text USING fts5 (text, tokenize = 'trigram');
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+class LogIndex:
+    """
+    Индекс смещений для дневного .jsonl-лога, хранящийся рядом с ним (*.jsonl.idx).
+
+    Для каждой записи хранится смещение строки в логе, время и модель,
+    а текст запроса и ответа — в триграммном FTS5-индексе для поиска подстрок
+    (для записей с блобами индексируется только последний фрагмент промпта).
+    Индекс дополняется инкрементально: при каждом обращении разбираются
+    только строки, дописанные с прошлого раза.
+
+    Если день уже заархивирован (*.jsonl.zst), смещения относятся к
+    распакованному потоку, а чтение страницы распаковывает архив потоково
+    до нужных строк.
+    """
+
+    def __init__(self, log_path: Path):
+        log_path = Path(log_path)
+        if log_path.name.endswith(ARCHIVE_SUFFIX):
+            log_path = log_path.with_name(log_path.name[:-len(ARCHIVE_SUFFIX)])
+        self.log_path = log_path
+        self.archive_path = log_path.with_name(log_path.name + ARCHIVE_SUFFIX)
+        self.index_path = self.log_path.with_name(self.log_path.name + ".idx")
+        self.blobs = BlobStore(self.log_path.parent / BLOB_DIR)
+
+    @property
+    def is_archived(self) -> bool:
+        return not self.log_path.exists() and self.archive_path.exists()
+
+    def page(
+        self,
+        page: int = 0,
+        page_size: int = 20,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        model: Optional[str] = None,
+        text: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Страница записей (от новых к старым), подходящих под фильтры.
+        :param start: Нижняя граница времени в ISO-формате (включительно)
+        :param end: Верхняя граница времени в ISO-формате (включительно)
+        :param model: Имя модели
+        :param text: Подстрока промпта или ответа
+        """
+        return self.entries(page_size, page * page_size, start, end, model, text)
+
+    def entries(
+        self,
+        limit: int,
+        skip: int = 0,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        model: Optional[str] = None,
+        text: Optional[str] = None
+    ) -> List[dict]:
+        """limit записей (от новых к старым), начиная с skip-й подходящей"""
+        where, params = self._filters(start, end, model, text)
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT offset, length FROM entries {where} ORDER BY id DESC LIMIT ? OFFSET ?",
+                params + [limit, skip]
+            ).fetchall()
+        return self._read_entries(rows)
+
+    def count(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        model: Optional[str] = None,
+        text: Optional[str] = None
+    ) -> int:
+        where, params = self._filters(start, end, model, text)
+        with self._connect() as db:
+            return db.execute(f"SELECT COUNT(*) FROM entries {where}", params).fetchone()[0]
+
+    def models(self) -> List[str]:
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT DISTINCT model FROM entries WHERE model IS NOT NULL ORDER BY model").fetchall()
+        return [r[0] for r in rows]
+
+    def _filters(self, start, end, model, text) -> Tuple[str, list]:
+        clauses, params = [], []
+        if start:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            clauses.append("timestamp <= ?")
+            params.append(end)
+        if model:
+            clauses.append("model = ?")
+            params.append(model)
+        if text:
+            clauses.append("id IN (SELECT rowid FROM entries_text WHERE text LIKE ?)")
+            params.append(f"%{text}%")
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(str(self.index_path), timeout=10)
+        try:
+            db.executescript(SCHEMA)
+            self._refresh(db)
+            yield db
+        finally:
+            db.close()
+
+    def _refresh(self, db: sqlite3.Connection):
+        if self.is_archived:
+            self._refresh_archive(db)
+            return
+        if not self.log_path.exists():
+            return
+        size = self.log_path.stat().st_size
+        row = db.execute("SELECT value FROM state WHERE key = 'indexed_upto'").fetchone()
+        indexed_upto = row[0] if row else 0
+
+        if size < indexed_upto:
+            # Лог был перезаписан — строим индекс заново
+            db.execute("DELETE FROM entries")
+            db.execute("DELETE FROM entries_text")
+            indexed_upto = 0
+        if size == indexed_upto:
+            return
+
+        with open(self.log_path, "rb") as f:
+            f.seek(indexed_upto)
+            offset = self._index_lines(db, f, indexed_upto)
+
+        self._set_state(db, "indexed_upto", offset)
+        db.commit()
+
+    def _refresh_archive(self, db: sqlite3.Connection):
+        # Архив неизменен: обычно индекс построен ещё до сжатия
+        if db.execute("SELECT value FROM state WHERE key = 'archived'").fetchone():
+            return
+        row = db.execute("SELECT value FROM state WHERE key = 'indexed_upto'").fetchone()
+        start = row[0] if row else 0
+        with self._open_archive() as f:
+            _skip(f, start)
+            offset = self._index_lines(db, f, start)
+        self._set_state(db, "indexed_upto", offset)
+        self._set_state(db, "archived", 1)
+        db.commit()
+
+    def _index_lines(self, db: sqlite3.Connection, f, start: int) -> int:
+        offset = start
+        for line in f:
+            # Недописанная строка будет проиндексирована в следующий раз
+            if not line.endswith(b"\n"):
+                break
+            self._add(db, offset, line)
+            offset += len(line)
+        return offset
+
+    def _set_state(self, db: sqlite3.Connection, key: str, value: int):
+        db.execute(
+            "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    def _open_archive(self):
+        raw = open(self.archive_path, "rb")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+
+    def _add(self, db: sqlite3.Connection, offset: int, line: bytes):
+        try:
+            entry = json_loads(line)
+        except JSONDecodeError:
+            return
+        cursor = db.execute(
+            "INSERT INTO entries (offset, length, timestamp, model) VALUES (?, ?, ?, ?)",
+            (offset, len(line), entry.get("timestamp"), entry.get("model_name"))
+        )
+        db.execute(
+            "INSERT INTO entries_text (rowid, text) VALUES (?, ?)",
+            (cursor.lastrowid,
+             f"{resolve_prompt(entry, self.blobs, last_only=True)}\n{entry.get('response', '')}")
+        )
+
+    def _read_entries(self, rows) -> List[dict]:
+        if not rows:
+            return []
+        if not self.is_archived:
+            entries = []
+            with open(self.log_path, "rb") as f:
+                for offset, length in rows:
+                    f.seek(offset)
+                    entries.append(json_loads(f.read(length)))
+            return entries
+
+        # Поток архива читается только вперёд — идём по возрастанию смещений
+        by_offset = {}
+        position = 0
+        with self._open_archive() as f:
+            for offset, length in sorted(rows):
+                _skip(f, offset - position)
+                by_offset[offset] = json_loads(f.read(length))
+                position = offset + length
+        return [by_offset[offset] for offset, _ in rows]
+
+
+def _skip(f, count: int, chunk: int = 1024 * 1024):
+    """Пропускает count байт в потоке, который не поддерживает seek"""
+    while count > 0:
+        data = f.read(min(chunk, count))
+        if not data:
+            break
+        count -= len(data)
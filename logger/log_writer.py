@@ -1,40 +1,257 @@
 from pathlib import Path
-import json
+import atexit
 import os
-from datetime import datetime
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, date
+from typing import Optional, Tuple
+
+import zstandard
+
+from logger.blob_store import BlobStore, BLOB_DIR, store_segments, resolve_prompt
+from logger.log_index import LogIndex, ARCHIVE_SUFFIX
+from utils.metrics import get_metrics
+from utils.serialization import json_dumps
 
 LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
 
 
-def log_interaction(prompt: str, response: str, meta: dict = None):
+class BufferedLogWriter:
+    """
+    Фоновая запись логов взаимодействий.
+
+    Записи складываются в ограниченную очередь и пишутся отдельным потоком
+    пачками — при накоплении batch_size записей или раз в flush_interval секунд.
+    Если очередь переполнена, запись выполняется синхронно, чтобы ничего не потерять.
+    При смене дня логи прошлых дней сжимаются в *.jsonl.zst.
+
+    Фрагменты промпта (prompt_segments) уходят в BlobStore, а в строку лога
+    попадают только их хэши — общий префикс не дублируется в каждой записи.
+    """
+
+    def __init__(
+        self,
+        log_dir: str = LOG_DIR,
+        max_queue: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 1.0
+    ):
+        self.log_dir = Path(log_dir)
+        self.blobs = BlobStore(self.log_dir / BLOB_DIR)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._file_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._current_day: Optional[str] = None
+
+    def write(self, entry: dict):
+        self._ensure_started()
+        try:
+            self._queue.put(entry, timeout=self.flush_interval)
+        except queue.Full:
+            self._write_batch([entry])
+
+    def flush(self):
+        """Дожидается, пока все поставленные в очередь записи попадут на диск"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, entries: list):
+        with get_metrics().span("log_write"):
+            self._write_entries(entries)
+
+    def _write_entries(self, entries: list):
+        by_file = defaultdict(list)
+        for entry in entries:
+            store_segments(entry, self.blobs)
+            by_file[entry["timestamp"][:10] + ".jsonl"].append(
+                json_dumps(entry) + "\n")
+
+        with self._file_lock:
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+            for filename, lines in by_file.items():
+                with open(self.log_dir / filename, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+
+            today = max(by_file)[:10]
+            if today != self._current_day:
+                self._current_day = today
+                compress_old_logs(str(self.log_dir), keep=today)
+
+
+_writer = BufferedLogWriter()
+
+
+def log_interaction(
+    prompt: Optional[str],
+    response: str,
+    meta: dict = None,
+    model_name: str = None,
+    segments: Optional[list] = None
+):
+    """
+    :param prompt: Промпт целиком (если фрагменты не переданы)
+    :param segments: Фрагменты промпта [(роль, текст), ...] — сохраняются в блобы
+    """
     entry = {
         "timestamp": datetime.utcnow().isoformat(),
-        "prompt": prompt,
+        "model_name": model_name,
         "response": response,
         "meta": meta or {}
     }
-    filename = datetime.utcnow().strftime("%Y-%m-%d") + ".jsonl"
-    filepath = os.path.join(LOG_DIR, filename)
+    if segments is not None:
+        entry["prompt_segments"] = list(segments)
+    else:
+        entry["prompt"] = prompt
+    _writer.write(entry)
+
+
+def flush_logs():
+    """Сбросить на диск записи, ещё находящиеся в очереди фонового писателя"""
+    _writer.flush()
+
+
+def compress_old_logs(log_dir: str = "logs", keep: Optional[str] = None) -> list[str]:
+    """
+    Сжимает дневные логи, кроме дня keep (по умолчанию — сегодняшнего), в *.jsonl.zst.
+    Перед сжатием индекс лога доводится до конца файла, поэтому смещения
+    в нём остаются верными для распакованного архива.
+    """
+    keep = keep or datetime.utcnow().strftime("%Y-%m-%d")
+    compressed = []
+    for path in Path(log_dir).glob("*.jsonl"):
+        if path.stem >= keep:
+            continue
+        LogIndex(path).count()
 
-    with open(filepath, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        archive = path.with_name(path.name + ARCHIVE_SUFFIX)
+        tmp = archive.with_name(archive.name + ".tmp")
+        with open(path, "rb") as src, open(tmp, "wb") as dst:
+            zstandard.ZstdCompressor(level=10).copy_stream(src, dst)
+        os.replace(tmp, archive)
+        path.unlink()
+        compressed.append(path.name)
+    return compressed
 
 
 def list_log_files(log_dir: str = "logs") -> list[str]:
-    return sorted([str(p.name) for p in Path(log_dir).glob("*.jsonl")])
+    """Имена дневных логов (*.jsonl), включая сжатые архивы"""
+    names = {p.name for p in Path(log_dir).glob("*.jsonl")}
+    names.update(p.name[:-len(ARCHIVE_SUFFIX)]
+                 for p in Path(log_dir).glob("*.jsonl" + ARCHIVE_SUFFIX))
+    return sorted(names)
 
 
 def load_logs_from_file(filename: str, log_dir: str = "logs", limit: int = 50) -> list[dict]:
-    path = Path(log_dir) / filename
-    entries = []
+    """
+    Последние limit записей файла в хронологическом порядке.
+    Читаются только нужные строки — по индексу смещений.
+    """
+    index = LogIndex(Path(log_dir) / filename)
+    if not (index.log_path.exists() or index.archive_path.exists()):
+        return []
+    if Path(log_dir) == Path(LOG_DIR):
+        flush_logs()
+    return list(reversed(index.page(page_size=limit)))
+
+
+def query_logs(
+    page: int = 0,
+    page_size: int = 20,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    model: Optional[str] = None,
+    text: Optional[str] = None,
+    log_dir: str = "logs"
+) -> Tuple[list[dict], int]:
+    """
+    Страница записей из всех дневных логов (от новых к старым) с фильтрами
+    по диапазону времени, модели и подстроке.
+    :return: (записи страницы, общее число подходящих записей)
+    """
+    filters = {
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "model": model,
+        "text": text or None
+    }
+
+    if Path(log_dir) == Path(LOG_DIR):
+        flush_logs()
+
+    skip = page * page_size
+    entries, total = [], 0
+    for filename in reversed(list_log_files(log_dir)):
+        day = _log_date(filename)
+        if day and ((start and day < start.date()) or (end and day > end.date())):
+            continue
+
+        index = LogIndex(Path(log_dir) / filename)
+        count = index.count(**filters)
+        total += count
+
+        # Файлы, целиком попадающие до нужной страницы, пропускаем по счётчику
+        if skip >= count:
+            skip -= count
+            continue
+        if len(entries) < page_size:
+            entries.extend(index.entries(page_size - len(entries), skip, **filters))
+            skip = 0
+
+    return entries, total
+
+
+def entry_prompt(entry: dict, full: bool = True, log_dir: str = "logs") -> str:
+    """
+    Промпт записи лога; для записей с блобами собирается по запросу.
+    :param full: False — только последний фрагмент (запрос пользователя)
+    """
+    return resolve_prompt(entry, BlobStore(Path(log_dir) / BLOB_DIR), last_only=not full)
+
+
+def list_models(log_dir: str = "logs") -> list[str]:
+    models = set()
+    for filename in list_log_files(log_dir):
+        models.update(LogIndex(Path(log_dir) / filename).models())
+    return sorted(models)
 
-    if path.exists():
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    entries.append(json.loads(line))
-                except json.JSONDecodeError:
-                    continue
 
-    return entries[-limit:]
+def _log_date(filename: str) -> Optional[date]:
+    try:
+        return datetime.strptime(filename.split(".", 1)[0], "%Y-%m-%d").date()
+    except ValueError:
+        return None
@@ -1,9 +1,10 @@
 # logger/utils.py
 import logging
-import json
 from datetime import datetime
 from pathlib import Path
 
+from utils.serialization import json_dumps
+
 # Настройка логирования
 
 
@@ -26,4 +27,4 @@ def log_interaction(user_input, llm_output, metadata=None):
         "llm_output": llm_output,
         "metadata": metadata,
     }
-    logging.info(json.dumps(log_entry, ensure_ascii=False))
+    logging.info(json_dumps(log_entry))
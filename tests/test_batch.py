@@ -0,0 +1,102 @@
+import asyncio
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from core.batch import BatchGenerator, generate_batch
+from core.llm_handler import LLMHandler
+from core.scheduler import get_scheduler
+
+
+class StubChatModel(BaseChatModel):
+    """Локальная заглушка чат-модели с настраиваемой задержкой"""
+    latency: float = 0.05
+    failures: int = 0
+    calls: int = 0
+    active: int = 0
+    max_active: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> ChatResult:
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.latency * len(messages[-1].content) / 10)
+            if self.failures > 0:
+                self.failures -= 1
+                raise ConnectionError("ollama недоступна")
+            return self._result(messages)
+        finally:
+            self.active -= 1
+
+    def _result(self, messages):
+        text = f"Продолжение: {messages[-1].content}"
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+
+def make_handler(model_name="ollama:llama3", **stub_kwargs):
+    return LLMHandler(model_name=model_name, template_path="non_existent_file.json",
+                      llm=StubChatModel(**stub_kwargs))
+
+
+def test_results_come_in_completion_order():
+    handler = make_handler()
+    results = generate_batch(handler, ["длинная сцена", "сцена", "сц"], concurrency=3)
+
+    assert [r.prompt for r in results] == ["сц", "сцена", "длинная сцена"]
+    assert all(r.ok for r in results)
+    assert results[0].text == "Продолжение: сц"
+    assert results[0].latency_ms <= results[-1].latency_ms
+
+
+def test_concurrency_limit_and_throughput():
+    handler = make_handler(latency=0.1)
+    results = generate_batch(handler, ["сцена 01"] * 8, concurrency=4)
+
+    assert len(results) == 8
+    # Запросы шли «волнами» по 4, а не по одному
+    assert handler.llm.max_active == 4
+
+
+def test_model_slots_limit_concurrency(monkeypatch, caplog):
+    # Отдельная модель с двумя слотами, как при OLLAMA_NUM_PARALLEL=2
+    monkeypatch.setitem(get_scheduler().model_slots, "ollama:two-slots", 2)
+    handler = make_handler(model_name="ollama:two-slots", latency=0.05)
+    results = generate_batch(handler, ["сцена 01"] * 6, concurrency=4)
+
+    assert all(r.ok for r in results)
+    assert handler.llm.max_active == 2
+    assert "больше слотов модели" in caplog.text
+
+
+def test_retry_with_backoff_then_success():
+    handler = make_handler(failures=1)
+    [result] = generate_batch(handler, ["сцена"], retries=2, backoff=0.01)
+
+    assert result.ok
+    assert result.attempts == 2
+
+
+def test_timeout_reports_error():
+    handler = make_handler(latency=1.0)
+    [result] = generate_batch(handler, ["очень длинная сцена"], timeout=0.05, retries=1, backoff=0.01)
+
+    assert not result.ok
+    assert result.attempts == 2
+    assert "timeout" in result.error
+
+
+def test_batch_does_not_touch_context():
+    handler = make_handler()
+    asyncio.run(BatchGenerator(handler).gather(["а", "б"]))
+
+    assert not handler.context.buffer
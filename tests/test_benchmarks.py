@@ -0,0 +1,45 @@
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+from benchmarks.run import compare
+
+
+def test_fake_chat_model_is_deterministic():
+    llm = FakeChatModel(response_tokens=5)
+    first = llm.invoke([HumanMessage(content="Опиши замок")])
+    second = llm.invoke([HumanMessage(content="Опиши замок")])
+
+    assert first.content == second.content
+    assert len(first.content.split()) == 5
+    # Статистика в формате Ollama
+    assert first.response_metadata["eval_count"] == 5
+
+
+def test_fake_chat_model_stream_matches_invoke():
+    llm = FakeChatModel(response_tokens=4)
+    messages = [HumanMessage(content="Продолжи")]
+
+    chunks = list(llm.stream(messages))
+
+    assert "".join(c.content for c in chunks) == llm.invoke(messages).content
+    assert chunks[-1].response_metadata["eval_count"] == 4
+
+
+def test_fake_embeddings_are_stable_and_normalized():
+    embeddings = FakeEmbeddings(size=16)
+
+    a, b = embeddings.embed_documents(["руна", "руна"])
+
+    assert a == b == embeddings.embed_query("руна")
+    assert abs(sum(x * x for x in a) - 1) < 1e-5
+
+
+def test_compare_flags_only_significant_regressions():
+    old = {"meta": {"commit": "a"}, "results": {"lore": {"1000": {"cold_ms": 100.0, "search_ms": 0.1}}}}
+    new = {"meta": {"commit": "b"}, "results": {"lore": {"1000": {"cold_ms": 150.0, "search_ms": 0.3}}}}
+
+    rows, regressions = compare(old, new, threshold=1.2)
+
+    assert len(rows) == 2
+    # Рост на 0.2 мс — шум, а не регрессия
+    assert regressions == ["lore.1000.cold_ms"]
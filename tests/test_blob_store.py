@@ -0,0 +1,42 @@
+import json
+
+from logger.blob_store import BlobStore
+from logger.log_writer import BufferedLogWriter, entry_prompt, query_logs
+
+
+def test_put_is_idempotent(tmp_path):
+    store = BlobStore(tmp_path)
+    digest = store.put("Ты помощник писателя...")
+
+    assert store.put("Ты помощник писателя...") == digest
+    assert store.get(digest) == "Ты помощник писателя..."
+    assert len(list(tmp_path.rglob("*"))) == 2  # папка шарда и сам блоб
+
+
+def test_shared_prefix_is_stored_once(tmp_path):
+    writer = BufferedLogWriter(log_dir=str(tmp_path), flush_interval=0.05)
+    system = "Ты помощник писателя. " * 200
+    for i in range(10):
+        writer.write({
+            "timestamp": f"2025-04-04T12:00:{i:02d}",
+            "model_name": "ollama:llama3",
+            "prompt_segments": [("system", system), ("human", f"Запрос {i}")],
+            "response": f"Ответ {i}",
+            "meta": {}
+        })
+    writer.flush()
+
+    log = (tmp_path / "2025-04-04.jsonl").read_text(encoding="utf-8")
+    assert system not in log
+    assert len([p for p in (tmp_path / "blobs").rglob("*") if p.is_file()]) == 11
+
+    entry = json.loads(log.splitlines()[3])
+    assert entry_prompt(entry, full=False, log_dir=str(tmp_path)) == "Запрос 3"
+    assert entry_prompt(entry, log_dir=str(tmp_path)) == f"{system}\nЗапрос 3"
+
+    entries, total = query_logs(text="Запрос 7", log_dir=str(tmp_path))
+    assert total == 1
+
+
+def test_legacy_entries_keep_inline_prompt(tmp_path):
+    assert entry_prompt({"prompt": "старый промпт"}, log_dir=str(tmp_path)) == "старый промпт"
@@ -0,0 +1,107 @@
+import yaml
+
+from core.lore.character_repository import (
+    CharacterRepository,
+    DirectoryCharacterBackend,
+    YamlCharacterBackend,
+)
+from core.memory.entity_store import CharacterEntityStore
+
+ANNA = {"role": "барыня", "description": "смазливая", "traits": "глупая", "motivation": ""}
+
+
+def test_yaml_backend_reads_file_once_until_it_changes(tmp_path, monkeypatch):
+    path = tmp_path / "characters.yaml"
+    path.write_text(yaml.safe_dump({"Анна": ANNA}, allow_unicode=True), encoding="utf-8")
+    backend = YamlCharacterBackend(path)
+    repository = CharacterRepository(backend)
+
+    loads = []
+    original = backend.load
+    monkeypatch.setattr(backend, "load", lambda: loads.append(1) or original())
+
+    assert repository.list() == ["Анна"]
+    assert repository.get("Анна") == ANNA
+    assert len(loads) == 1
+
+    # Внешнее изменение файла сбрасывает кэш
+    path.write_text(yaml.safe_dump({"Ян": {"role": "садовник"}}, allow_unicode=True), encoding="utf-8")
+    assert repository.list() == ["Ян"]
+    assert len(loads) == 2
+
+
+def test_upsert_writes_atomically_without_reload(tmp_path):
+    path = tmp_path / "characters.yaml"
+    repository = CharacterRepository(YamlCharacterBackend(path))
+
+    repository.upsert("Анна", ANNA)
+    repository.upsert("Ян", {"role": "садовник"})
+    repository.delete("Анна")
+
+    assert yaml.safe_load(path.read_text(encoding="utf-8")) == {"Ян": {"role": "садовник"}}
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_name_index_is_case_insensitive(tmp_path):
+    repository = CharacterRepository(YamlCharacterBackend(tmp_path / "characters.yaml"))
+    repository.upsert("Пётр Иванович", {"role": "доктор"})
+
+    assert repository.find("пётр иванович") == "Пётр Иванович"
+    assert repository.find("ПЕТР ИВАНОВИЧ") == "Пётр Иванович"
+    assert repository.describe("пётр иванович") == "Пётр Иванович — доктор"
+
+
+def test_directory_backend_writes_one_file_per_character(tmp_path):
+    repository = CharacterRepository(DirectoryCharacterBackend(tmp_path))
+    repository.upsert("Анна", ANNA)
+    repository.upsert("Ян", {"role": "садовник"})
+
+    anna_file = tmp_path / "Анна.yaml"
+    before = anna_file.stat().st_mtime_ns
+    repository.upsert("Ян", {"role": "конюх"})
+
+    assert anna_file.stat().st_mtime_ns == before
+    reopened = CharacterRepository(DirectoryCharacterBackend(tmp_path))
+    assert reopened.all() == {"Анна": ANNA, "Ян": {"role": "конюх"}}
+
+    reopened.delete("Анна")
+    assert not anna_file.exists()
+
+
+def test_entity_store_combines_card_and_notes(tmp_path):
+    repository = CharacterRepository(YamlCharacterBackend(tmp_path / "characters.yaml"))
+    repository.upsert("Анна", ANNA)
+    store = CharacterEntityStore(repository=repository)
+
+    assert store.exists("анна")
+    assert store.get("Анна") == "Анна — барыня. Описание: смазливая. Черты: глупая"
+
+    store.set("Анна", "Поссорилась с Яном")
+    store.set("Ян", "Садовник в усадьбе")
+    assert store.get("Анна").endswith("Заметки: Поссорилась с Яном")
+    assert store.get("Ян") == "Садовник в усадьбе"
+    assert store.get("Незнакомец", "") == ""
+
+
+def test_mentioned_matches_name_forms(tmp_path):
+    repository = CharacterRepository(YamlCharacterBackend(tmp_path / "characters.yaml"))
+    repository.upsert("Анна", ANNA)
+    repository.upsert("Ян", {"role": "конюх"})
+    repository.upsert("Пётр Иванович", {"role": "помещик"})
+
+    assert repository.mentioned("Ян увидел Анну") == ["Анна", "Ян"]
+    assert repository.mentioned("Петра Ивановича не было дома") == ["Пётр Иванович"]
+    # Одно слово составного имени — не упоминание
+    assert repository.mentioned("Иванович ушёл, Янтарь сверкал") == []
+
+
+def test_entity_store_keeps_card_out_of_notes(tmp_path):
+    repository = CharacterRepository(YamlCharacterBackend(tmp_path / "characters.yaml"))
+    repository.upsert("Анна", ANNA)
+    store = CharacterEntityStore(repository=repository)
+
+    # Модель вернула описание вместе с карточкой — в заметки попадает только новое
+    store.set("Анна", store.get("Анна") + " Уехала в город")
+
+    assert store.notes("Анна") == "Уехала в город"
+    assert store.get("Анна").count("барыня") == 1
@@ -0,0 +1,152 @@
+from core.memory.context_assembler import ContextAssembler
+from core.memory.context_buffer import ContextBuffer
+from core.memory.token_counter import TokenCounter
+
+
+class WordCounter(TokenCounter):
+    """Один токен на слово — чтобы бюджеты в тестах были предсказуемы"""
+
+    def __init__(self):
+        super().__init__()
+        self._encoder = None
+        self.calls = 0
+
+    def _count(self, text):
+        self.calls += 1
+        return len(text.split())
+
+
+def words(n, word="слово"):
+    return " ".join([word] * n)
+
+
+def test_buffer_keeps_running_token_total():
+    counter = WordCounter()
+    buffer = ContextBuffer(max_messages=None, max_tokens=10, counter=counter)
+    buffer.add("user", words(4))
+    buffer.add("assistant", words(4))
+    assert buffer.total_tokens == 8
+
+    buffer.add("user", words(4))
+    assert buffer.total_tokens == 8
+    assert len(buffer.buffer) == 2
+
+
+def test_priority_order_under_tight_budget():
+    counter = WordCounter()
+    history = ContextBuffer(max_messages=None, counter=counter)
+    history.add("user", words(30, "старое"))
+    history.add("assistant", words(5, "новое"))
+
+    assembler = ContextAssembler(budget=100, reserve=0, counter=counter, min_turn_tokens=5)
+    messages = assembler.assemble(
+        "запрос",
+        system_prompt=words(20, "система"),
+        examples=[{"user": words(10), "assistant": words(10)}],
+        lore=["руны нестабильны"],
+        history=history
+    )
+
+    contents = [m.content for m in messages]
+    assert contents[0].startswith("система")
+    # Лор найден по запросу и меняется от хода к ходу — он после истории
+    assert "руны нестабильны" in contents[-2]
+    assert contents[-1] == "запрос"
+    # Новая реплика целиком, старая — обрезана с начала
+    assert contents[-3] == words(5, "новое")
+    old_turn = contents[-4].split()
+    assert 0 < len(old_turn) < 30 and set(old_turn) == {"старое"}
+
+
+def test_history_is_not_retokenized():
+    counter = WordCounter()
+    history = ContextBuffer(max_messages=None, counter=counter)
+    for i in range(10):
+        history.add("user", f"реплика номер {i}")
+
+    assembler = ContextAssembler(budget=1000, reserve=0, counter=counter)
+    assembler.assemble("запрос", history=history)
+    calls = counter.calls
+    assembler.assemble("запрос", history=history)
+    assert counter.calls == calls
+
+
+def test_fallback_truncate_keeps_end():
+    counter = TokenCounter()
+    counter._encoder = None
+    text = "начало " + words(200) + " конец"
+    truncated = counter.truncate(text, 20)
+    assert truncated.endswith("конец")
+    assert counter.count(truncated) <= 20
+
+
+def test_shrink_to_drops_history_in_one_step():
+    counter = WordCounter()
+    buffer = ContextBuffer(max_messages=None, max_tokens=10, counter=counter, shrink_to=0.5)
+    for i in range(5):
+        buffer.add("user", words(2))
+    assert len(buffer.buffer) == 5
+
+    buffer.add("user", words(2))
+    # Вместо сдвига на одну реплику история урезана до половины бюджета
+    assert buffer.total_tokens <= 5
+    snapshot = list(buffer.buffer)
+    buffer.add("user", words(2))
+    assert list(buffer.buffer)[:len(snapshot)] == snapshot
+
+
+def test_memory_sections_fill_budget_by_priority():
+    counter = WordCounter()
+    history = ContextBuffer(max_messages=None, counter=counter)
+    history.add("user", words(10, "реплика"))
+
+    assembler = ContextAssembler(budget=100, reserve=0, counter=counter, min_turn_tokens=5)
+    messages = assembler.assemble(
+        "запрос",
+        lore=["руны нестабильны"],
+        characters=["Артур — король"],
+        summary=words(200, "сводка"),
+        history=history,
+        scenes=[words(20, "сцена")]
+    )
+
+    contents = [m.content for m in messages]
+    assert any("руны нестабильны" in c for c in contents)
+    assert any("Артур — король" in c for c in contents)
+    # Сводка обрезана до остатка бюджета, на историю и сцены места не хватило
+    summary = next(c for c in contents if c.startswith("Сводка сюжета:"))
+    assert 0 < len(summary.split()) < 200
+    assert not any("реплика" in c or "сцена" in c for c in contents)
+    assert contents[-1] == "запрос"
+    assert sum(assembler._cost(c) for c in contents) <= 100
+
+
+def test_changing_memory_sections_go_after_history():
+    counter = WordCounter()
+    history = ContextBuffer(max_messages=None, counter=counter)
+    history.add("user", "реплика")
+
+    assembler = ContextAssembler(budget=1000, reserve=0, counter=counter)
+    messages = assembler.assemble(
+        "запрос", system_prompt="система", lore=["руны нестабильны"],
+        characters=["Артур — король"], summary="сводка", history=history, scenes=["сцена"])
+
+    # Неизменное начало — система и история, в конце — то, что меняется каждый ход
+    contents = [m.content.split("\n")[-1] for m in messages]
+    assert contents == ["система", "реплика", "- руны нестабильны",
+                        "сводка", "Артур — король", "сцена", "запрос"]
+
+
+def test_history_first_keeps_history_over_changing_sections():
+    counter = WordCounter()
+    history = ContextBuffer(max_messages=None, counter=counter)
+    history.add("user", words(20, "реплика"))
+
+    assembler = ContextAssembler(budget=60, reserve=0, counter=counter)
+    sections = dict(lore=[words(30, "руна")], summary=words(100, "сводка"), history=history)
+
+    # По умолчанию лор и сводка вытесняют историю, с history_first — наоборот
+    assert not any("реплика" in m.content for m in assembler.assemble("запрос", **sections))
+    messages = assembler.assemble("запрос", history_first=True, **sections)
+    assert messages[0].content == words(20, "реплика")
+    assert sum(assembler._cost(m.content) for m in messages) <= 60
@@ -0,0 +1,41 @@
+import numpy as np
+from benchmarks.fakes import FakeEmbeddings
+from core.memory.embedding_service import EmbeddingService
+
+
+def make_service(tmp_path, batch_size=2):
+    base = FakeEmbeddings(size=8)
+    return EmbeddingService(base, model="fake", batch_size=batch_size, cache_dir=str(tmp_path)), base
+
+
+def test_batches_and_dedupes(tmp_path):
+    service, base = make_service(tmp_path)
+    vectors = service.embed_documents(["а", "б", "а", "в"])
+
+    assert base.batches == [["а", "б"], ["в"]]
+    assert vectors[0] == vectors[2]
+    assert np.allclose(vectors[0], base.embed_query("а"))
+
+
+def test_cache_is_shared_across_restarts(tmp_path):
+    service, _ = make_service(tmp_path)
+    first = service.embed_documents(["лор", "сцена"])
+
+    reopened, base = make_service(tmp_path)
+    assert reopened.embed_documents(["сцена", "лор"]) == [first[1], first[0]]
+    assert base.batches == []
+
+    reopened.embed_documents(["персонаж"])
+    assert base.batches == [["персонаж"]]
+
+
+def test_torn_write_is_discarded(tmp_path):
+    service, _ = make_service(tmp_path)
+    service.embed_documents(["лор"])
+    with open(service.cache.vectors_path, "ab") as f:
+        f.write(b"\x00" * 12)
+
+    reopened, base = make_service(tmp_path)
+    reopened.embed_documents(["лор", "новое"])
+    assert base.batches == [["новое"]]
+    assert len(reopened.cache) == 2
@@ -0,0 +1,120 @@
+import threading
+import time
+
+from core.handler_pool import HandlerPool
+
+
+class DummyHandler:
+    created = 0
+
+    def __init__(self, **kwargs):
+        DummyHandler.created += 1
+        self.kwargs = kwargs
+        self.closed = False
+        time.sleep(0.01)
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(max_size=8):
+    DummyHandler.created = 0
+    return HandlerPool(max_size=max_size, factory=DummyHandler)
+
+
+def test_same_key_returns_cached_handler():
+    pool = make_pool()
+    first = pool.get(model_name="ollama:llama3", temperature=0.7)
+    second = pool.get(model_name="ollama:llama3", temperature=0.7)
+
+    assert first is second
+    assert DummyHandler.created == 1
+
+
+def test_lru_eviction():
+    pool = make_pool(max_size=2)
+    a = pool.get(model_name="a")
+    b = pool.get(model_name="b")
+    pool.get(model_name="a")  # "a" становится самым свежим
+    pool.get(model_name="c")  # вытесняется "b"
+
+    assert len(pool) == 2
+    assert b.closed and not a.closed
+    assert pool.get(model_name="a") is a
+    pool.get(model_name="b")
+    assert DummyHandler.created == 4
+
+
+def test_concurrent_get_builds_once():
+    pool = make_pool()
+    results = []
+
+    def worker():
+        results.append(pool.get(model_name="ollama:llama3"))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert DummyHandler.created == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_invalidate_by_template_and_lore():
+    pool = make_pool()
+    pool.get(model_name="a", template_path="t1.json")
+    pool.get(model_name="a", template_path="t2.json")
+    pool.get(model_name="a", template_path="t2.json", use_memory=False)
+
+    first = pool.get(model_name="a", template_path="t1.json")
+    assert pool.invalidate(template_path="t1.json") == 1
+    assert first.closed
+    assert pool.invalidate_lore() == 1
+    assert len(pool) == 1
+
+
+def test_refresh_lore_updates_memory_handlers_in_place():
+    class StubMemory:
+        reloads = 0
+
+        def reload_lore(self):
+            StubMemory.reloads += 1
+
+    pool = make_pool()
+    with_memory = pool.get(model_name="a")
+    with_memory.memory_manager = StubMemory()
+    pool.get(model_name="b", use_memory=False)
+
+    assert pool.refresh_lore() == 1
+    assert StubMemory.reloads == 1
+    assert len(pool) == 2
+
+
+def test_prompt_layout_is_part_of_key():
+    pool = make_pool()
+    rolling = pool.get(model_name="a")
+    stable = pool.get(model_name="a", prompt_layout="stable")
+
+    assert rolling is not stable
+    assert stable.kwargs["prompt_layout"] == "stable"
+    assert pool.get(model_name="a", prompt_layout="stable") is stable
+    assert pool.invalidate(template_path=stable.kwargs["template_path"]) == 2
+
+
+def test_delete_project_closes_its_handlers(tmp_path, monkeypatch):
+    from core.project import project_manager
+    from core.project.project_store import ProjectStore
+
+    pool = make_pool()
+    project = pool.get(model_name="a", project="Роман")
+    other = pool.get(model_name="a", project="Повесть")
+    monkeypatch.setattr(project_manager, "get_pool", lambda: pool)
+    monkeypatch.setattr(project_manager, "_store", ProjectStore(tmp_path))
+    monkeypatch.setattr(project_manager, "PROJECTS_DIR", tmp_path)
+
+    project_manager.delete_project("Роман")
+
+    assert project.closed and not other.closed
+    assert len(pool) == 1
@@ -0,0 +1,57 @@
+from benchmarks.fakes import FakeEmbeddings
+from core.memory.bm25_index import BM25Index, tokenize
+from core.memory.hybrid_retriever import HybridLoreRetriever
+from core.memory.lore_index import LoreIndex
+
+LORE = [
+    "Руна Альгиз защищает носителя от огня.",
+    "Школа Серебряного Пламени обучает боевых магов.",
+    "Эльфы живут в лесах Северной долины.",
+    "Магия крови запрещена во всех королевствах.",
+]
+
+
+def make_retriever(tmp_path, **kwargs):
+    embeddings = FakeEmbeddings(size=8)
+    store = LoreIndex(str(tmp_path / "lore.yaml"), embeddings, model_name="fake").load_vectorstore(LORE)
+    return HybridLoreRetriever.from_vectorstore(store, **kwargs), embeddings
+
+
+def test_tokenize_stems_russian_word_forms():
+    assert tokenize("Руна Альгиз") == tokenize("руну альгиза")
+    assert tokenize("школы магов") == tokenize("школа маги")
+    # Служебные слова отбрасываются
+    assert tokenize("и в на") == []
+
+
+def test_bm25_ranks_exact_terms_and_supports_removal():
+    index = BM25Index()
+    for i, text in enumerate(LORE):
+        index.add(str(i), text)
+
+    hits = index.search("руну Альгиз", k=2)
+    assert hits[0].doc_id == "0"
+    assert hits[0].matched == 2
+
+    index.remove("0")
+    assert "0" not in index
+    assert all(hit.doc_id != "0" for hit in index.search("руну Альгиз"))
+
+
+def test_exact_match_skips_embedding(tmp_path):
+    retriever, embeddings = make_retriever(tmp_path, k=1)
+
+    docs = retriever.invoke("Что делает руна Альгиз?")
+
+    assert docs[0].page_content == LORE[0]
+    assert embeddings.queries == []
+
+
+def test_fuzzy_query_fuses_vector_results(tmp_path):
+    retriever, embeddings = make_retriever(tmp_path, k=2)
+
+    docs = retriever.invoke("Эльфы")
+
+    assert embeddings.queries == ["Эльфы"]
+    assert docs[0].page_content == LORE[2]
+    assert len(docs) == 2
@@ -0,0 +1,25 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.mark.parametrize("module", [
+    "core.lore.character_editor",
+    "core.memory.memory_store",
+    "core.project.project_manager",
+    "core.handler_pool",
+])
+def test_module_does_not_import_llm_stack(module):
+    # Страницы без LLM не должны платить за импорт LangChain и FAISS
+    code = (
+        f"import sys, {module}; "
+        "heavy = sorted(m for m in sys.modules if m.split('.')[0] in ('langchain', 'langchain_core', 'faiss')); "
+        "print(','.join(heavy))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == ""
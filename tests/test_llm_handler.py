@@ -91,3 +91,85 @@ def test_generate_from_template_invalid_json(mock_chat_ollama, tmp_path):
     result = handler.generate_from_template("Что происходит?")
     
     assert result == "Ответ даже при ошибке в шаблоне"
+
+
+@patch("core.llm_handler.ChatOllama")
+def test_stream_yields_chunks_and_updates_context(mock_chat_ollama):
+    chunks = [MagicMock(content="Жили"), MagicMock(content="-были")]
+
+    mock_instance = MagicMock()
+    mock_instance.stream.return_value = iter(chunks)
+    mock_chat_ollama.return_value = mock_instance
+
+    handler = LLMHandler()
+    result = list(handler.stream("Начни сказку"))
+
+    assert result == ["Жили", "-были"]
+    assert handler.context.buffer[-1] == {"role": "assistant", "content": "Жили-были"}
+    assert handler.last_metrics["stream"] is True
+    assert handler.last_metrics["ttft_ms"] is not None
+
+
+@patch("core.llm_handler.log_interaction")
+@patch("core.llm_handler.ChatOllama")
+def test_generate_records_ttft(mock_chat_ollama, mock_log):
+    mock_instance = MagicMock()
+    mock_instance.invoke.return_value = MagicMock(content="Ответ")
+    mock_chat_ollama.return_value = mock_instance
+
+    handler = LLMHandler()
+    handler.generate("Привет!")
+
+    meta = mock_log.call_args.kwargs["meta"]
+    assert meta["ttft_ms"] == meta["latency_ms"]
+
+
+@patch("core.llm_handler.ChatOllama")
+def test_stable_layout_only_appends_to_prompt(mock_chat_ollama, tmp_path):
+    template_path = tmp_path / "prompt.json"
+    template_path.write_text(json.dumps({
+        "system": "Ты пишешь сказки.",
+        "examples": [{"user": "Кто герой?", "assistant": "Принцесса Луна"}]
+    }, ensure_ascii=False))
+
+    mock_instance = MagicMock()
+    mock_instance.invoke.return_value = MagicMock(content="Продолжение")
+    mock_chat_ollama.return_value = mock_instance
+
+    handler = LLMHandler(template_path=str(template_path), prompt_layout="stable")
+    for i in range(3):
+        handler.generate_from_template(f"Сцена {i}")
+
+    calls = [[m.content for m in c.args[0]] for c in mock_instance.invoke.call_args_list]
+    # Каждый следующий промпт начинается с предыдущего целиком
+    assert calls[1][:len(calls[0])] == calls[0]
+    assert calls[2][:len(calls[1])] == calls[1]
+    assert mock_chat_ollama.call_args.kwargs["keep_alive"] == "30m"
+
+
+@patch("core.llm_handler.ChatOllama")
+def test_prompt_eval_metrics_are_recorded(mock_chat_ollama):
+    response = MagicMock(content="Ответ")
+    response.response_metadata = {
+        "prompt_eval_count": 120,
+        "prompt_eval_duration": 250_000_000,
+        "eval_count": 40,
+        "eval_duration": 800_000_000,
+        "load_duration": 0
+    }
+    mock_instance = MagicMock()
+    mock_instance.invoke.return_value = response
+    mock_chat_ollama.return_value = mock_instance
+
+    handler = LLMHandler()
+    handler.generate("Привет!")
+
+    assert handler.last_metrics["prompt_eval_count"] == 120
+    assert handler.last_metrics["prompt_eval_ms"] == 250
+    assert handler.last_metrics["eval_ms"] == 800
+    # Скорость генерации считается из счётчиков Ollama
+    assert handler.last_metrics["tokens_per_sec"] == 50
+    assert handler.last_metrics["prompt_tokens_per_sec"] == 480
+    stages = handler.last_metrics["stages"]
+    assert stages["llm_eval"] == 800
+    assert {"prompt_assembly", "llm"} <= set(stages)
@@ -0,0 +1,72 @@
+import json
+from datetime import datetime
+
+from logger.log_index import LogIndex
+from logger.log_writer import load_logs_from_file, query_logs
+
+
+def write_log(path, entries):
+    with open(path, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def make_entries(n, model="ollama:llama3", day="2025-04-04"):
+    return [{
+        "timestamp": f"{day}T10:{i // 60:02d}:{i % 60:02d}",
+        "model_name": model,
+        "prompt": f"Промпт {i}",
+        "response": f"Ответ {i}",
+        "meta": {}
+    } for i in range(n)]
+
+
+def test_pages_are_newest_first(tmp_path):
+    path = tmp_path / "2025-04-04.jsonl"
+    write_log(path, make_entries(45))
+    index = LogIndex(path)
+
+    assert [e["prompt"] for e in index.page(0, 3)] == ["Промпт 44", "Промпт 43", "Промпт 42"]
+    assert [e["prompt"] for e in index.page(14, 3)] == ["Промпт 2", "Промпт 1", "Промпт 0"]
+    assert index.count() == 45
+
+
+def test_index_is_incremental_and_skips_partial_line(tmp_path):
+    path = tmp_path / "2025-04-04.jsonl"
+    write_log(path, make_entries(2))
+    index = LogIndex(path)
+    assert index.count() == 2
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"timestamp": "2025-04-04T11:00:00", "prom')
+    assert index.count() == 2
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('pt": "дописано"}\n')
+    assert index.count() == 3
+    assert index.page(0, 1)[0]["prompt"] == "дописано"
+
+
+def test_filters(tmp_path):
+    path = tmp_path / "2025-04-04.jsonl"
+    write_log(path, make_entries(10) + make_entries(5, model="ollama:mistral"))
+    index = LogIndex(path)
+
+    assert index.count(model="ollama:mistral") == 5
+    assert index.count(text="Ответ 7") == 1
+    assert index.count(start="2025-04-04T10:00:05", end="2025-04-04T10:00:07") == 3
+    assert index.models() == ["ollama:llama3", "ollama:mistral"]
+
+
+def test_query_across_files(tmp_path):
+    write_log(tmp_path / "2025-04-03.jsonl", make_entries(5, day="2025-04-03"))
+    write_log(tmp_path / "2025-04-04.jsonl", make_entries(5, day="2025-04-04"))
+
+    entries, total = query_logs(page=1, page_size=4, log_dir=str(tmp_path))
+    assert total == 10
+    assert [e["timestamp"][:10] for e in entries] == ["2025-04-04", "2025-04-03", "2025-04-03", "2025-04-03"]
+
+    entries, total = query_logs(start=datetime(2025, 4, 4), log_dir=str(tmp_path))
+    assert total == 5
+
+    assert len(load_logs_from_file("2025-04-03.jsonl", log_dir=str(tmp_path), limit=3)) == 3
@@ -0,0 +1,53 @@
+from logger.log_writer import BufferedLogWriter, list_log_files, load_logs_from_file, query_logs
+
+
+def make_entry(day, i):
+    return {
+        "timestamp": f"{day}T12:00:{i:02d}",
+        "model_name": "ollama:llama3",
+        "prompt": f"Промпт {i}",
+        "response": f"Ответ {i}",
+        "meta": {}
+    }
+
+
+def test_writer_batches_entries_in_background(tmp_path):
+    writer = BufferedLogWriter(log_dir=str(tmp_path), batch_size=10, flush_interval=0.05)
+    for i in range(25):
+        writer.write(make_entry("2025-04-04", i))
+    writer.flush()
+
+    lines = (tmp_path / "2025-04-04.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 25
+
+
+def test_old_days_are_compressed_and_still_readable(tmp_path):
+    writer = BufferedLogWriter(log_dir=str(tmp_path), flush_interval=0.05)
+    for i in range(5):
+        writer.write(make_entry("2025-04-03", i))
+    writer.flush()
+    writer.write(make_entry("2025-04-04", 0))
+    writer.flush()
+
+    assert not (tmp_path / "2025-04-03.jsonl").exists()
+    assert (tmp_path / "2025-04-03.jsonl.zst").exists()
+    assert list_log_files(str(tmp_path)) == ["2025-04-03.jsonl", "2025-04-04.jsonl"]
+
+    entries = load_logs_from_file("2025-04-03.jsonl", log_dir=str(tmp_path), limit=2)
+    assert [e["prompt"] for e in entries] == ["Промпт 3", "Промпт 4"]
+
+    entries, total = query_logs(text="Ответ 1", log_dir=str(tmp_path))
+    assert total == 1
+    assert entries[0]["prompt"] == "Промпт 1"
+
+
+def test_archive_without_index_is_indexed_on_read(tmp_path):
+    writer = BufferedLogWriter(log_dir=str(tmp_path), flush_interval=0.05)
+    for i in range(3):
+        writer.write(make_entry("2025-04-03", i))
+    writer.write(make_entry("2025-04-04", 0))
+    writer.flush()
+
+    (tmp_path / "2025-04-03.jsonl.idx").unlink()
+    entries = load_logs_from_file("2025-04-03.jsonl.zst", log_dir=str(tmp_path))
+    assert len(entries) == 3
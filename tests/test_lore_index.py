@@ -0,0 +1,59 @@
+from benchmarks.fakes import FakeEmbeddings
+from core.memory.lore_index import LoreIndex
+
+
+def make_index(tmp_path):
+    embeddings = FakeEmbeddings(size=8)
+    return LoreIndex(str(tmp_path / "lore.yaml"), embeddings, model_name="fake"), embeddings
+
+
+def test_index_is_persisted_next_to_lore(tmp_path):
+    index, embeddings = make_index(tmp_path)
+    store = index.load_vectorstore(["Закон 1", "Закон 2"])
+
+    assert (tmp_path / "lore.faiss").exists()
+    assert (tmp_path / "lore.faiss.json").exists()
+    assert store.index.ntotal == 2
+    assert embeddings.embedded == ["Закон 1", "Закон 2"]
+
+
+def test_unchanged_lore_is_not_reembedded(tmp_path):
+    index, _ = make_index(tmp_path)
+    index.load_vectorstore(["Закон 1", "Закон 2"])
+
+    reopened, embeddings = make_index(tmp_path)
+    store = reopened.load_vectorstore(["Закон 1", "Закон 2"])
+
+    assert embeddings.embedded == []
+    docs = store.similarity_search("Закон 2", k=1)
+    assert docs[0].page_content == "Закон 2"
+
+
+def test_only_changed_entries_are_reembedded(tmp_path):
+    index, _ = make_index(tmp_path)
+    index.load_vectorstore(["Закон 1", "Закон 2"])
+
+    reopened, embeddings = make_index(tmp_path)
+    store = reopened.load_vectorstore(["Закон 1", "Закон 3"])
+
+    assert embeddings.embedded == ["Закон 3"]
+    assert store.index.ntotal == 2
+
+
+def test_model_change_invalidates_index(tmp_path):
+    index, _ = make_index(tmp_path)
+    index.load_vectorstore(["Закон 1"])
+
+    embeddings = FakeEmbeddings(size=8)
+    other = LoreIndex(str(tmp_path / "lore.yaml"), embeddings, model_name="other")
+    other.load_vectorstore(["Закон 1"])
+
+    assert embeddings.embedded == ["Закон 1"]
+
+
+def test_empty_lore_does_not_call_embeddings(tmp_path):
+    index, embeddings = make_index(tmp_path)
+    store = index.load_vectorstore([])
+
+    assert store.index.ntotal == 0
+    assert embeddings.batches == [] and embeddings.queries == []
@@ -0,0 +1,263 @@
+import re
+import sqlite3
+import threading
+
+import pytest
+import yaml
+from langchain_core.language_models import LLM, FakeListLLM
+
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+from core.llm_handler import LLMHandler
+from core.lore.character_repository import CharacterRepository, YamlCharacterBackend
+from core.memory.memory_manager import MemoryManager
+from core.memory.memory_worker import MemoryWorker
+
+
+class WordCountLLM(FakeListLLM):
+    """Фейковая LLM; токены считаются по словам, без transformers"""
+
+    def get_num_tokens(self, text: str) -> int:
+        return len(text.split())
+
+
+def make_manager(tmp_path):
+    embeddings = FakeEmbeddings(size=8)
+    manager = MemoryManager(WordCountLLM(responses=["ok"]), embedding_model=embeddings,
+                            lore_path=str(tmp_path / "lore.yaml"))
+    return manager, embeddings
+
+
+def lore_in_prompt(manager, query):
+    memory = manager.get_combined_memory()
+    return memory.load_memory_variables({"input": query})["lore"]
+
+
+def test_update_lore_embeds_only_changed_entry(tmp_path):
+    (tmp_path / "lore.yaml").write_text(
+        yaml.safe_dump(["Руна Альгиз защищает от огня", "Эльфы живут в лесах"], allow_unicode=True),
+        encoding="utf-8")
+    manager, embeddings = make_manager(tmp_path)
+    embeddings.batches.clear()
+
+    manager.update_lore(["Руна Альгиз защищает от огня", "Эльфы живут в горах"])
+
+    assert embeddings.embedded == ["Эльфы живут в горах"]
+    # Цепочка, уже собранная из памяти, видит изменения без пересоздания
+    assert "Эльфы живут в горах" in lore_in_prompt(manager, "Где живут эльфы?")
+    assert "Эльфы живут в лесах" not in lore_in_prompt(manager, "Где живут эльфы?")
+    assert yaml.safe_load((tmp_path / "lore.yaml").read_text(encoding="utf-8"))[1] == "Эльфы живут в горах"
+
+
+def test_other_manager_reloads_lore_from_file(tmp_path):
+    first, _ = make_manager(tmp_path)
+    second, _ = make_manager(tmp_path)
+
+    first.update_lore(["Магия крови запрещена"])
+
+    assert second.reload_lore() == 1
+    assert second.reload_lore() == 0
+    assert second.lore_texts == ["Магия крови запрещена"]
+    assert "Магия крови запрещена" in lore_in_prompt(second, "магия крови")
+
+
+def test_save_context_runs_in_background_until_flush(tmp_path):
+    manager, _ = make_manager(tmp_path)
+    manager.save_context({"input": "Рыцарь вошёл в замок"}, {"response": "Ворота закрылись"})
+    manager.flush()
+
+    assert manager.worker.pending == 0
+    assert manager.worker.last_error is None
+    history = manager.summary_memory.chat_memory.messages
+    assert [m.content for m in history] == ["Рыцарь вошёл в замок", "Ворота закрылись"]
+
+
+def test_memory_summary_does_not_wait_for_background_updates(tmp_path):
+    manager, _ = make_manager(tmp_path)
+    release = threading.Event()
+    manager.worker.submit(release.wait, 5)
+
+    # Показывается последнее применённое состояние, ответ не ждёт обновлений памяти
+    summary = manager.get_memory_summary()
+    assert summary["pending"] == 1
+    release.set()
+    manager.flush()
+    assert manager.get_memory_summary()["pending"] == 0
+
+
+def test_worker_survives_failed_task():
+    worker = MemoryWorker()
+    done = []
+
+    def fail():
+        raise RuntimeError("ollama недоступна")
+
+    release = threading.Event()
+
+    def slow():
+        release.wait(2)
+        done.append(True)
+
+    worker.submit(fail)
+    worker.submit(slow)
+    # submit не ждёт выполнения задач
+    assert done == []
+    release.set()
+
+    worker.flush()
+    assert done == [True]
+    assert isinstance(worker.last_error, RuntimeError)
+
+
+@pytest.fixture
+def characters(tmp_path, monkeypatch):
+    """Репозиторий персонажей редактора с одной карточкой"""
+    repository = CharacterRepository(YamlCharacterBackend(tmp_path / "characters.yaml"))
+    repository.upsert("Артур", {"role": "король", "description": "хозяин Камелота"})
+    monkeypatch.setattr("core.lore.character_editor._repository", repository)
+    return repository
+
+
+def test_memory_snapshot_survives_restart(tmp_path, characters):
+    memory_path = str(tmp_path / "memory.sqlite")
+    manager = MemoryManager(WordCountLLM(responses=["Рыцарь у ворот замка"]), embedding_model=FakeEmbeddings(size=8),
+                            lore_path=str(tmp_path / "lore.yaml"), memory_path=memory_path)
+    manager.character_memory.entity_store.set("Артур", "Рыцарь Круглого стола")
+    manager.save_context({"input": "Артур вошёл в замок"}, {"response": "Ворота закрылись"})
+    manager.flush()
+    assert manager.worker.last_error is None
+
+    restarted = MemoryManager(WordCountLLM(responses=[]), embedding_model=FakeEmbeddings(size=8),
+                              lore_path=str(tmp_path / "lore.yaml"), memory_path=memory_path)
+
+    messages = restarted.summary_memory.chat_memory.messages
+    assert [m.content for m in messages] == ["Артур вошёл в замок", "Ворота закрылись"]
+    assert restarted.character_memory.entity_cache == ["Артур"]
+    # Заметки о персонаже обновлены LLM после хода и сохранены
+    assert restarted.character_memory.entity_store.notes("Артур") == "Рыцарь у ворот замка"
+
+
+def test_close_applies_pending_updates_and_releases_memory(tmp_path):
+    memory_path = str(tmp_path / "memory.sqlite")
+    manager = MemoryManager(WordCountLLM(responses=["ok"]), embedding_model=FakeEmbeddings(size=8),
+                            lore_path=str(tmp_path / "lore.yaml"), memory_path=memory_path)
+    manager.save_context({"input": "Рыцарь вошёл в замок"}, {"response": "Ворота закрылись"})
+    thread = manager.worker._thread
+
+    manager.close()
+
+    assert not thread.is_alive()
+    with pytest.raises(sqlite3.ProgrammingError):
+        manager.memory_store.get_state("summary")
+    restarted = MemoryManager(WordCountLLM(responses=[]), embedding_model=FakeEmbeddings(size=8),
+                              lore_path=str(tmp_path / "lore.yaml"), memory_path=memory_path)
+    assert len(restarted.summary_memory.chat_memory.messages) == 2
+
+
+class EchoNotesLLM(LLM):
+    """Фейковая LLM, которая дописывает к прежнему описанию сущности последнюю реплику"""
+
+    @property
+    def _llm_type(self) -> str:
+        return "echo-notes"
+
+    def _call(self, prompt: str, stop=None, run_manager=None, **kwargs) -> str:
+        existing = re.search(r"Existing summary of .*?:\n(.*?)\n\nLast line", prompt, re.S).group(1)
+        last_line = re.search(r"Last line of conversation:\nHuman: (.*)\n", prompt).group(1)
+        return f"{existing} {last_line}".strip()
+
+    def get_num_tokens(self, text: str) -> int:
+        return len(text.split())
+
+
+def test_entity_notes_do_not_copy_the_card(tmp_path, characters):
+    manager = MemoryManager(EchoNotesLLM(), embedding_model=FakeEmbeddings(size=8),
+                            lore_path=str(tmp_path / "lore.yaml"))
+    card = characters.describe("Артур")
+
+    for line in ("Артура ранили в бою", "Артур вернулся в Камелот"):
+        manager.save_context({"input": line}, {"response": "Рыцари ждали"})
+        manager.flush()
+    assert manager.worker.last_error is None
+
+    memory = manager.character_memory.load_memory_variables({"input": "Что делает Артур?"})
+    description = memory["entities"]["Артур"]
+    assert description.count(card) == 1
+    assert "Артура ранили в бою" in description and "вернулся в Камелот" in description
+
+
+def test_entities_come_from_character_repository(tmp_path, characters):
+    manager = MemoryManager(WordCountLLM(responses=["заметка"]), embedding_model=FakeEmbeddings(size=8),
+                            lore_path=str(tmp_path / "lore.yaml"))
+
+    # Имя в косвенном падеже; незнакомые имена персонажами не становятся
+    entities = manager.character_memory.load_memory_variables({"input": "Мерлин пришёл к Артуру"})["entities"]
+
+    assert list(entities) == ["Артур"]
+
+
+class ThreadRecordingModel(FakeChatModel):
+    """Фейковая чат-модель, запоминающая поток каждого вызова"""
+    threads: list = []
+
+    def _generate(self, messages, stop=None, **kwargs):
+        self.threads.append(threading.current_thread().name)
+        return super()._generate(messages, stop, **kwargs)
+
+
+def test_memory_generate_makes_one_model_call(tmp_path, monkeypatch, characters):
+    monkeypatch.chdir(tmp_path)
+    llm = ThreadRecordingModel(response_tokens=4, threads=[])
+    handler = LLMHandler(use_memory=True, llm=llm, embeddings=FakeEmbeddings(size=8))
+
+    for prompt in ("Артур вошёл в замок", "Ворота закрылись"):
+        handler.generate(prompt)
+    handler.memory_manager.flush()
+
+    # На пути ответа — только сама генерация; заметки о персонажах
+    # обновляются в фоне после ответа
+    foreground = [t for t in llm.threads if t == threading.current_thread().name]
+    assert len(foreground) == 2
+    assert len(llm.threads) > len(foreground)
+
+
+def test_memory_prompt_fits_context_tokens(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    lore = [f"Правило {i}: " + " ".join(["руна"] * 60) for i in range(20)]
+    (tmp_path / "data" / "lore.yaml").write_text(yaml.safe_dump(lore, allow_unicode=True), encoding="utf-8")
+    handler = LLMHandler(use_memory=True, llm=FakeChatModel(response_tokens=4),
+                         embeddings=FakeEmbeddings(size=8), context_tokens=1024)
+    handler.memory_manager.summary_memory.moving_summary_buffer = " ".join(["сводка"] * 5000)
+
+    messages = handler.prepare_messages("Что защищает от огня?")
+
+    # Память не выходит за окно модели: лор и сводка урезаны под бюджет
+    assembler = handler.assembler
+    assert sum(assembler._cost(m.content) for m in messages) <= assembler.budget - assembler.reserve
+    assert any(m.content.startswith("Правила мира:") for m in messages)
+    assert messages[-1].content == "Что защищает от огня?"
+
+
+def test_stable_layout_keeps_memory_prompt_prefix(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    lore = ["Руна Альгиз защищает от огня", "Эльфы живут в лесах", "Драконы спят зимой"]
+    (tmp_path / "data" / "lore.yaml").write_text(yaml.safe_dump(lore, allow_unicode=True), encoding="utf-8")
+    handler = LLMHandler(use_memory=True, llm=FakeChatModel(response_tokens=4),
+                         embeddings=FakeEmbeddings(size=8), prompt_layout="stable")
+
+    def prefix(messages):
+        # Всё до первого блока, собранного под текущий запрос (лор, сводка, персонажи)
+        changing = next(i for i, m in enumerate(messages[1:], 1) if m.type == "system")
+        return messages[:changing]
+
+    previous = []
+    for turn, prompt in enumerate(("Что защищает от огня?", "Где живут эльфы?", "Когда спят драконы?")):
+        messages = handler.prepare_messages(prompt)
+        assert any("Правила мира:" in m.content for m in messages)
+        # Система и история только дописываются: прошлый префикс не меняется
+        assert prefix(messages)[:len(previous)] == previous
+        assert len(prefix(messages)) == 1 + 2 * turn
+        previous = prefix(messages)
+        handler.generate(prompt)
+        handler.memory_manager.flush()
@@ -0,0 +1,50 @@
+import time
+
+from utils.metrics import Metrics
+
+
+def test_span_records_histogram_and_trace():
+    metrics = Metrics()
+    with metrics.trace() as stages:
+        with metrics.span("faiss_search"):
+            time.sleep(0.01)
+        metrics.observe("faiss_search", 0.002)
+    metrics.observe("embedding", 0.5, kind="query")
+
+    assert set(stages) == {"faiss_search"}
+    assert stages["faiss_search"] >= 12
+
+    snapshot = {s["stage"]: s for s in metrics.snapshot()["stages"]}
+    assert snapshot["faiss_search"]["count"] == 2
+    assert snapshot["embedding"]["kind"] == "query"
+    assert snapshot["embedding"]["max_ms"] == 500
+
+
+def test_prometheus_export():
+    metrics = Metrics()
+    metrics.observe("llm", 0.3, model="ollama:llama3")
+    metrics.observe("llm", 3.0, model="ollama:llama3")
+    metrics.inc("llm_tokens", 40, kind="eval")
+
+    text = metrics.to_prometheus()
+
+    assert '# TYPE writerai_stage_duration_seconds histogram' in text
+    assert 'writerai_stage_duration_seconds_bucket{stage="llm",model="ollama:llama3",le="0.5"} 1' in text
+    assert 'writerai_stage_duration_seconds_bucket{stage="llm",model="ollama:llama3",le="+Inf"} 2' in text
+    assert 'writerai_stage_duration_seconds_count{stage="llm",model="ollama:llama3"} 2' in text
+    assert 'writerai_llm_tokens_total{kind="eval"} 40' in text
+
+
+def test_gauges_keep_last_value():
+    metrics = Metrics()
+    metrics.set_gauge("scheduler_queue_depth", 3, model="ollama:llama3")
+    metrics.set_gauge("scheduler_queue_depth", 1, model="ollama:llama3")
+
+    assert metrics.snapshot()["gauges"] == [
+        {"name": "scheduler_queue_depth", "model": "ollama:llama3", "value": 1}]
+    text = metrics.to_prometheus()
+    assert "# TYPE writerai_scheduler_queue_depth gauge" in text
+    assert 'writerai_scheduler_queue_depth{model="ollama:llama3"} 1' in text
+
+    metrics.reset()
+    assert metrics.snapshot()["gauges"] == []
@@ -0,0 +1,117 @@
+from core.project.project_model import Project, Chapter, Scene
+from core.project.project_store import ProjectStore
+
+
+def make_project():
+    return Project(title="Роман", chapters=[
+        Chapter(title="Глава 1", scenes=[
+            Scene(title="Пролог", content="Было темно."),
+            Scene(title="Встреча", content="Они встретились.")
+        ])
+    ])
+
+
+def test_roundtrip(tmp_path):
+    store = ProjectStore(tmp_path)
+    project = make_project()
+    store.save(project)
+
+    loaded = store.load("Роман")
+    assert store.list() == ["Роман"]
+    assert [s.content for s in loaded.chapters[0].scenes] == ["Было темно.", "Они встретились."]
+    assert loaded.chapters[0].scenes[0].id == project.chapters[0].scenes[0].id
+
+
+def test_only_changed_scenes_are_appended(tmp_path):
+    store = ProjectStore(tmp_path)
+    project = make_project()
+    store.save(project)
+
+    assert store.save(project) == 0
+
+    project.chapters[0].scenes[1].content = "Они разошлись."
+    assert store.save(project) == len("Они разошлись.".encode("utf-8"))
+    assert store.load("Роман").chapters[0].scenes[1].content == "Они разошлись."
+
+
+def test_compaction_drops_dead_bytes(tmp_path):
+    store = ProjectStore(tmp_path, compact_ratio=0.5, compact_min_bytes=0)
+    project = make_project()
+    store.save(project)
+    for i in range(5):
+        project.chapters[0].scenes[0].content = f"Версия {i}"
+        store.save(project)
+
+    logs = list((tmp_path / "Роман").glob("scenes.*.log"))
+    assert len(logs) == 1
+    live = len("Версия 4".encode("utf-8")) + len("Они встретились.".encode("utf-8"))
+    assert logs[0].stat().st_size <= live * 2
+    assert store.load("Роман").chapters[0].scenes[0].content == "Версия 4"
+
+
+def test_migrate_json(tmp_path):
+    legacy = tmp_path / "Роман.json"
+    make_project().save(legacy)
+
+    store = ProjectStore(tmp_path)
+    store.migrate_json(legacy)
+
+    assert not legacy.exists()
+    assert (tmp_path / "Роман.json.migrated").exists()
+    assert store.load("Роман").chapters[0].scenes[0].content == "Было темно."
+
+
+def test_lazy_load_reads_scene_on_first_access(tmp_path):
+    store = ProjectStore(tmp_path)
+    store.save(make_project())
+
+    project = store.load("Роман")
+    first, second = project.chapters[0].scenes
+    assert not first.is_loaded and not second.is_loaded
+
+    assert second.content == "Они встретились."
+    assert second.is_loaded and not first.is_loaded
+
+    # Сохранение не подгружает нетронутые сцены
+    second.content = "Они разошлись."
+    store.save(project)
+    assert not first.is_loaded
+    assert store.load("Роман", lazy=False).chapters[0].scenes[0].content == "Было темно."
+
+
+def test_lazy_scene_survives_compaction(tmp_path):
+    store = ProjectStore(tmp_path, compact_ratio=0.1, compact_min_bytes=0)
+    store.save(make_project())
+
+    project = store.load("Роман")
+    project.chapters[0].scenes[1].content = "Они разошлись."
+    store.save(project)
+
+    assert project.chapters[0].scenes[0].content == "Было темно."
+
+
+def test_concurrent_load_and_save(tmp_path):
+    import threading
+
+    # Вторая вкладка читает проект, пока первая сохраняет и уплотняет журнал
+    store = ProjectStore(tmp_path, compact_ratio=0.1, compact_min_bytes=0)
+    project = make_project()
+    store.save(project)
+    errors = []
+
+    def reader():
+        try:
+            for _ in range(200):
+                loaded = store.load("Роман", lazy=False)
+                assert loaded.chapters[0].scenes[0].content.startswith("Было темно")
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for i in range(200):
+        project.chapters[0].scenes[0].content = f"Было темно {i}."
+        store.save(project)
+    thread.join()
+
+    assert errors == []
@@ -0,0 +1,60 @@
+from unittest.mock import patch, MagicMock
+
+from langchain_core.messages import HumanMessage
+
+from core.llm_handler import LLMHandler
+from core.response_cache import ResponseCache
+
+
+def test_key_depends_on_all_inputs():
+    messages = [HumanMessage(content="Привет")]
+    key = ResponseCache.make_key("ollama:llama3", 0.0, None, messages)
+
+    assert key == ResponseCache.make_key("ollama:llama3", 0.0, None, [HumanMessage(content="Привет")])
+    assert key != ResponseCache.make_key("ollama:mistral", 0.0, None, messages)
+    assert key != ResponseCache.make_key("ollama:llama3", 0.0, 42, messages)
+    assert key != ResponseCache.make_key("ollama:llama3", 0.0, None, [HumanMessage(content="Пока")])
+
+
+def test_disk_tier_survives_restart_and_counts_hits(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite"))
+    assert cache.get("k") is None
+    cache.put("k", "ответ")
+    assert cache.get("k") == "ответ"
+
+    reopened = ResponseCache(path=str(tmp_path / "cache.sqlite"))
+    assert reopened.get("k") == "ответ"
+    assert reopened.stats()["disk_hits"] == 1
+    assert reopened.get("k") == "ответ"
+    assert reopened.stats()["memory_hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_size_based_eviction(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite"), memory_items=1, max_disk_bytes=10)
+    cache.put("old", "12345")
+    cache.put("new", "1234567")
+
+    assert cache.stats()["disk_bytes"] == 7
+    assert cache.get("old") is None
+    assert cache.get("new") == "1234567"
+
+
+@patch("core.llm_handler.ChatOllama")
+def test_handler_uses_cache_only_when_deterministic(mock_chat_ollama, tmp_path):
+    mock_instance = MagicMock()
+    mock_instance.invoke.return_value = MagicMock(content="Ответ")
+    mock_chat_ollama.return_value = mock_instance
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite"))
+
+    creative = LLMHandler(temperature=0.7, cache=cache)
+    creative.generate("Привет!")
+    creative.generate("Привет!")
+    assert mock_instance.invoke.call_count == 2
+
+    pinned = LLMHandler(temperature=0.7, seed=7, cache=cache)
+    pinned.generate("Привет!")
+    pinned.context.clear()
+    assert pinned.generate("Привет!") == "Ответ"
+    assert mock_instance.invoke.call_count == 3
+    assert pinned.last_metrics["cache_hit"] is True
@@ -0,0 +1,180 @@
+import threading
+
+from benchmarks.fakes import FakeEmbeddings
+from core.memory.memory_manager import SceneRetrieverMemory
+from core.project import project_manager
+from core.project.project_model import Chapter, Project, Scene
+from core.project.project_store import ProjectStore
+from core.project.scene_index import SceneIndex, chunk_text
+
+
+def make_index(tmp_path, size=16, chunk_size=40):
+    embeddings = FakeEmbeddings(size=size)
+    return SceneIndex(tmp_path, embeddings, chunk_size=chunk_size), embeddings
+
+
+def test_chunk_text_packs_paragraphs():
+    text = "Первый абзац.\n\nВторой абзац.\n" + "Очень длинное предложение. " * 10
+
+    chunks = chunk_text(text, chunk_size=40)
+
+    assert chunks[0] == "Первый абзац.\nВторой абзац."
+    assert all(len(c) <= 40 for c in chunks)
+
+
+def test_search_finds_scene_chunk(tmp_path):
+    index, _ = make_index(tmp_path)
+    index.update_scene("s1", "Замок стоял на холме.\n\nДракон спал в пещере.")
+    index.update_scene("s2", "Рыцарь точил меч.")
+
+    # Фейковые эмбеддинги детерминированы: точный текст — ближайший сосед
+    assert index.search("Дракон спал в пещере.", k=1) == ["Дракон спал в пещере."]
+    assert len(index.search("что угодно", k=10)) == len(index)
+
+
+def test_update_is_incremental_and_persisted(tmp_path):
+    index, embeddings = make_index(tmp_path)
+    index.update_scene("s1", "Замок стоял на холме.")
+    index.update_scene("s2", "Рыцарь точил меч.")
+
+    # Неизменённая сцена не переиндексируется
+    assert not index.update_scene("s1", "Замок стоял на холме.")
+
+    embeddings.batches.clear()
+    assert index.update_scene("s2", "Рыцарь уехал.")
+    assert embeddings.embedded == ["Рыцарь уехал."]
+
+    reopened, _ = make_index(tmp_path)
+    assert sorted(c["text"] for c in reopened.chunks) == ["Замок стоял на холме.", "Рыцарь уехал."]
+    assert reopened.search("Рыцарь уехал.", k=1) == ["Рыцарь уехал."]
+
+
+def test_update_rewrites_only_changed_scene_files(tmp_path):
+    index, _ = make_index(tmp_path)
+    index.update_scene("s1", "Замок стоял на холме.")
+    index.update_scene("s2", "Рыцарь точил меч.")
+    s1_files = [p.read_bytes() for p in index._scene_files("s1")]
+    s1_mtimes = [p.stat().st_mtime_ns for p in index._scene_files("s1")]
+
+    index.update_scene("s2", "Рыцарь уехал.")
+    index.remove_scene("s2")
+
+    assert [p.read_bytes() for p in index._scene_files("s1")] == s1_files
+    assert [p.stat().st_mtime_ns for p in index._scene_files("s1")] == s1_mtimes
+    assert not any(p.exists() for p in index._scene_files("s2"))
+
+
+def test_legacy_index_is_split_per_scene(tmp_path):
+    import numpy as np
+
+    from utils.serialization import write_json
+
+    index, _ = make_index(tmp_path)
+    index.update_scene("s1", "Замок стоял на холме.")
+    index.update_scene("s2", "Рыцарь точил меч.")
+    # Прежний формат: одна матрица и один JSON на весь проект
+    np.save(tmp_path / "scene_index.npy", index.matrix)
+    write_json(tmp_path / "scene_index.json", {"chunks": index.chunks, "scene_hashes": index.scene_hashes})
+    for scene_id in ("s1", "s2"):
+        for path in index._scene_files(scene_id):
+            path.unlink()
+
+    reopened, embeddings = make_index(tmp_path)
+
+    assert reopened.scene_hashes == index.scene_hashes
+    assert reopened.search("Рыцарь точил меч.", k=1) == ["Рыцарь точил меч."]
+    assert not (tmp_path / "scene_index.json").exists()
+    assert embeddings.embedded == []
+
+
+def test_search_during_updates_returns_consistent_text(tmp_path):
+    import threading
+
+    index, _ = make_index(tmp_path, chunk_size=30)
+    index.update_scene("s0", "Замок стоял на холме.")
+    errors = []
+    done = threading.Event()
+
+    def searcher():
+        try:
+            while not done.is_set():
+                for text in index.search("Замок стоял на холме.", k=3):
+                    assert text
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=searcher)
+    thread.start()
+    for i in range(50):
+        index.update_scene("s1", "\n".join(f"Фрагмент {j} версии {i}." for j in range(i % 5 + 1)))
+    done.set()
+    thread.join()
+
+    assert errors == []
+
+
+def test_sync_removes_deleted_scenes(tmp_path):
+    index, _ = make_index(tmp_path)
+    kept = Scene(title="1", content="Замок стоял на холме.")
+    removed = Scene(title="2", content="Рыцарь точил меч.")
+    project = Project(title="Книга", chapters=[Chapter(title="Глава", scenes=[kept, removed])])
+
+    assert index.sync(project) == 2
+    project.chapters[0].scenes = [kept]
+    assert index.sync(project) == 0
+
+    assert [c["text"] for c in index.chunks] == ["Замок стоял на холме."]
+
+
+class UnavailableEmbeddings(FakeEmbeddings):
+    """Ollama не отвечает, пока не установлен release, а потом падает"""
+
+    def __init__(self, release: threading.Event):
+        super().__init__(size=8)
+        self.release = release
+
+    def embed_documents(self, texts):
+        self.release.wait(5)
+        raise ConnectionError("ollama недоступна")
+
+
+def test_saving_scene_does_not_wait_for_embeddings(tmp_path, monkeypatch, caplog):
+    release = threading.Event()
+    monkeypatch.setattr(project_manager, "_store", ProjectStore(tmp_path))
+    monkeypatch.setattr(project_manager, "PROJECTS_DIR", tmp_path)
+    monkeypatch.setattr(project_manager, "_scene_indexes", {})
+    monkeypatch.setattr("core.memory.embedding_service.get_embedding_service",
+                        lambda name: UnavailableEmbeddings(release))
+    scene = Scene(title="1", content="Дракон спал в пещере.")
+    project_manager.save_project(Project(title="Книга", chapters=[Chapter(title="Глава", scenes=[scene])]))
+
+    # Сохранение возвращается, пока модель эмбеддингов ещё не ответила
+    project_manager.index_scene("Книга", scene)
+    release.set()
+    project_manager.flush_scene_indexing()
+
+    assert "Не удалось" in caplog.text
+    assert len(project_manager.get_scene_index("Книга")) == 0
+
+
+def test_scene_memory_formats_passages(tmp_path):
+    index, _ = make_index(tmp_path)
+    index.update_scene("s1", "Замок стоял на холме.\n\nДракон спал в пещере.")
+
+    memory = SceneRetrieverMemory(index=index, k=2)
+    scenes = memory.load_memory_variables({"input": "Дракон спал в пещере."})["scenes"]
+
+    assert scenes.split("\n---\n")[0] == "Дракон спал в пещере."
+
+
+def test_search_vector_on_10k_chunks(tmp_path):
+    index, _ = make_index(tmp_path, size=768, chunk_size=30)
+    text = "\n".join(f"Фрагмент сцены номер {i}." for i in range(10_000))
+    index.update_scene("big", text)
+    assert len(index) == 10_000
+
+    # Скорость поиска измеряет бенчмарк, здесь — только корректность
+    top = index.search_vector(index.matrix[42], k=5)
+
+    assert top[0] == 42
+    assert len(top) == 5
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from core.scheduler import (
+    BACKGROUND,
+    DEFAULT_SLOTS,
+    INTERACTIVE,
+    SPECULATIVE,
+    RequestScheduler,
+    SchedulerRejected,
+    default_slots,
+)
+
+
+def grant_order(scheduler, requests):
+    """Ставит запросы в очередь за занятым слотом и возвращает порядок выдачи"""
+    blocker = scheduler.enqueue("m", INTERACTIVE, "blocker")
+    tickets = [scheduler.enqueue("m", priority, session) for priority, session in requests]
+    order = []
+    scheduler.release(blocker)
+    for _ in tickets:
+        granted = next(t for t in tickets if t.state == "granted")
+        order.append((granted.priority, granted.session))
+        scheduler.release(granted)
+    return order
+
+
+def test_slots_limit_concurrent_requests():
+    scheduler = RequestScheduler(slots=2)
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def request():
+        nonlocal active, peak
+        with scheduler.slot("m"):
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+
+    threads = [threading.Thread(target=request) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak == 2
+    assert scheduler.stats()["m"]["active"] == 0
+
+
+def test_default_slots_follow_ollama_num_parallel(monkeypatch):
+    monkeypatch.delenv("OLLAMA_NUM_PARALLEL", raising=False)
+    assert RequestScheduler().slots == DEFAULT_SLOTS
+
+    monkeypatch.setenv("OLLAMA_NUM_PARALLEL", "2")
+    assert default_slots() == 2
+    assert RequestScheduler(model_slots={"big": 1}).slots_for("big") == 1
+
+
+def test_models_have_separate_slots():
+    scheduler = RequestScheduler(slots=1)
+    with scheduler.slot("a"):
+        with scheduler.slot("b", timeout=0.1):
+            pass
+
+
+def test_interactive_goes_before_background_and_speculative():
+    scheduler = RequestScheduler(slots=1)
+    order = grant_order(scheduler, [(SPECULATIVE, "s"), (BACKGROUND, "s"), (INTERACTIVE, "s")])
+
+    assert [p for p, _ in order] == [INTERACTIVE, BACKGROUND, SPECULATIVE]
+
+
+def test_sessions_are_served_round_robin():
+    scheduler = RequestScheduler(slots=1)
+    # Вкладка «a» поставила пакет из трёх запросов раньше вкладки «b»
+    order = grant_order(scheduler, [(INTERACTIVE, "a")] * 3 + [(INTERACTIVE, "b")])
+
+    assert [s for _, s in order] == ["a", "b", "a", "a"]
+
+
+def test_aged_background_task_jumps_the_queue():
+    scheduler = RequestScheduler(slots=1, aging=0.05)
+    blocker = scheduler.enqueue("m", INTERACTIVE, "blocker")
+    background = scheduler.enqueue("m", BACKGROUND, "memory")
+    time.sleep(0.06)
+    interactive = scheduler.enqueue("m", INTERACTIVE, "author")
+
+    scheduler.release(blocker)
+
+    assert background.state == "granted"
+    assert interactive.state == "waiting"
+
+
+def test_full_queue_rejects_interactive_but_not_background():
+    scheduler = RequestScheduler(slots=1, max_queue=2)
+    scheduler.enqueue("m", INTERACTIVE, "a")
+    scheduler.enqueue("m", INTERACTIVE, "a")
+    scheduler.enqueue("m", INTERACTIVE, "b")
+
+    with pytest.raises(SchedulerRejected):
+        scheduler.enqueue("m", INTERACTIVE, "c")
+    scheduler.enqueue("m", BACKGROUND, "memory")
+    assert scheduler.stats()["m"]["waiting_interactive"] == 2
+
+
+def test_wait_timeout_leaves_queue():
+    scheduler = RequestScheduler(slots=1)
+    with scheduler.slot("m"):
+        with pytest.raises(SchedulerRejected):
+            with scheduler.slot("m", timeout=0.05):
+                pass
+        assert scheduler.stats()["m"]["waiting_interactive"] == 0
+    assert not scheduler.busy()
+
+
+def test_speculative_yields_to_interactive_request():
+    scheduler = RequestScheduler(slots=2)
+    with scheduler.slot("m", SPECULATIVE):
+        assert not scheduler.should_yield("m", SPECULATIVE)
+        with scheduler.slot("other"):
+            assert scheduler.should_yield("m", SPECULATIVE)
+            assert not scheduler.should_yield("m", BACKGROUND)
+
+
+def test_priority_context_sets_default_class():
+    scheduler = RequestScheduler(slots=1)
+    with scheduler.priority(BACKGROUND):
+        with scheduler.slot("m") as ticket:
+            assert ticket.priority == BACKGROUND
+    assert scheduler.current_priority() == INTERACTIVE
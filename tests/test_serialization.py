@@ -0,0 +1,73 @@
+import pytest
+
+from utils import serialization
+from utils.serialization import (
+    JSONDecodeError,
+    atomic_write,
+    json_dumps,
+    json_loads,
+    read_json,
+    read_yaml,
+    write_json,
+    write_yaml,
+)
+
+DATA = {"title": "Книга", "chapters": [{"title": "Глава 1", "scenes": []}], "seed": 7}
+
+
+def test_json_roundtrip_keeps_unicode(tmp_path):
+    path = tmp_path / "project.json"
+    write_json(path, DATA, indent=True)
+
+    assert "Книга" in path.read_text(encoding="utf-8")
+    assert read_json(path) == DATA
+    assert json_loads(json_dumps(DATA)) == DATA
+
+
+def test_yaml_roundtrip_and_defaults(tmp_path):
+    path = tmp_path / "lore.yaml"
+    write_yaml(path, ["Магия запрещена", {"text": "Эльфы живут в лесах"}])
+
+    assert read_yaml(path) == ["Магия запрещена", {"text": "Эльфы живут в лесах"}]
+    assert read_yaml(tmp_path / "missing.yaml", default=[]) == []
+    assert read_json(tmp_path / "missing.json") is None
+
+
+def test_atomic_write_replaces_whole_file(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text("старое содержимое, которое длиннее нового", encoding="utf-8")
+
+    atomic_write(path, "{}", fsync=True)
+
+    assert path.read_text(encoding="utf-8") == "{}"
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_concurrent_writes_to_same_file(tmp_path):
+    import threading
+
+    path = tmp_path / "manifest.json"
+    payloads = [json_dumps({"writer": i, "data": "x" * 10000 * (i + 1)}) for i in range(8)]
+
+    threads = [threading.Thread(target=lambda p=p: [atomic_write(path, p) for _ in range(20)])
+               for p in payloads]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Файл целиком от одного из писателей, временные файлы не остались
+    assert path.read_text(encoding="utf-8") in payloads
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_decode_error_is_stdlib_compatible():
+    with pytest.raises(JSONDecodeError):
+        json_loads("{")
+
+
+def test_stdlib_fallback_without_orjson(monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+
+    assert json_loads(json_dumps(DATA, indent=True)) == DATA
+    assert "Книга" in json_dumps(DATA)
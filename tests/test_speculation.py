@@ -0,0 +1,137 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from langchain_core.language_models import FakeListChatModel
+
+from core.llm_handler import LLMHandler
+from core.project.project_model import Scene
+from core.scheduler import get_scheduler
+from core.speculation import SpeculativeQueue
+
+
+@pytest.fixture(autouse=True)
+def quiet_scheduler(monkeypatch):
+    # В тестах затишье перед фоновой работой короткое
+    monkeypatch.setattr(get_scheduler(), "quiet", 0.01)
+
+
+@pytest.fixture(autouse=True)
+def no_logs():
+    with patch("core.llm_handler.log_interaction") as mock_log:
+        yield mock_log
+
+
+def make_handler(responses, sleep=None):
+    return LLMHandler(llm=FakeListChatModel(responses=responses, sleep=sleep))
+
+
+def wait_status(queue, scene, status, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while queue.status("Роман", scene.id) != status:
+        assert time.monotonic() < deadline, queue.status("Роман", scene.id)
+        time.sleep(0.01)
+
+
+def test_draft_does_not_touch_context_until_accepted(no_logs):
+    handler = make_handler(["Рыцарь обнажил меч."])
+
+    draft = handler.draft("Продолжи сцену")
+
+    assert draft.text == "Рыцарь обнажил меч."
+    assert len(handler.context.buffer) == 0
+    no_logs.assert_not_called()
+
+    assert handler.accept_draft(draft) == "Рыцарь обнажил меч."
+    assert len(handler.context.buffer) == 2
+    assert no_logs.call_args.kwargs["meta"]["speculative"] is True
+
+
+def test_draft_yields_to_interactive_request():
+    handler = make_handler(["Очень длинное продолжение сцены"], sleep=0.01)
+
+    # Ollama делит GPU между моделями: черновик уступает интерактивному запросу к любой
+    with get_scheduler().slot("ollama:mistral"):
+        assert handler.draft("Продолжи сцену") is None
+
+
+def test_queue_serves_draft_for_unchanged_scene():
+    handler = make_handler(["Продолжение"])
+    queue = SpeculativeQueue(handler_factory=lambda **kwargs: handler)
+    scene = Scene(title="Пролог", content="Замок спал.")
+
+    queue.submit("Роман", scene)
+    wait_status(queue, scene, "ready")
+
+    draft = queue.take("Роман", scene)
+    assert draft.text == "Продолжение"
+    # Черновик выдаётся один раз
+    assert queue.take("Роман", scene) is None
+
+
+def test_changed_scene_invalidates_draft():
+    handler = make_handler(["Продолжение"])
+    queue = SpeculativeQueue(handler_factory=lambda **kwargs: handler)
+    scene = Scene(title="Пролог", content="Замок спал.")
+
+    queue.submit("Роман", scene)
+    wait_status(queue, scene, "ready")
+    scene.content = "Замок проснулся."
+
+    assert queue.take("Роман", scene) is None
+    assert queue.status("Роман", scene.id) is None
+
+
+def test_resubmit_cancels_previous_job():
+    handler = make_handler(["Первое продолжение, очень длинное", "Второе"], sleep=0.01)
+    queue = SpeculativeQueue(handler_factory=lambda **kwargs: handler)
+    scene = Scene(title="Пролог", content="Замок спал.")
+
+    first = queue.submit("Роман", scene)
+    scene.content = "Замок проснулся."
+    second = queue.submit("Роман", scene)
+
+    assert first.cancel.is_set()
+    assert queue.submit("Роман", scene) is second
+    wait_status(queue, scene, "ready")
+
+
+def test_background_work_waits_for_interactive_requests():
+    handler = make_handler(["Продолжение"])
+    queue = SpeculativeQueue(handler_factory=lambda **kwargs: handler)
+    scene = Scene(title="Пролог", content="Замок спал.")
+    released = threading.Event()
+
+    def interactive():
+        with get_scheduler().slot("ollama:llama3"):
+            released.wait(2)
+
+    thread = threading.Thread(target=interactive)
+    thread.start()
+    while not get_scheduler().busy():
+        time.sleep(0.001)
+
+    queue.submit("Роман", scene)
+    time.sleep(0.1)
+    assert queue.status("Роман", scene.id) == "queued"
+
+    released.set()
+    thread.join()
+    wait_status(queue, scene, "ready")
+
+
+def test_take_adopts_running_draft():
+    handler = make_handler(["Очень длинное продолжение сцены"], sleep=0.01)
+    queue = SpeculativeQueue(handler_factory=lambda **kwargs: handler)
+    scene = Scene(title="Пролог", content="Замок спал.")
+
+    queue.submit("Роман", scene)
+    wait_status(queue, scene, "running")
+    # Интерактивный запрос к другой модели прервал бы обычный черновик,
+    # но черновик, который автор уже ждёт, дописывается до конца
+    with get_scheduler().slot("ollama:mistral"):
+        draft = queue.take("Роман", scene, adopt=True)
+
+    assert draft.text == "Очень длинное продолжение сцены"
+    assert queue.status("Роман", scene.id) is None
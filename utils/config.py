@@ -1,14 +1,9 @@
-import json
-import os
+from utils.serialization import read_json, write_json
 
 CONFIG_PATH = "config.json"
 
 def load_config():
-    if os.path.exists(CONFIG_PATH):
-        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+    return read_json(CONFIG_PATH, default={})
 
 def save_config(config):
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        json.dump(config, f, indent=4, ensure_ascii=False)
+    write_json(CONFIG_PATH, config, indent=True)
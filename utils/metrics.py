@@ -0,0 +1,172 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+# Границы корзин гистограмм длительностей, секунды
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PREFIX = "writerai"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+
+class Metrics:
+    """
+    Реестр метрик процесса: гистограммы длительностей этапов (span)
+    и счётчики, с выгрузкой в текстовом формате Prometheus.
+
+    span() дополнительно записывает длительность в активную трассировку
+    текущего потока (trace()), чтобы этапы одного запроса попали в meta лога.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._gauges: Dict[Tuple[str, LabelKey], float] = {}
+        self._local = threading.local()
+
+    @contextmanager
+    def span(self, stage: str, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, **labels)
+
+    def observe(self, stage: str, seconds: float, **labels):
+        key = (stage, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+        stages = getattr(self._local, "trace", None)
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.0) + seconds * 1000
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """Текущее значение величины (например, глубина очереди)"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = value
+
+    @contextmanager
+    def trace(self) -> Iterator[dict]:
+        """
+        Собирает длительности этапов (мс), выполненных в этом потоке внутри блока.
+        Вложенные trace() пишут в тот же словарь.
+        """
+        outer = getattr(self._local, "trace", None)
+        stages = outer if outer is not None else {}
+        self._local.trace = stages
+        try:
+            yield stages
+        finally:
+            self._local.trace = outer
+
+    def snapshot(self) -> dict:
+        """Сводка для диагностики: этапы с числом вызовов и временем в мс"""
+        with self._lock:
+            stages = [
+                {
+                    "stage": stage,
+                    **dict(labels),
+                    "count": h.count,
+                    "avg_ms": h.sum / h.count * 1000 if h.count else 0.0,
+                    "max_ms": h.max * 1000,
+                    "total_ms": h.sum * 1000
+                }
+                for (stage, labels), h in sorted(self._histograms.items())
+            ]
+            counters = [
+                {"name": name, **dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            gauges = [
+                {"name": name, **dict(labels), "value": value}
+                for (name, labels), value in sorted(self._gauges.items())
+            ]
+        return {"stages": stages, "counters": counters, "gauges": gauges}
+
+    def to_prometheus(self) -> str:
+        name = f"{PREFIX}_stage_duration_seconds"
+        lines = [f"# HELP {name} Duration of generation pipeline stages.",
+                 f"# TYPE {name} histogram"]
+        with self._lock:
+            for (stage, labels), h in sorted(self._histograms.items()):
+                base = (("stage", stage),) + labels
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float("inf"),), h.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels(base + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(base)} {h.sum!r}")
+                lines.append(f"{name}_count{_format_labels(base)} {h.count}")
+
+            for counter in sorted({n for n, _ in self._counters}):
+                lines.append(f"# TYPE {PREFIX}_{counter}_total counter")
+                for (n, labels), value in sorted(self._counters.items()):
+                    if n == counter:
+                        lines.append(f"{PREFIX}_{counter}_total{_format_labels(labels)} {value!r}")
+
+            for gauge in sorted({n for n, _ in self._gauges}):
+                lines.append(f"# TYPE {PREFIX}_{gauge} gauge")
+                for (n, labels), value in sorted(self._gauges.items()):
+                    if n == gauge:
+                        lines.append(f"{PREFIX}_{gauge}{_format_labels(labels)} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+
+def _label_key(labels: dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+_metrics: Optional[Metrics] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """Общий для процесса реестр метрик"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+        return _metrics
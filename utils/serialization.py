@@ -0,0 +1,109 @@
+"""
+Единый слой чтения и записи YAML/JSON.
+
+YAML разбирается C-реализацией libyaml (CSafeLoader/CSafeDumper), если PyYAML
+собран с ней, JSON — через orjson. Без этих библиотек используются
+pure-Python загрузчик PyYAML и стандартный json — формат файлов тот же.
+Все функции записи атомарны: данные пишутся во временный файл рядом
+с целевым и подменяют его через os.replace.
+"""
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Union
+
+import yaml
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
+
+PathLike = Union[str, Path]
+
+JSONDecodeError = json.JSONDecodeError  # orjson.JSONDecodeError — его подкласс
+
+
+def yaml_loads(text: Union[str, bytes]) -> Any:
+    return yaml.load(text, Loader=SafeLoader)
+
+
+def yaml_dumps(data: Any) -> str:
+    return yaml.dump(data, Dumper=SafeDumper, allow_unicode=True, sort_keys=False)
+
+
+def json_loads(text: Union[str, bytes]) -> Any:
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def json_dumps(data: Any, indent: bool = False) -> str:
+    """JSON без экранирования не-ASCII символов; indent — отступ в 2 пробела"""
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if indent else 0
+        return orjson.dumps(data, option=option | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False, indent=2 if indent else None)
+
+
+@contextmanager
+def atomic_path(path: PathLike) -> Iterator[Path]:
+    """
+    Временный файл рядом с path: после успешного выхода из блока он подменяет
+    path через os.replace, при ошибке удаляется. Имя уникально, поэтому
+    параллельные записи одного файла не пишут в общий временный файл.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield Path(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def atomic_write(path: PathLike, data: Union[str, bytes], fsync: bool = False):
+    """
+    Записывает файл целиком через временный файл и os.replace: читатели видят
+    либо старое, либо новое содержимое. fsync — дождаться записи на диск.
+    """
+    payload = data.encode("utf-8") if isinstance(data, str) else data
+    with atomic_path(path) as tmp:
+        with open(tmp, "wb") as f:
+            f.write(payload)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def read_yaml(path: PathLike, default: Any = None) -> Any:
+    path = Path(path)
+    if not path.exists():
+        return default
+    return yaml_loads(path.read_bytes())
+
+
+def write_yaml(path: PathLike, data: Any, fsync: bool = False):
+    atomic_write(path, yaml_dumps(data), fsync=fsync)
+
+
+def read_json(path: PathLike, default: Any = None) -> Any:
+    path = Path(path)
+    if not path.exists():
+        return default
+    return json_loads(path.read_bytes())
+
+
+def write_json(path: PathLike, data: Any, indent: bool = False, fsync: bool = False):
+    atomic_write(path, json_dumps(data, indent=indent), fsync=fsync)